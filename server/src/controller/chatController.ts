@@ -207,7 +207,7 @@ export const sendMessage = async (req: Request, res: Response) => {
         // 5. Call Microservice
         let aiResponse = { content: "" } as any; // Init default
         try {
-            aiResponse = await generateChatResponse(messageText, history, microserviceFiles, userLocation);
+            aiResponse = await generateChatResponse(messageText, history, microserviceFiles, userLocation, conversationId);
         } catch (err) {
             aiResponse = { content: "I'm sorry, I'm having trouble connecting to my brain right now." };
         }
@@ -25,7 +25,8 @@ export const generateChatResponse = async (
     prompt: string,
     history: SessionMessage[],
     files: MicroserviceFile[] = [],
-    location?: { lat: number; lng: number }
+    location?: { lat: number; lng: number },
+    sessionId?: string
 ): Promise<MicroserviceResponse> => {
     try {
         const formData = new FormData();
@@ -36,6 +37,10 @@ export const generateChatResponse = async (
             formData.append('location', JSON.stringify(location));
         }
 
+        if (sessionId) {
+            formData.append('session_id', sessionId);
+        }
+
         files.forEach((file) => {
             formData.append('files', file.buffer, {
                 filename: file.originalname,
@@ -1,22 +1,35 @@
+import time
+
+_import_started = time.perf_counter()
+
 import os
 import sys
 import json
 import re
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 import fastapi
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from langchain_core.messages import HumanMessage, AIMessage
 
-from models.llama import Llama
+from services.lazy import LazyService
 from services.router import ModelRouter
+from services.executor import GenerationExecutor
 
 from config.models import LLAMA, ROUTER_MODEL
 from config.prompts import GENERIC_TOOLS_PROMPT
+from config.server import GENERATION_EXECUTOR, STARTUP, SERVING
 
 from utils.logger import logger
-from utils.exception import SmartSaarthiException
-from utils.ocr import get_text
+from utils.exception import SmartSaarthiException, GenerationQueueFullError, GenerationTimeoutError
+from utils.ocr import get_text, ocr_engine
+from services.image_understanding import get_image_understanding
+from services.maps_client import maps_client_stats
+from services.poi_index import poi_index_stats
+from services.clip import clip_service_stats
 
 from dotenv import load_dotenv
 
@@ -34,13 +47,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-llama = Llama(
-    model_name=LLAMA["MODEL_NAME"],
-    langchain_hub_name=GENERIC_TOOLS_PROMPT["langchain_hub_name"],
-    chunk_size=LLAMA["CHUNK_SIZE"],
-    chunk_overlap=LLAMA["CHUNK_OVERLAP"]
-)
+def build_llama():
+    # Imported here so importing the app only needs langchain_core's message types (also used by
+    # config.prompts), not the agent, community tools, FAISS or the embedding model
+    from models.llama import Llama
+
+    return Llama(
+        model_name=LLAMA["MODEL_NAME"],
+        langchain_hub_name=GENERIC_TOOLS_PROMPT["langchain_hub_name"],
+        chunk_size=LLAMA["CHUNK_SIZE"],
+        chunk_overlap=LLAMA["CHUNK_OVERLAP"]
+    )
+
+def warm_llama(instance):
+    # First forward pass allocates the ONNX/torch buffers, keep it off the first user request
+    instance.embeddings.embed_query("warmup")
+
+llama = LazyService("llama", build_llama)
 router = ModelRouter(model_name=ROUTER_MODEL["MODEL_NAME"])
+generation_executor = GenerationExecutor(
+    max_workers=GENERATION_EXECUTOR["MAX_WORKERS"],
+    max_queue_size=GENERATION_EXECUTOR["MAX_QUEUE_SIZE"],
+    request_timeout=GENERATION_EXECUTOR["REQUEST_TIMEOUT_SECONDS"],
+    metrics_window=GENERATION_EXECUTOR["METRICS_WINDOW"],
+    max_async_concurrency=GENERATION_EXECUTOR["MAX_ASYNC_CONCURRENCY"]
+)
+
+IMPORT_SECONDS = round(time.perf_counter() - _import_started, 3)
+
+async def ensure_loaded(service: LazyService):
+    """Loads a lazy component off the event loop, so one cold request doesn't stall the others."""
+    if not service.ready:
+        await asyncio.to_thread(service.get)
+
+def not_ready_response() -> JSONResponse:
+    """
+    503 for requests that need the models while they load. The load runs on one background
+    thread, so cold-start requests don't each park a default-executor thread the async tools need.
+    """
+    llama.load_in_background(warm_llama)
+    return JSONResponse(
+        status_code=503,
+        content={"status": 503, "message": "Models are still loading, please retry shortly.", "components": {"llama": llama.status()}},
+        headers={"Retry-After": str(GENERATION_EXECUTOR["RETRY_AFTER_SECONDS"])}
+    )
 
 @app.get("/", tags=["Root"])
 def root() -> dict:
@@ -56,6 +106,48 @@ def health_check() -> dict:
         "message": "SmartSaarthi microservice is healthy and running."
     }
 
+@app.get("/health/live", tags=["Health"])
+def liveness() -> dict:
+    return {
+        "status": 200,
+        "message": "alive"
+    }
+
+@app.get("/health/ready", tags=["Health"])
+def readiness():
+    content = {
+        "status": 200 if llama.ready else 503,
+        "startup_mode": STARTUP["MODE"],
+        "import_seconds": IMPORT_SECONDS,
+        "components": {"llama": llama.status()}
+    }
+    if not llama.ready:
+        return JSONResponse(status_code=503, content=content)
+    return content
+
+@app.get("/metrics", tags=["Health"])
+def metrics() -> dict:
+    stats = {
+        "status": 200,
+        "generation_executor": generation_executor.stats(),
+        "ocr": ocr_engine.stats(),
+        "image_understanding": get_image_understanding().stats(),
+        "maps": maps_client_stats(),
+        "local_poi": poi_index_stats(),
+        "clip": clip_service_stats()
+    }
+    # Never load the models just to report on them
+    if llama.ready:
+        stats.update({
+            "session_stores": llama.session_stores.stats(),
+            "embedding_cache": llama.embedding_cache.stats(),
+            "embedding_batcher": llama.embeddings.stats(),
+            "knowledge_base": llama.knowledge_base.stats(),
+            "response_cache": llama.response_cache.stats(),
+            "conversation_memory": llama.conversation_memory.stats()
+        })
+    return stats
+
 # @app.post('/generate', tags=["generate"])
 # async def generate_response(request: fastapi.Request) -> dict:
 #     try:
@@ -120,61 +212,177 @@ def health_check() -> dict:
 #         logger.error(f"Error in /generate: {str(e)}")
 #         raise SmartSaarthiException("An error occurred while generating response.", sys)
 
-@app.post('/generate-chat', tags=["generate"])
-async def generate_chat(request: fastapi.Request) -> dict:
-    try:
-        content_type = request.headers.get("content-type", "")
-        prompt = ""
-        session_history = []
-
-        if "multipart/form-data" in content_type:
-            form = await request.form()
-            prompt = form.get("prompt", "").strip()
-            session_history_str = form.get("session_history", "[]")
-            session_history_raw = json.loads(session_history_str) if session_history_str else []
-            uploads_raw = form.getlist("files") or []
-            
-            location_str = form.get("location")
-            location = json.loads(location_str) if location_str else None
-
-            files_payload = []
-            for f in uploads_raw:
-                if hasattr(f, "filename"):
-                    data = await f.read()
-                    files_payload.append({"filename": f.filename, "content": data})
-        else:
-            data = await request.json()
-            prompt = data.get("prompt", "").strip()
-            session_history_raw = data.get("session_history", [])
-            json_files = data.get("files", []) or []
-            location = data.get("location") # Expecting dict or None
+async def parse_chat_request(request: fastapi.Request) -> tuple:
+    content_type = request.headers.get("content-type", "")
+    prompt = ""
+    session_history = []
+
+    if "multipart/form-data" in content_type:
+        form = await request.form()
+        prompt = form.get("prompt", "").strip()
+        session_history_str = form.get("session_history", "[]")
+        session_history_raw = json.loads(session_history_str) if session_history_str else []
+        uploads_raw = form.getlist("files") or []
+        
+        location_str = form.get("location")
+        location = json.loads(location_str) if location_str else None
+        session_id = form.get("session_id") or None
+
+        files_payload = []
+        for f in uploads_raw:
+            if hasattr(f, "filename"):
+                data = await f.read()
+                files_payload.append({"filename": f.filename, "content": data})
+    else:
+        data = await request.json()
+        prompt = data.get("prompt", "").strip()
+        session_history_raw = data.get("session_history", [])
+        json_files = data.get("files", []) or []
+        location = data.get("location") # Expecting dict or None
+        session_id = data.get("session_id") or None
+
+        files_payload = []
+        for f in json_files:
+            if isinstance(f, dict):
+                files_payload.append(f)
+
+    session_history = []
+    for msg in session_history_raw:
+        if msg.get("role") == "user":
+            session_history.append(HumanMessage(content=msg.get("content", "")))
+        elif msg.get("role") == "assistant":
+            session_history.append(AIMessage(content=msg.get("content", "")))
+
+    if not prompt:
+        raise SmartSaarthiException("Prompt is required.")
+
+    return prompt, session_history, files_payload, location, session_id
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.delete('/sessions/{session_id}', tags=["generate"])
+async def delete_session(session_id: str) -> dict:
+    if not llama.ready:
+        return not_ready_response()
+    await asyncio.to_thread(llama.session_stores.discard, session_id)
+    return {
+        "status": 200,
+        "message": f"Session {session_id} cleared."
+    }
 
-            files_payload = []
-            for f in json_files:
-                if isinstance(f, dict):
-                    files_payload.append(f)
+@app.get('/sessions/{session_id}/documents', tags=["generate"])
+async def list_session_documents(session_id: str) -> dict:
+    if not llama.ready:
+        return not_ready_response()
+    return {
+        "status": 200,
+        "documents": await asyncio.to_thread(llama.session_stores.list_documents, session_id)
+    }
 
-        session_history = []
-        for msg in session_history_raw:
-            if msg.get("role") == "user":
-                session_history.append(HumanMessage(content=msg.get("content", "")))
-            elif msg.get("role") == "assistant":
-                session_history.append(AIMessage(content=msg.get("content", "")))
+@app.delete('/sessions/{session_id}/documents/{source}', tags=["generate"])
+async def delete_session_document(session_id: str, source: str) -> dict:
+    if not llama.ready:
+        return not_ready_response()
+    removed = await asyncio.to_thread(llama.remove_documents, session_id, [source])
+    if not removed:
+        return JSONResponse(
+            status_code=404,
+            content={"status": 404, "message": f"Document {source} is not indexed for session {session_id}."}
+        )
+    return {
+        "status": 200,
+        "message": f"Document {source} removed."
+    }
 
-        if not prompt:
-            raise SmartSaarthiException("Prompt is required.")
+@app.post('/generate-chat', tags=["generate"])
+async def generate_chat(request: fastapi.Request) -> dict:
+    if not llama.ready:
+        return not_ready_response()
+    try:
+        prompt, session_history, files_payload, location, session_id = await parse_chat_request(request)
 
-        response = llama.generate_response(prompt, session_history, files_payload, location)
+        if GENERATION_EXECUTOR["MODE"] == "async":
+            response = await generation_executor.run_async(
+                llama.agenerate_response, prompt, session_history, files_payload, location, session_id
+            )
+        else:
+            response = await generation_executor.run(
+                llama.generate_response, prompt, session_history, files_payload, location, session_id
+            )
 
         return {
             "status": 200,
             "model": "llama",
             "response": response
         }
+    except GenerationQueueFullError as e:
+        logger.warning(f"Rejected /generate-chat: {str(e)}")
+        return JSONResponse(
+            status_code=429,
+            content={"status": 429, "message": "Server is busy, please retry shortly."},
+            headers={"Retry-After": str(GENERATION_EXECUTOR["RETRY_AFTER_SECONDS"])}
+        )
+    except GenerationTimeoutError as e:
+        logger.warning(f"Timed out /generate-chat: {str(e)}")
+        return JSONResponse(
+            status_code=503,
+            content={"status": 503, "message": "Response generation timed out, please retry."},
+            headers={"Retry-After": str(GENERATION_EXECUTOR["RETRY_AFTER_SECONDS"])}
+        )
     except Exception as e:
         logger.error(f"Error in /generate-chat: {str(e)}")
         raise SmartSaarthiException("An error occurred while generating chat response.", sys)
 
+@app.post('/generate-chat/stream', tags=["generate"])
+async def generate_chat_stream(request: fastapi.Request):
+    """
+    Server-Sent Events variant of /generate-chat. Emits `token`, `tool_start`, `tool_end` and `place`
+    events while the agent runs and a terminal `final` event carrying the same payload as
+    /generate-chat's `response` (content, location, action, ...).
+    """
+    if not llama.ready:
+        return not_ready_response()
+    try:
+        prompt, session_history, files_payload, location, session_id = await parse_chat_request(request)
+        events = generation_executor.stream_async(
+            llama.astream_response, prompt, session_history, files_payload, location, session_id
+        )
+    except GenerationQueueFullError as e:
+        logger.warning(f"Rejected /generate-chat/stream: {str(e)}")
+        return JSONResponse(
+            status_code=429,
+            content={"status": 429, "message": "Server is busy, please retry shortly."},
+            headers={"Retry-After": str(GENERATION_EXECUTOR["RETRY_AFTER_SECONDS"])}
+        )
+    except Exception as e:
+        logger.error(f"Error in /generate-chat/stream: {str(e)}")
+        raise SmartSaarthiException("An error occurred while generating chat response.", sys)
+
+    async def event_source():
+        try:
+            async for event in events:
+                yield format_sse(event["event"], event["data"])
+        except GenerationTimeoutError as e:
+            logger.warning(f"Timed out /generate-chat/stream: {str(e)}")
+            yield format_sse("error", {"status": 503, "message": "Response generation timed out, please retry."})
+        except GenerationQueueFullError as e:
+            # Filled up between the capacity check and the stream starting
+            logger.warning(f"Rejected /generate-chat/stream: {str(e)}")
+            yield format_sse("error", {"status": 429, "message": "Server is busy, please retry shortly."})
+        except Exception as e:
+            logger.error(f"Error in /generate-chat/stream: {str(e)}")
+            yield format_sse("error", {"status": 500, "message": "An error occurred while generating chat response."})
+        finally:
+            # Client disconnects close this generator; release the executor slot and the agent run now
+            await events.aclose()
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # @app.post('/generate-image', tags=["generate"])
 # async def generate_image(request: fastapi.Request) -> dict:
 #     try:
@@ -271,6 +479,44 @@ async def generate_chat(request: fastapi.Request) -> dict:
 #         }
 #     )
 
+@app.on_event("startup")
+async def startup_event():
+    # Blocking tools (Wikipedia, Arxiv, DuckDuckGo, Google Maps) fall back to the default
+    # executor on the async path, size it for many concurrent network waits
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=GENERATION_EXECUTOR["ASYNC_IO_THREADS"], thread_name_prefix="async-io")
+    )
+    logger.info(f"App imported in {IMPORT_SECONDS}s, startup mode {STARTUP['MODE']}")
+    if STARTUP["MODE"] == "eager":
+        await ensure_loaded(llama)
+        await asyncio.to_thread(warm_llama, llama.get())
+    elif STARTUP["MODE"] == "background":
+        llama.load_in_background(warm_llama)
+
+@app.on_event("shutdown")
+def shutdown_event():
+    generation_executor.shutdown()
+    if llama.ready:
+        llama.session_stores.snapshot_all()
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    workers = int(os.getenv("WEB_CONCURRENCY", SERVING["WORKERS"])) or os.cpu_count()
+    if workers > 1 and hasattr(os, "fork"):
+        from services.prefork import serve_prefork
+        from config.models import SESSION_VECTOR_STORE
+
+        # Requests of one session can land on any worker; session changes are made under a
+        # per-session file lock on top of the latest snapshot, so workers merge rather than overwrite
+        SESSION_VECTOR_STORE["WRITE_THROUGH"] = True
+
+        serve_prefork(
+            app,
+            host="0.0.0.0",
+            port=port,
+            workers=workers,
+            preload_image_models=SERVING["PRELOAD_IMAGE_MODELS"],
+            gc_freeze=SERVING["GC_FREEZE"]
+        )
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
@@ -1,4 +1,13 @@
 SCRAPE_WEBSITE_TOOL = {
     "name": "scrape_website",
     "description": "Scrape the content of a website given its URL. Input should be a valid URL string."
-}
\ No newline at end of file
+}
+
+SCRAPE_WEBSITE_CACHE = {
+    "TTL_SECONDS": 3600,
+    "MAX_URLS": 64,
+    "CHUNK_SIZE": 1000,
+    "CHUNK_OVERLAP": 200,
+    "EMBED_BATCH_SIZE": 64,
+    "REQUEST_TIMEOUT_SECONDS": 15
+}
@@ -1 +1,17 @@
-ALLOWED_FILE_TYPES = {"pdf", "txt", "md", "png", "jpg", "jpeg"}
\ No newline at end of file
+ALLOWED_FILE_TYPES = {"pdf", "txt", "md", "png", "jpg", "jpeg"}
+
+PDF_PROCESSING = {
+    "WORKERS": None,
+    "PAGES_PER_TASK": 8,
+    "MAX_IN_FLIGHT_TASKS": 8
+}
+
+OCR = {
+    "WORKERS": None,
+    "TARGET_DPI": 300,
+    "MAX_DIMENSION": 2500,
+    "TILE_THRESHOLD_PIXELS": 12_000_000,
+    "TILE_HEIGHT": 2000,
+    "TILE_OVERLAP": 100,
+    "CACHE_SIZE": 1024
+}
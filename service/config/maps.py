@@ -0,0 +1,34 @@
+GOOGLE_MAPS = {
+    "TIMEOUT_SECONDS": 10,
+    "RETRY_TIMEOUT_SECONDS": 20,
+    "POOL_MAXSIZE": 32,
+    "CACHE_SIZE": 10000,
+    "SEARCH_TTL_SECONDS": 86400,
+    "NEARBY_TTL_SECONDS": 900,
+    "NEGATIVE_TTL_SECONDS": 300,
+    "RATE_LIMIT_PER_SECOND": 20,
+    "RATE_LIMIT_BURST": 40,
+    "RATE_LIMIT_MAX_WAIT_SECONDS": 2,
+    "NEARBY_MAX_RESULTS": 5,
+    "NEARBY_DISTANCE_WEIGHT": 0.7,
+    "NEARBY_RATING_WEIGHT": 0.3,
+    "PAGE_TOKEN_RETRIES": 3,
+    "PAGE_TOKEN_DELAY_SECONDS": 2
+}
+
+# Optional offline POI data (CSV: name,lat,lng[,address,category,rating] or GeoJSON points).
+# REGISTER_TOOL exposes it to the agent as its own tool, USE_AS_FALLBACK answers find_places_nearby
+# from it when Google Maps is unavailable, rate limited or finds nothing
+LOCAL_POI = {
+    "ENABLED": False,
+    "SOURCES": ["data/poi/charging_stations.csv"],
+    "CELL_DEGREES": 0.05,
+    # Keywords are matched to categories on whole words; these phrases name a category too
+    "CATEGORY_ALIASES": {
+        "ev charger": "charging station",
+        "ev charging": "charging station"
+    },
+    "REGISTER_TOOL": True,
+    "USE_AS_FALLBACK": True,
+    "MAX_RESULTS": 5
+}
@@ -4,8 +4,81 @@ LLAMA = {
     "CHUNK_OVERLAP": 150
 }
 
+# BACKEND is "torch" (sentence-transformers) or "onnx" (ONNX Runtime, optionally int8 quantized).
+# ONNX is opt-in: with VERIFY_PARITY it is checked against the torch model at startup and
+# falls back to torch when they diverge; tests/test_embedding_parity.py runs the same check
 HUGGINGFACE_EMBEDDINGS_MODEL = {
-    "MODEL_NAME": "sentence-transformers/all-MiniLM-L6-v2"
+    "MODEL_NAME": "sentence-transformers/all-MiniLM-L6-v2",
+    "BACKEND": "torch",
+    "ONNX_QUANTIZE": True,
+    "ONNX_INTRA_OP_THREADS": 0,
+    "ONNX_CACHE_DIR": "cache/onnx",
+    "MAX_SEQ_LENGTH": 256,
+    "VERIFY_PARITY": True,
+    "PARITY_THRESHOLD": 0.98
+}
+
+EMBEDDING_BATCHER = {
+    "MAX_BATCH_SIZE": 64,
+    "MAX_WAIT_MS": 5,
+    "QUERY_CACHE_SIZE": 2048
+}
+
+EMBEDDING_CACHE = {
+    "MAX_MEMORY_ENTRIES": 512,
+    "MAX_MEMORY_MB": 256,
+    "DISK_PATH": "cache/embeddings.sqlite3",
+    "MAX_DISK_MB": 2048
+}
+
+# BACKEND is one of "flat", "hnsw", "ivf_flat", "ivf_pq" or "auto" (flat until MIGRATION_THRESHOLD vectors, then AUTO_BACKEND)
+VECTOR_INDEX = {
+    "BACKEND": "auto",
+    "AUTO_BACKEND": "hnsw",
+    "MIGRATION_THRESHOLD": 50000,
+    "HNSW_M": 32,
+    "HNSW_EF_CONSTRUCTION": 200,
+    "HNSW_EF_SEARCH": 64,
+    "IVF_NLIST": None,
+    "IVF_NPROBE": 16,
+    "PQ_M": 16,
+    "PQ_NBITS": 8,
+    "TRAINING_SAMPLE_SIZE": 100000
+}
+
+KNOWLEDGE_BASE = {
+    "DIRECTORY": "knowledge_base",
+    "SNAPSHOT_DIR": "cache/snapshots/knowledge_base",
+    "MMAP": True,
+    "EMBED_BATCH_SIZE": 64
+}
+
+SESSION_VECTOR_STORE = {
+    "IDLE_TTL_SECONDS": 1800,
+    "MAX_TOTAL_VECTORS": 200000,
+    "MAX_MEMORY_MB": 512,
+    "SNAPSHOT_DIR": "cache/snapshots/sessions",
+    "WRITE_THROUGH": False
+}
+
+# Requests with a location or uploaded files bypass the cache, answers that needed tools are never stored
+RESPONSE_CACHE = {
+    "ENABLED": True,
+    "TTL_SECONDS": 21600,
+    "MAX_ENTRIES": 5000,
+    "SEMANTIC_THRESHOLD": 0.92
+}
+
+# History over MAX_HISTORY_TOKENS keeps the newest RECENT_TOKENS verbatim and older turns are folded
+# into a rolling per-session summary once they no longer fit next to it. TOKENIZER falls back to an
+# estimate when it can't be loaded
+CONVERSATION_MEMORY = {
+    "ENABLED": True,
+    "TOKENIZER": "meta-llama/Llama-3.3-70B-Instruct",
+    "MAX_HISTORY_TOKENS": 3000,
+    "RECENT_TOKENS": 1500,
+    "SUMMARY_MAX_TOKENS": 300,
+    "MAX_SESSIONS": 2000
 }
 
 ROUTER_MODEL = {
@@ -42,5 +115,23 @@ IMAGE_CAPTIONING_MODEL = {
 CLIP_MODEL = {
     "MODEL_NAME": "openai/clip-vit-base-patch32",
     "PROCESSOR": "openai/clip-vit-base-patch32",
-    "EMBEDDING_DIM": 512
-}
\ No newline at end of file
+    "EMBEDDING_DIM": 512,
+    "BATCH_SIZE": 32,
+    "EMBEDDING_CACHE_SIZE": 4096
+}
+
+# Exact search is one float16 matmul over the memory-mapped matrix; past ANN_THRESHOLD images an HNSW index is used
+CLIP_INDEX = {
+    "DIRECTORY": "cache/clip_index",
+    "ANN_THRESHOLD": 20000,
+    "HNSW_M": 32,
+    "HNSW_EF_SEARCH": 64,
+    "SEARCH_CHUNK_ROWS": 16384
+}
+IMAGE_UNDERSTANDING = {
+    "MAX_BATCH_SIZE": 8,
+    "MAX_WAIT_MS": 20,
+    "CACHE_SIZE": 1024,
+    "MAX_NEW_TOKENS": 50,
+    "INCLUDE_OCR": True
+}
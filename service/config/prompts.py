@@ -25,4 +25,8 @@ ROUTER_MODEL_SYSTEM_PROMPT = SystemMessage(
 
 GENERIC_TOOLS_PROMPT = {
     "langchain_hub_name": "hwchase17/openai-functions-agent"
-}
\ No newline at end of file
+}
+
+HISTORY_SUMMARY_PROMPT = SystemMessage(
+    content="You maintain a running summary of a support conversation between a user and SmartSaarthi. Given the current summary and the next messages, return the updated summary only. Keep names, locations, booking or ride details, issues raised, what was already tried and anything promised to the user. Keep it in the conversation's language, under {max_words} words."
+)
@@ -0,0 +1,28 @@
+# MODE "async" runs up to MAX_ASYNC_CONCURRENCY generations on the event loop, "threads" runs
+# MAX_WORKERS on a thread pool; either way MAX_QUEUE_SIZE more wait and count toward queue metrics
+GENERATION_EXECUTOR = {
+    "MODE": "async",
+    "MAX_ASYNC_CONCURRENCY": 256,
+    "ASYNC_IO_THREADS": 64,
+    "MAX_WORKERS": 16,
+    "MAX_QUEUE_SIZE": 64,
+    "REQUEST_TIMEOUT_SECONDS": 60,
+    "RETRY_AFTER_SECONDS": 5,
+    "METRICS_WINDOW": 1000
+}
+
+# MODE is "eager" (load models before the port opens), "background" (open the port, warm models
+# on a background thread) or "lazy" (start loading on the first request that needs them). Requests
+# that need the models get 503 with Retry-After until they are loaded
+STARTUP = {
+    "MODE": "background"
+}
+
+# WORKERS > 1 (0 = one per core) serves through a pre-fork parent that loads model weights once
+# (and the knowledge base snapshot) and shares them copy-on-write; each worker keeps its own
+# caches, session stores are kept consistent across workers through locked snapshots
+SERVING = {
+    "WORKERS": 1,
+    "PRELOAD_IMAGE_MODELS": False,
+    "GC_FREEZE": True
+}
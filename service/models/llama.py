@@ -1,17 +1,21 @@
 import sys
 import os
-import json
+import asyncio
 
 from utils.logger import logger
 from utils.exception import SmartSaarthiException
 from langchain_groq import ChatGroq
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
+from langchain_core.messages import SystemMessage, HumanMessage, ToolMessage
 from langgraph.prebuilt import create_react_agent
 
 from services.rag import RAGService
+from services.response_cache import ResponseCache
+from services.conversation_memory import ConversationMemory, TokenCounter
 from tools.generic_tools import GenericTools
+from tools.artifacts import ToolArtifactCollector, PLACE_ARTIFACT
 
-from config.prompts import LLAMA_SYSTEM_PROMPT
+from config.prompts import LLAMA_SYSTEM_PROMPT, HISTORY_SUMMARY_PROMPT
+from config.models import RESPONSE_CACHE, CONVERSATION_MEMORY
 
 from dotenv import load_dotenv
 
@@ -25,6 +29,13 @@ class Llama(RAGService, GenericTools):
         GenericTools.__init__(self, langchain_hub_name=langchain_hub_name)
         self.model_name = model_name
         self.system_prompt = LLAMA_SYSTEM_PROMPT
+        self.response_cache = ResponseCache(
+            embeddings=self.embeddings,
+            ttl_seconds=RESPONSE_CACHE["TTL_SECONDS"],
+            max_entries=RESPONSE_CACHE["MAX_ENTRIES"],
+            semantic_threshold=RESPONSE_CACHE["SEMANTIC_THRESHOLD"],
+            enabled=RESPONSE_CACHE["ENABLED"]
+        )
         try:
             self.llm = ChatGroq(groq_api_key=GROQ_API_KEY, model_name=self.model_name, temperature=0.5)
             self.tools = self.get_generic_tools()
@@ -32,88 +43,215 @@ class Llama(RAGService, GenericTools):
             # Create the agent using LangGraph prebuilt
             # This is the modern replacement for AgentExecutor
             self.agent = create_react_agent(self.llm, self.tools)
+
+            self.conversation_memory = ConversationMemory(
+                summarize=self._summarize_history,
+                token_counter=TokenCounter(CONVERSATION_MEMORY["TOKENIZER"]),
+                max_history_tokens=CONVERSATION_MEMORY["MAX_HISTORY_TOKENS"],
+                recent_tokens=CONVERSATION_MEMORY["RECENT_TOKENS"],
+                max_sessions=CONVERSATION_MEMORY["MAX_SESSIONS"],
+                enabled=CONVERSATION_MEMORY["ENABLED"]
+            )
             
         except Exception as e:
             logger.error(f"Error initializing LLaMA model: {str(e)}")
             raise SmartSaarthiException(f"Failed to initialize LLaMA model ({self.model_name})", sys)
 
 
-    def generate_response(self, prompt: str, session_history: list, files: list, location: dict = None) -> dict:
+    def _summarize_history(self, summary: str, messages: list) -> str:
+        transcript = "\n".join(
+            f"{'User' if isinstance(m, HumanMessage) else 'Assistant'}: {m.content}" for m in messages
+        )
+        instructions = HISTORY_SUMMARY_PROMPT.content.format(max_words=CONVERSATION_MEMORY["SUMMARY_MAX_TOKENS"] * 3 // 4)
+        result = self.llm.invoke(
+            [
+                SystemMessage(content=instructions),
+                HumanMessage(content=f"Current summary:\n{summary or '(none)'}\n\nNext messages:\n{transcript}")
+            ],
+            max_tokens=CONVERSATION_MEMORY["SUMMARY_MAX_TOKENS"]
+        )
+        return result.content.strip()
+
+    def _compact_history(self, session_history: list, session_id: str = None) -> tuple:
+        """(summary, history) within the history token budget; the summary is None for short conversations."""
+        return self.conversation_memory.compact(session_id, session_history or [])
+
+    def _build_input_messages(self, prompt: str, session_history: list, context: str, location: dict = None, summary: str = None) -> list:
+        input_messages = []
+
+        # 1. System Prompt with RAG Context
+        sys_content = self.system_prompt.content
+        if context:
+            sys_content += f"\n\nRelevant Context:\n{context}"
+
+        if summary:
+            sys_content += f"\n\nSummary of the earlier conversation:\n{summary}"
+
+        if location:
+            sys_content += f"\n\n[System Note: User is currently at Latitude: {location.get('lat')}, Longitude: {location.get('lng')}. Use this precise location for any 'near me' or distance-related queries.]"
+
+        input_messages.append(SystemMessage(content=sys_content))
+
+        # 2. History
+        input_messages.extend(session_history or [])
+
+        # 3. New User Message
+        input_messages.append(HumanMessage(content=prompt))
+        return input_messages
+
+    @staticmethod
+    def _place_payload(artifact: dict) -> dict:
+        payload = {
+            "location": artifact["location"],
+            "action": "OPEN_MAPS",
+            "place_name": artifact.get("name"),
+            "address": artifact.get("address")
+        }
+        # Ranked alternatives from nearby searches, so the client doesn't ask again
+        if artifact.get("places"):
+            payload["places"] = artifact["places"]
+            payload["next_page_token"] = artifact.get("next_page_token")
+        return payload
+
+    def _build_final_response(self, output_messages: list, collector: ToolArtifactCollector) -> dict:
+        last_message = output_messages[-1]
+        final_content = last_message.content if hasattr(last_message, "content") else str(last_message)
+
+        final_response = {
+            "content": final_content,
+            "location": None,
+            "action": None
+        }
+
+        # The latest place a maps tool found during this run, collected as the tool finished
+        place = collector.latest(PLACE_ARTIFACT)
+        if place is not None:
+            final_response.update(self._place_payload(place))
+        return final_response
+
+    def _prepare_request(self, prompt: str, session_history: list, files: list, location: dict = None, session_id: str = None) -> tuple:
+        """
+        Checks the response cache and retrieves context on a miss.
+        Returns (context, cache_key, cached_response), cache_key is None when the request bypasses the cache
+        and context is None on a hit.
+        """
+        if not self.response_cache.enabled:
+            return self._prepare_context(prompt, files, session_id), None, None
+        if location or files:
+            # Location answers and fresh uploads are specific to this request
+            self.response_cache.record_bypass()
+            return self._prepare_context(prompt, files, session_id), None, None
+        history = [(type(m).__name__, m.content) for m in session_history or []]
+        # Keyed on the versions of the indexes retrieval reads, so a hit skips the embedding and search
+        cache_key = ResponseCache.fingerprint(self.model_name, self.system_prompt.content, self._context_version(session_id), history)
+        cached = self.response_cache.get(prompt, cache_key)
+        if cached is not None:
+            return None, cache_key, cached
+        return self._prepare_context(prompt, files, session_id), cache_key, None
+
+    def _store_response(self, prompt: str, cache_key: str, output_messages: list, response: dict):
+        # Tool results (maps, web search) go stale, only cache answers the model gave on its own
+        if cache_key is None or any(isinstance(m, ToolMessage) for m in output_messages):
+            return
         try:
-            self._ingest_files(files)
+            self.response_cache.put(prompt, cache_key, response)
+        except Exception as e:
+            logger.error(f"Failed to cache response: {str(e)}")
 
-            context = self._retrieve_context(prompt)
+    def generate_response(self, prompt: str, session_history: list, files: list, location: dict = None, session_id: str = None) -> dict:
+        try:
+            context, cache_key, cached = self._prepare_request(prompt, session_history, files, location, session_id)
+            if cached is not None:
+                return cached
 
-            history = session_history or []
-            
-            # Prepare Input Messages
-            input_messages = []
-            
-            # 1. System Prompt with RAG Context
-            sys_content = self.system_prompt.content
-            if context:
-                sys_content += f"\n\nRelevant Context:\n{context}"
-            
-            if location:
-                sys_content += f"\n\n[System Note: User is currently at Latitude: {location.get('lat')}, Longitude: {location.get('lng')}. Use this precise location for any 'near me' or distance-related queries.]"
-            
-            input_messages.append(SystemMessage(content=sys_content))
-            
-            # 2. History
-            input_messages.extend(history)
-            
-            # 3. New User Message
-            input_messages.append(HumanMessage(content=prompt))
+            summary, history = self._compact_history(session_history, session_id)
+            input_messages = self._build_input_messages(prompt, history, context, location, summary)
 
             # Execute Agent
             # LangGraph agent expects {"messages": [...]}
-            result = self.agent.invoke({"messages": input_messages})
-            
+            collector = ToolArtifactCollector()
+            result = self.agent.invoke({"messages": input_messages}, config={"callbacks": [collector]})
+
             # Result contains all messages including tool calls and outputs
             output_messages = result.get("messages", [])
-            last_message = output_messages[-1]
-            final_content = last_message.content if hasattr(last_message, "content") else str(last_message)
-            
-            final_response = {
-                "content": final_content,
-                "location": None,
-                "action": None
-            }
-            
-            # Iterate backwards to find the last successful Google Maps tool output
-            for msg in reversed(output_messages):
-                if isinstance(msg, ToolMessage):
-                    # Tool output is in msg.content, usually as string. We need to parse it if it's JSON.
-                    # Or check msg.name if available, but ToolMessage usually acts on tool_call_id.
-                    # We have to infer from the content or check the preceding AIMessage's tool_calls.
-                    
-                    try:
-                        # Attempt to parse specific known tool outputs
-                        # Since our tool returns a dict, LangChain stringifies it.
-                        content_str = msg.content
-                        if "lat" in content_str and "lng" in content_str and "status" in content_str: # Heuristic check
-                            # Try parsing loose JSON or just dict string representation? 
-                            # If it's real JSON:
-                            import ast
-                            try:
-                                observation = json.loads(content_str)
-                            except:
-                                try:
-                                    observation = ast.literal_eval(content_str)
-                                except:
-                                    observation = {}
-                                    
-                            if isinstance(observation, dict) and observation.get("status") == "found":
-                                final_response["location"] = observation.get("location")
-                                final_response["action"] = "OPEN_MAPS"
-                                final_response["place_name"] = observation.get("name")
-                                final_response["address"] = observation.get("address")
-                                break # Found the latest location
-                    except:
-                        continue
-
-            return final_response
+            response = self._build_final_response(output_messages, collector)
+            self._store_response(prompt, cache_key, output_messages, response)
+            return response
 
         except Exception as e:
             logger.error(f"Error generating response: {str(e)}")
-            raise SmartSaarthiException(f"Failed to generate response from LLaMA model ({self.model_name})", sys)
\ No newline at end of file
+            raise SmartSaarthiException(f"Failed to generate response from LLaMA model ({self.model_name})", sys)
+
+    async def agenerate_response(self, prompt: str, session_history: list, files: list, location: dict = None, session_id: str = None) -> dict:
+        try:
+            # Embedding and FAISS search are CPU bound, keep them off the event loop
+            context, cache_key, cached = await asyncio.to_thread(
+                self._prepare_request, prompt, session_history, files, location, session_id
+            )
+            if cached is not None:
+                return cached
+
+            # Folding old turns into the summary is a blocking LLM call, when it's needed at all
+            summary, history = await asyncio.to_thread(self._compact_history, session_history, session_id)
+            input_messages = self._build_input_messages(prompt, history, context, location, summary)
+
+            # ToolNode gathers the tool calls of a single step concurrently on the async path
+            collector = ToolArtifactCollector()
+            result = await self.agent.ainvoke({"messages": input_messages}, config={"callbacks": [collector]})
+
+            output_messages = result.get("messages", [])
+            response = self._build_final_response(output_messages, collector)
+            await asyncio.to_thread(self._store_response, prompt, cache_key, output_messages, response)
+            return response
+
+        except Exception as e:
+            logger.error(f"Error generating response: {str(e)}")
+            raise SmartSaarthiException(f"Failed to generate response from LLaMA model ({self.model_name})", sys)
+
+    async def astream_response(self, prompt: str, session_history: list, files: list, location: dict = None, session_id: str = None):
+        """
+        Async generator over agent events for streaming clients. Yields dicts of the form
+        {"event": "token" | "tool_start" | "tool_end" | "place" | "final", "data": ...}; `place` carries
+        the location/action payload as soon as a maps tool finds something, ahead of the answer text.
+        """
+        try:
+            context, cache_key, cached = await asyncio.to_thread(
+                self._prepare_request, prompt, session_history, files, location, session_id
+            )
+            if cached is not None:
+                yield {"event": "token", "data": {"content": cached["content"]}}
+                yield {"event": "final", "data": cached}
+                return
+
+            # Folding old turns into the summary is a blocking LLM call, when it's needed at all
+            summary, history = await asyncio.to_thread(self._compact_history, session_history, session_id)
+            input_messages = self._build_input_messages(prompt, history, context, location, summary)
+            output_messages = input_messages
+            collector = ToolArtifactCollector()
+
+            async for event in self.agent.astream_events({"messages": input_messages}, config={"callbacks": [collector]}, version="v2"):
+                kind = event["event"]
+                if kind == "on_chat_model_stream":
+                    chunk = event["data"].get("chunk")
+                    # Tool-calling steps stream empty content, only forward speakable text
+                    if chunk is not None and chunk.content:
+                        yield {"event": "token", "data": {"content": chunk.content}}
+                elif kind == "on_tool_start":
+                    yield {"event": "tool_start", "data": {"name": event["name"], "input": event["data"].get("input")}}
+                elif kind == "on_tool_end":
+                    output = event["data"].get("output")
+                    yield {"event": "tool_end", "data": {"name": event["name"], "output": getattr(output, "content", output)}}
+                    artifact = getattr(output, "artifact", None)
+                    if artifact and artifact.get("type") == PLACE_ARTIFACT:
+                        yield {"event": "place", "data": self._place_payload(artifact)}
+                elif kind == "on_chain_end" and not event.get("parent_ids"):
+                    # Root graph run finished, its output carries the full transcript
+                    output_messages = event["data"].get("output", {}).get("messages", output_messages)
+
+            response = self._build_final_response(output_messages, collector)
+            await asyncio.to_thread(self._store_response, prompt, cache_key, output_messages, response)
+            yield {"event": "final", "data": response}
+
+        except Exception as e:
+            logger.error(f"Error streaming response: {str(e)}")
+            raise SmartSaarthiException(f"Failed to stream response from LLaMA model ({self.model_name})", sys)
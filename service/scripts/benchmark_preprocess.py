@@ -0,0 +1,83 @@
+"""
+Benchmarks the fused NumPy caption preprocessing against the original PIL chain.
+
+Usage (from the service directory):
+    python scripts/benchmark_preprocess.py [--images 32] [--width 1920] [--height 1080]
+
+Both paths end at the captioning model's input resolution, the PIL chain runs at full
+resolution first and is resized afterwards, the way the processor used to receive it.
+"""
+import os
+import sys
+import time
+import argparse
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.models import IMAGE_CAPTIONING_MODEL
+from services.image_captioning import ImageCaptioningService
+from services.image_preprocessing import preprocess_batch
+
+INPUT_SIZE = (384, 384)
+
+def synthetic_images(count: int, width: int, height: int) -> list:
+    """Screenshot-like JPEGs: flat panels, gradients and some noise."""
+    rng = np.random.default_rng(0)
+    images = []
+    for _ in range(count):
+        x = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+        y = np.linspace(0, 255, height, dtype=np.float32)[:, None, None]
+        pixels = (0.5 * x + 0.5 * y + rng.normal(0, 12, (height, width, 3))).clip(0, 255).astype(np.uint8)
+        top = rng.integers(0, height // 2)
+        pixels[top:top + height // 4, width // 8:width // 2] = rng.integers(0, 255, 3)
+        buffer = BytesIO()
+        Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+def run_reference(service: ImageCaptioningService, images: list) -> np.ndarray:
+    outputs = []
+    for data in images:
+        image = service.preprocess_image_reference(Image.open(BytesIO(data)).convert("RGB"))
+        outputs.append(np.asarray(image.resize(INPUT_SIZE, Image.BILINEAR)))
+    return np.stack(outputs)
+
+def timed(fn, *args, repeats: int = 3) -> tuple:
+    result = fn(*args)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn(*args)
+    return result, (time.perf_counter() - started) / repeats
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=32)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    args = parser.parse_args()
+
+    # The preprocessing chains never touch the model, so it is never loaded here
+    service = ImageCaptioningService(
+        model_name=IMAGE_CAPTIONING_MODEL["MODEL_NAME"],
+        task=IMAGE_CAPTIONING_MODEL["TASK"],
+        processor_name=IMAGE_CAPTIONING_MODEL["PROCESSOR"]
+    )
+    images = synthetic_images(args.images, args.width, args.height)
+
+    reference, reference_seconds = timed(run_reference, service, images)
+    fused, fused_seconds = timed(preprocess_batch, images, INPUT_SIZE)
+
+    per_image = lambda seconds: seconds / len(images) * 1000
+    print(f"images: {len(images)} at {args.width}x{args.height}")
+    print(f"PIL chain:   {per_image(reference_seconds):8.2f} ms/image")
+    print(f"fused NumPy: {per_image(fused_seconds):8.2f} ms/image")
+    print(f"speedup:     {reference_seconds / fused_seconds:8.2f}x")
+    print(f"mean abs pixel difference: {np.abs(reference.astype(np.int16) - fused.astype(np.int16)).mean():.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
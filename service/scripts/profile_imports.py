@@ -0,0 +1,62 @@
+"""
+Import-time profile of the service.
+
+Usage (from the service directory):
+    python scripts/profile_imports.py [--module app] [--top 25]
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter and prints the total
+wall time plus the slowest top-level packages and individual modules by cumulative time.
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def parse_importtime(stderr: str) -> list:
+    """Returns (module, self_us, cumulative_us) rows from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {args.module}"],
+        cwd=SERVICE_DIR,
+        capture_output=True,
+        text=True
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        print(result.stderr.splitlines()[-1] if result.stderr else "import failed")
+        return result.returncode
+
+    rows = parse_importtime(result.stderr)
+    packages = {}
+    for name, self_us, _ in rows:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+
+    print(f"import {args.module}: {wall:.2f}s wall (including interpreter start), {len(rows)} modules")
+    print("\nslowest packages (self time summed):")
+    for package, self_us in sorted(packages.items(), key=lambda p: -p[1])[:args.top]:
+        print(f"  {self_us / 1e6:8.3f}s  {package}")
+    print("\nslowest modules (cumulative):")
+    for name, _, cumulative_us in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"  {cumulative_us / 1e6:8.3f}s  {name}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,29 @@
 import sys
-import torch
+import hashlib
+import threading
 from io import BytesIO
+from collections import OrderedDict
 from PIL import Image
 from typing import Union, List
 import numpy as np
 
-from transformers import CLIPProcessor, CLIPModel
-
 from utils.logger import logger
 from utils.exception import SmartSaarthiException
+from config.models import CLIP_MODEL, CLIP_INDEX
 
 class ClipService:
-    def __init__(self, model_name: str, processor_name: str):
+    def __init__(self, model_name: str, processor_name: str, batch_size: int = 32, cache_size: int = 4096):
         try:
+            # torch/transformers are only imported once a CLIP service is actually built
+            from transformers import CLIPProcessor, CLIPModel
+
             logger.info(f"Loading CLIP model: {model_name}")
             self.model_name = model_name
+            self.batch_size = batch_size
+            self.cache_size = cache_size
+            self._image_cache = OrderedDict()
+            self._cache_lock = threading.Lock()
+            self._image_index = None
             self.processor = CLIPProcessor.from_pretrained(processor_name)
             self.model = CLIPModel.from_pretrained(model_name)
             self.model.eval()
@@ -28,6 +37,8 @@ class ClipService:
             if isinstance(text, str):
                 text = [text]
             
+            import torch
+
             inputs = self.processor(text=text, return_tensors="pt", padding=True, truncation=True)
             
             with torch.no_grad():
@@ -41,34 +52,58 @@ class ClipService:
             logger.error(f"Text encoding error: {str(e)}")
             raise SmartSaarthiException(f"Text encoding error: {str(e)}", sys)
     
-    def encode_image(self, image_input: Union[bytes, Image.Image, List[Union[bytes, Image.Image]]]) -> np.ndarray:
+    def _load_image(self, img) -> Image.Image:
+        if isinstance(img, bytes):
+            return Image.open(BytesIO(img)).convert("RGB")
+        if isinstance(img, Image.Image):
+            return img.convert("RGB")
+        raise ValueError(f"Unsupported image type: {type(img)}")
+
+    def encode_image(self, image_input: Union[bytes, Image.Image, List[Union[bytes, Image.Image]]], batch_size: int = None) -> np.ndarray:
+        """Encodes images in chunks of batch_size, so only one chunk is decoded and in the vision tower at a time."""
         try:
             if not isinstance(image_input, list):
                 image_input = [image_input]
+            batch_size = batch_size or self.batch_size
+            import torch
             
-            images = []
-            for img in image_input:
-                if isinstance(img, bytes):
-                    img = Image.open(BytesIO(img)).convert("RGB")
-                elif isinstance(img, Image.Image):
-                    img = img.convert("RGB")
-                else:
-                    raise ValueError(f"Unsupported image type: {type(img)}")
-                images.append(img)
-            
-            inputs = self.processor(images=images, return_tensors="pt", padding=True)
+            chunks = []
+            for start in range(0, len(image_input), batch_size):
+                images = [self._load_image(img) for img in image_input[start:start + batch_size]]
+                inputs = self.processor(images=images, return_tensors="pt", padding=True)
+                
+                with torch.no_grad():
+                    image_features = self.model.get_image_features(**inputs)
+                    # Normalize embeddings
+                    image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+                chunks.append(image_features.cpu().numpy())
             
-            with torch.no_grad():
-                image_features = self.model.get_image_features(**inputs)
-                # Normalize embeddings
-                image_features = image_features / image_features.norm(dim=-1, keepdim=True)
-            
-            embeddings = image_features.cpu().numpy()
-            logger.info(f"Encoded {len(images)} image(s) into embeddings of shape {embeddings.shape}")
+            embeddings = np.vstack(chunks)
+            logger.info(f"Encoded {len(image_input)} image(s) into embeddings of shape {embeddings.shape}")
             return embeddings
         except Exception as e:
             logger.error(f"Image encoding error: {str(e)}")
             raise SmartSaarthiException(f"Image encoding error: {str(e)}", sys)
+
+    def encode_image_cached(self, images: List[bytes]) -> np.ndarray:
+        """encode_image for raw bytes, memoized by content hash so repeated candidates are encoded once."""
+        keys = [hashlib.sha256(b).hexdigest() for b in images]
+        with self._cache_lock:
+            cached = {k: self._image_cache[k] for k in keys if k in self._image_cache}
+        missing = {}
+        for key, data in zip(keys, images):
+            if key not in cached:
+                missing.setdefault(key, data)
+        if missing:
+            encoded = self.encode_image(list(missing.values()))
+            cached.update(zip(missing.keys(), encoded))
+        with self._cache_lock:
+            for key in keys:
+                self._image_cache[key] = cached[key]
+                self._image_cache.move_to_end(key)
+            while len(self._image_cache) > self.cache_size:
+                self._image_cache.popitem(last=False)
+        return np.stack([cached[k] for k in keys])
     
     def compute_similarity(self, text_embeddings: np.ndarray, image_embeddings: np.ndarray) -> np.ndarray:
         try:
@@ -85,7 +120,10 @@ class ClipService:
     def find_best_match(self, query: str, image_inputs: List[Union[bytes, Image.Image]]) -> int:
         try:
             text_embedding = self.encode_text(query)
-            image_embeddings = self.encode_image(image_inputs)
+            if all(isinstance(img, bytes) for img in image_inputs):
+                image_embeddings = self.encode_image_cached(image_inputs)
+            else:
+                image_embeddings = self.encode_image(image_inputs)
             
             similarities = self.compute_similarity(text_embedding, image_embeddings)
             best_idx = np.argmax(similarities[0])
@@ -94,4 +132,64 @@ class ClipService:
             return int(best_idx)
         except Exception as e:
             logger.error(f"Best match search error: {str(e)}")
-            raise SmartSaarthiException(f"Best match search error: {str(e)}", sys)
\ No newline at end of file
+            raise SmartSaarthiException(f"Best match search error: {str(e)}", sys)
+
+    def image_index(self):
+        """The persistent image index (CLIP_INDEX), opened on first use."""
+        from services.clip_index import ClipImageIndex
+
+        with self._cache_lock:
+            if self._image_index is None:
+                self._image_index = ClipImageIndex(
+                    self,
+                    directory=CLIP_INDEX["DIRECTORY"],
+                    batch_size=self.batch_size,
+                    ann_threshold=CLIP_INDEX["ANN_THRESHOLD"],
+                    hnsw_m=CLIP_INDEX["HNSW_M"],
+                    hnsw_ef_search=CLIP_INDEX["HNSW_EF_SEARCH"],
+                    search_chunk_rows=CLIP_INDEX["SEARCH_CHUNK_ROWS"],
+                    embedding_dim=CLIP_MODEL["EMBEDDING_DIM"]
+                )
+            return self._image_index
+
+    def index_images(self, images: List[tuple]) -> int:
+        """Adds (image_id, bytes) pairs to the persistent index, returns how many were new."""
+        try:
+            return self.image_index().add(images)
+        except Exception as e:
+            logger.error(f"Image indexing error: {str(e)}")
+            raise SmartSaarthiException(f"Image indexing error: {str(e)}", sys)
+
+    def search_images(self, query: str, k: int = 5) -> list:
+        """Top-k (image_id, similarity) from the persistent index for a text query."""
+        try:
+            return self.image_index().search(query, k)
+        except Exception as e:
+            logger.error(f"Image search error: {str(e)}")
+            raise SmartSaarthiException(f"Image search error: {str(e)}", sys)
+
+    def stats(self) -> dict:
+        with self._cache_lock:
+            cached = len(self._image_cache)
+            index = self._image_index
+        return {"cached_image_embeddings": cached, "image_index": index.stats() if index is not None else {}}
+
+_clip_service = None
+_clip_service_lock = threading.Lock()
+
+def get_clip_service() -> ClipService:
+    """The process-wide CLIP service built from CLIP_MODEL; the model is loaded on first call."""
+    global _clip_service
+    if _clip_service is None:
+        with _clip_service_lock:
+            if _clip_service is None:
+                _clip_service = ClipService(
+                    model_name=CLIP_MODEL["MODEL_NAME"],
+                    processor_name=CLIP_MODEL["PROCESSOR"],
+                    batch_size=CLIP_MODEL["BATCH_SIZE"],
+                    cache_size=CLIP_MODEL["EMBEDDING_CACHE_SIZE"]
+                )
+    return _clip_service
+
+def clip_service_stats() -> dict:
+    return _clip_service.stats() if _clip_service is not None else {}
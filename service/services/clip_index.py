@@ -0,0 +1,207 @@
+import os
+import json
+import hashlib
+import threading
+
+import numpy as np
+
+from utils.logger import logger
+
+EMBEDDINGS_FILE = "embeddings.f16"
+META_FILE = "meta.json"
+# One [image_id, content_hash] JSON line per row, appended as rows are added
+IDS_FILE = "ids.jsonl"
+_MIN_CAPACITY = 1024
+
+class ClipImageIndex:
+    """
+    Persistent text-to-image index over CLIP image embeddings.
+    Normalized embeddings live in a memory-mapped float16 matrix that grows by doubling,
+    with ids and content hashes appended to a JSON-lines sidecar and the row count in a small
+    meta file, so adding images never rewrites what is already stored. Images are encoded once, in chunks of
+    batch_size; queries are a single matmul over the matrix, or an HNSW inner-product
+    index once the collection passes ann_threshold images. With embedding_dim set, a stored index
+    or encoder output of any other width is rejected instead of being read with the wrong shape.
+    """
+    def __init__(self, clip_service, directory: str, batch_size: int = 32, ann_threshold: int = 20000, hnsw_m: int = 32, hnsw_ef_search: int = 64, search_chunk_rows: int = 16384, embedding_dim: int = None):
+        self.clip = clip_service
+        self.directory = directory
+        self.embedding_dim = embedding_dim
+        self.batch_size = batch_size
+        self.ann_threshold = ann_threshold
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_search = hnsw_ef_search
+        self.search_chunk_rows = search_chunk_rows
+        self.dim = None
+        self.count = 0
+        self.ids = []
+        self.hashes = {}
+        self._matrix = None
+        self._ann = None
+        self._ann_count = 0
+        self._lock = threading.RLock()
+        self._load()
+
+    @property
+    def _embeddings_path(self) -> str:
+        return os.path.join(self.directory, EMBEDDINGS_FILE)
+
+    def _load(self):
+        meta_path = os.path.join(self.directory, META_FILE)
+        if not os.path.exists(meta_path):
+            return
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("model") != self.clip.model_name:
+            logger.info(f"CLIP index at {self.directory} was built with {meta.get('model')}, starting a new one")
+            return
+        self._check_dim(meta["dim"], meta_path)
+        expected_bytes = meta["capacity"] * meta["dim"] * np.dtype(np.float16).itemsize
+        actual_bytes = os.path.getsize(self._embeddings_path) if os.path.exists(self._embeddings_path) else 0
+        if actual_bytes != expected_bytes:
+            raise ValueError(f"CLIP index at {self.directory} has {actual_bytes} bytes of embeddings, expected {expected_bytes} for {meta['capacity']}x{meta['dim']}")
+        self.dim = meta["dim"]
+        self.count = meta["count"]
+        rows, uncommitted = [], False
+        if os.path.exists(self._ids_path):
+            with open(self._ids_path) as f:
+                for line in f:
+                    if len(rows) == self.count:
+                        uncommitted = True
+                        break
+                    rows.append(json.loads(line))
+        if len(rows) < self.count:
+            raise ValueError(f"CLIP index at {self.directory} lists {self.count} images but has ids for {len(rows)}")
+        if uncommitted:
+            # Lines past count come from an add that crashed before committing, drop them
+            self._rewrite_ids(rows)
+        self.ids = [image_id for image_id, _ in rows]
+        self.hashes = {digest: image_id for image_id, digest in rows}
+        self._matrix = np.memmap(self._embeddings_path, dtype=np.float16, mode="r+", shape=(meta["capacity"], self.dim))
+        logger.info(f"Loaded CLIP index with {self.count} images from {self.directory}")
+
+    def _check_dim(self, dim: int, source: str):
+        if self.embedding_dim is not None and dim != self.embedding_dim:
+            raise ValueError(f"CLIP embeddings from {source} are {dim}-dimensional, expected {self.embedding_dim}")
+
+    @property
+    def _ids_path(self) -> str:
+        return os.path.join(self.directory, IDS_FILE)
+
+    def _rewrite_ids(self, rows: list):
+        tmp_path = f"{self._ids_path}.tmp"
+        with open(tmp_path, "w") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        os.replace(tmp_path, self._ids_path)
+
+    def _append_ids(self, rows: list):
+        with open(self._ids_path, "a") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _save_meta(self):
+        meta = {
+            "model": self.clip.model_name,
+            "dim": self.dim,
+            "count": self.count,
+            "capacity": self._matrix.shape[0]
+        }
+        tmp_path = os.path.join(self.directory, f"{META_FILE}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(self.directory, META_FILE))
+
+    def _reserve(self, rows: int):
+        capacity = self._matrix.shape[0] if self._matrix is not None else 0
+        if self.count + rows <= capacity:
+            return
+        new_capacity = max(_MIN_CAPACITY, capacity * 2, self.count + rows)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self._embeddings_path}.tmp"
+        grown = np.memmap(tmp_path, dtype=np.float16, mode="w+", shape=(new_capacity, self.dim))
+        if self.count:
+            grown[:self.count] = self._matrix[:self.count]
+        grown.flush()
+        del grown
+        self._matrix = None
+        os.replace(tmp_path, self._embeddings_path)
+        self._matrix = np.memmap(self._embeddings_path, dtype=np.float16, mode="r+", shape=(new_capacity, self.dim))
+
+    def add(self, images: list) -> int:
+        """
+        Indexes (image_id, bytes) pairs, skipping images whose content is already indexed.
+        Returns the number of images added.
+        """
+        with self._lock:
+            pending = []
+            seen = set()
+            for image_id, data in images:
+                digest = hashlib.sha256(data).hexdigest()
+                if digest in self.hashes or digest in seen:
+                    continue
+                seen.add(digest)
+                pending.append((image_id, digest, data))
+            added = 0
+            for start in range(0, len(pending), self.batch_size):
+                chunk = pending[start:start + self.batch_size]
+                vectors = self.clip.encode_image([data for _, _, data in chunk], batch_size=self.batch_size)
+                if self.dim is None:
+                    self._check_dim(vectors.shape[1], self.clip.model_name)
+                    self.dim = vectors.shape[1]
+                self._reserve(len(chunk))
+                self._matrix[self.count:self.count + len(chunk)] = vectors.astype(np.float16)
+                self._matrix.flush()
+                self._append_ids([[image_id, digest] for image_id, digest, _ in chunk])
+                # Rows and ids are durable before meta advances count, so a crash never exposes garbage rows
+                self.count += len(chunk)
+                for image_id, digest, _ in chunk:
+                    self.ids.append(image_id)
+                    self.hashes[digest] = image_id
+                self._save_meta()
+                added += len(chunk)
+            return added
+
+    def _ensure_ann(self):
+        import faiss
+
+        if self._ann is None:
+            self._ann = faiss.IndexHNSWFlat(self.dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            self._ann.hnsw.efSearch = self.hnsw_ef_search
+            self._ann_count = 0
+        if self._ann_count < self.count:
+            self._ann.add(np.ascontiguousarray(self._matrix[self._ann_count:self.count], dtype=np.float32))
+            self._ann_count = self.count
+
+    def search(self, query: str, k: int = 5) -> list:
+        """Top-k (image_id, similarity) for a text query, similarity rescaled to [0, 1] like ClipService."""
+        with self._lock:
+            if not self.count:
+                return []
+            k = min(k, self.count)
+            text = self.clip.encode_text(query)[0].astype(np.float32)
+            if self.count >= self.ann_threshold:
+                self._ensure_ann()
+                scores, rows = self._ann.search(text[None], k)
+                hits = [(int(r), float(s)) for r, s in zip(rows[0], scores[0]) if r >= 0]
+            else:
+                scores = np.empty(self.count, dtype=np.float32)
+                for start in range(0, self.count, self.search_chunk_rows):
+                    end = min(start + self.search_chunk_rows, self.count)
+                    # float16 is only the storage format, upcast chunk by chunk so the matmul runs on BLAS
+                    scores[start:end] = self._matrix[start:end].astype(np.float32) @ text
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top])]
+                hits = [(int(r), float(scores[r])) for r in top]
+            return [(self.ids[r], (score + 1) / 2) for r, score in hits]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "images": self.count,
+                "dim": self.dim,
+                "capacity": self._matrix.shape[0] if self._matrix is not None else 0,
+                "ann": self.count >= self.ann_threshold
+            }
@@ -0,0 +1,177 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+from langchain_core.messages import HumanMessage
+
+from utils.logger import logger
+
+# Role header and end-of-turn tokens the chat template adds around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+class TokenCounter:
+    """
+    Counts tokens with the model's Hugging Face tokenizer, loaded on first use. If it can't be
+    loaded (offline, gated repo, `tokenizers` missing) counts fall back to UTF-8 bytes / 4, which
+    overestimates English slightly and keeps Devanagari, at ~3 bytes a character, on the safe side.
+    """
+    def __init__(self, tokenizer_name: str):
+        self.tokenizer_name = tokenizer_name
+        self._tokenizer = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                from tokenizers import Tokenizer
+
+                self._tokenizer = Tokenizer.from_pretrained(self.tokenizer_name, auth_token=os.getenv("HUGGINGFACE_ACCESS_TOKEN"))
+            except Exception as e:
+                logger.warning(f"Tokenizer {self.tokenizer_name} unavailable, estimating token counts: {str(e)}")
+            self._loaded = True
+
+    @property
+    def exact(self) -> bool:
+        return self._tokenizer is not None
+
+    def count(self, text: str) -> int:
+        if not self._loaded:
+            self._load()
+        if self._tokenizer is not None:
+            return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+        return len(text.encode("utf-8")) // 4 + 1
+
+    def count_message(self, message) -> int:
+        return self.count(str(message.content)) + MESSAGE_OVERHEAD_TOKENS
+
+class _SessionSummary:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.covered = 0
+        self.digest = ""
+        self.summary = None
+        self.tokens = 0
+
+def _chain(digest: str, message) -> str:
+    return hashlib.sha256(f"{digest}\x00{type(message).__name__}\x00{message.content}".encode("utf-8")).hexdigest()
+
+class ConversationMemory:
+    """
+    Keeps the history sent to the model under a token budget. The newest messages that fit in
+    recent_tokens (starting on a user turn) stay verbatim; older ones stay verbatim too while they
+    fit next to the summary, and are folded into the session's rolling summary in one call once
+    they don't. The summary is cached per session with a hash chain over the messages it covers,
+    so each turn only summarizes what is new, and a client that rewrites history gets a fresh one.
+    """
+    def __init__(self, summarize, token_counter: TokenCounter, max_history_tokens: int = 3000, recent_tokens: int = 1500, max_sessions: int = 2000, enabled: bool = True):
+        # summarize(previous_summary: str | None, messages: list) -> str
+        self.summarize = summarize
+        self.token_counter = token_counter
+        self.max_history_tokens = max_history_tokens
+        self.recent_tokens = recent_tokens
+        self.max_sessions = max_sessions
+        self.enabled = enabled
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "compacted": 0, "summaries": 0, "summary_failures": 0, "summary_resets": 0, "tokens_in": 0, "tokens_out": 0}
+
+    @staticmethod
+    def session_key(session_id: str, messages: list) -> str:
+        if session_id:
+            return session_id
+        # Without a session id the opening message identifies the conversation well enough,
+        # the hash chain catches anything that doesn't actually continue it
+        return "anonymous:" + _chain("", messages[0])
+
+    def _session(self, key: str) -> _SessionSummary:
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                entry = self._sessions[key] = _SessionSummary()
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return entry
+
+    def _recent_start(self, counts: list) -> int:
+        """Index where the verbatim tail starts: as many newest messages as fit, at least one."""
+        start, used = len(counts) - 1, counts[-1]
+        while start > 0 and used + counts[start - 1] <= self.recent_tokens:
+            start -= 1
+            used += counts[start]
+        return start
+
+    def compact(self, session_id: str, messages: list) -> tuple:
+        """Returns (summary or None, messages to send verbatim)."""
+        if not self.enabled or not messages:
+            return None, messages
+        counts = [self.token_counter.count_message(m) for m in messages]
+        total = sum(counts)
+        with self._lock:
+            self._counters["requests"] += 1
+            self._counters["tokens_in"] += total
+        if total <= self.max_history_tokens:
+            with self._lock:
+                self._counters["tokens_out"] += total
+            return None, messages
+
+        split = self._recent_start(counts)
+        # Don't open the verbatim tail on an assistant reply to a question that was summarized away
+        while split < len(messages) - 1 and not isinstance(messages[split], HumanMessage):
+            split += 1
+        recent_tokens = sum(counts[split:])
+
+        entry = self._session(self.session_key(session_id, messages))
+        with entry.lock:
+            digest = ""
+            if entry.covered <= split:
+                for message in messages[:entry.covered]:
+                    digest = _chain(digest, message)
+            if entry.covered > split or digest != entry.digest:
+                if entry.covered:
+                    with self._lock:
+                        self._counters["summary_resets"] += 1
+                entry.covered, entry.digest, entry.summary, entry.tokens = 0, "", None, 0
+                digest = ""
+
+            pending = messages[entry.covered:split]
+            pending_tokens = sum(counts[entry.covered:split])
+            if entry.tokens + pending_tokens + recent_tokens <= self.max_history_tokens:
+                history, summary = pending + messages[split:], entry.summary
+            else:
+                try:
+                    summary = self.summarize(entry.summary, pending)
+                    for message in pending:
+                        digest = _chain(digest, message)
+                    entry.covered, entry.digest, entry.summary = split, digest, summary
+                    entry.tokens = self.token_counter.count(summary)
+                    with self._lock:
+                        self._counters["summaries"] += 1
+                except Exception as e:
+                    # Answer with the older summary and the recent turns, folding is retried next turn
+                    logger.error(f"Failed to summarize conversation history: {str(e)}")
+                    with self._lock:
+                        self._counters["summary_failures"] += 1
+                    summary = entry.summary
+                history = messages[split:]
+            summary_tokens = entry.tokens if summary is not None else 0
+
+        with self._lock:
+            self._counters["compacted"] += 1
+            self._counters["tokens_out"] += summary_tokens + sum(counts[len(messages) - len(history):])
+        return summary, history
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            sessions = len(self._sessions)
+        return {
+            **counters,
+            "sessions": sessions,
+            "exact_token_counts": self.token_counter.exact,
+            "compression_ratio": round(counters["tokens_out"] / counters["tokens_in"], 4) if counters["tokens_in"] else 1.0
+        }
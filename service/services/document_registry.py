@@ -0,0 +1,62 @@
+import time
+
+class DocumentRecord:
+    def __init__(self, source: str, content_hash: str, chunk_ids: list, text_bytes: int):
+        self.source = source
+        self.content_hash = content_hash
+        self.chunk_ids = chunk_ids
+        self.text_bytes = text_bytes
+        self.ingested_at = time.time()
+
+    def to_state(self) -> dict:
+        return {
+            "source": self.source,
+            "content_hash": self.content_hash,
+            "chunk_ids": self.chunk_ids,
+            "text_bytes": self.text_bytes,
+            "ingested_at": self.ingested_at
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "DocumentRecord":
+        record = cls(state["source"], state["content_hash"], state["chunk_ids"], state["text_bytes"])
+        record.ingested_at = state["ingested_at"]
+        return record
+
+    def to_dict(self) -> dict:
+        return {
+            "source": self.source,
+            "content_hash": self.content_hash,
+            "chunks": len(self.chunk_ids),
+            "ingested_at": self.ingested_at
+        }
+
+class DocumentRegistry:
+    """Tracks which version of each source is indexed and which chunk ids it owns."""
+    def __init__(self):
+        self._records = {}
+
+    def get(self, source: str) -> DocumentRecord:
+        return self._records.get(source)
+
+    def register(self, record: DocumentRecord):
+        self._records[record.source] = record
+
+    def remove(self, source: str) -> DocumentRecord:
+        return self._records.pop(source, None)
+
+    def records(self) -> list:
+        return list(self._records.values())
+
+    def to_state(self) -> list:
+        return [record.to_state() for record in self._records.values()]
+
+    @classmethod
+    def from_state(cls, state: list) -> "DocumentRegistry":
+        registry = cls()
+        for item in state or []:
+            registry.register(DocumentRecord.from_state(item))
+        return registry
+
+    def __len__(self) -> int:
+        return len(self._records)
@@ -0,0 +1,182 @@
+import os
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from utils.logger import logger
+from services.embedding_batcher import BatchedEmbeddings
+from config.models import HUGGINGFACE_EMBEDDINGS_MODEL, EMBEDDING_BATCHER
+
+PARITY_TEXTS = [
+    "My payment for the last ride has not been received yet.",
+    "How do I cancel a ride after the driver has arrived?",
+    "Where is the nearest battery charging station?",
+    "Mera account login nahi ho raha, OTP nahi aa raha.",
+    "The driver took a longer route and charged me extra.",
+    "I left my phone in the cab, how can I get it back?"
+]
+
+def export_onnx_model(model_name: str, cache_dir: str, quantize: bool = True) -> str:
+    """
+    Exports the HuggingFace checkpoint to ONNX (and int8 quantizes it) once, returning the model path.
+    Safe to call from several processes at once, each writes to its own temp file before the swap.
+    """
+    export_dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+    fp32_path = os.path.join(export_dir, "model.onnx")
+    int8_path = os.path.join(export_dir, "model_int8.onnx")
+    os.makedirs(export_dir, exist_ok=True)
+
+    if not os.path.exists(fp32_path):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        logger.info(f"Exporting {model_name} to ONNX")
+        model = AutoModel.from_pretrained(model_name).eval()
+        sample = AutoTokenizer.from_pretrained(model_name)(["export sample"], return_tensors="pt")
+        input_names = list(sample.keys())
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        tmp_path = f"{fp32_path}.{os.getpid()}.tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[name] for name in input_names),
+                tmp_path,
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14
+            )
+        os.replace(tmp_path, fp32_path)
+
+    if not quantize:
+        return fp32_path
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        tmp_path = f"{int8_path}.{os.getpid()}.tmp"
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+    return int8_path
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence-transformers compatible embedder on ONNX Runtime (mean pooling + L2 norm).
+    The model is exported from the HuggingFace checkpoint once, optionally int8 dynamically
+    quantized, and cached on disk so later processes only pay the session load.
+    """
+    def __init__(self, model_name: str, cache_dir: str, quantize: bool = True, intra_op_threads: int = 0, max_length: int = 256, batch_size: int = 32):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model_path = export_onnx_model(model_name, cache_dir, quantize)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        logger.info(f"Loaded ONNX embedding model from {model_path}")
+
+    def _embed(self, texts: list) -> np.ndarray:
+        outputs = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            encoded = self.tokenizer(batch, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+            feeds = {name: value.astype(np.int64) for name, value in encoded.items() if name in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            outputs.append(pooled.astype(np.float32))
+        return np.vstack(outputs)
+
+    def embed_documents(self, texts: list) -> list:
+        if not texts:
+            return []
+        return self._embed(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> list:
+        return self._embed([text])[0].tolist()
+
+def embedding_model_id(config: dict, embeddings: Embeddings) -> str:
+    """Identity of the vectors an embedder produces, used to key caches and snapshots."""
+    if isinstance(embeddings, OnnxEmbeddings):
+        return f"{config['MODEL_NAME']}:onnx{'-int8' if config['ONNX_QUANTIZE'] else ''}"
+    return config["MODEL_NAME"]
+
+def check_parity(reference: Embeddings, candidate: Embeddings, texts: list = None, threshold: float = 0.98) -> dict:
+    """Cosine agreement between two embedders on the same texts."""
+    texts = texts or PARITY_TEXTS
+    a = np.asarray(reference.embed_documents(texts), dtype=np.float32)
+    b = np.asarray(candidate.embed_documents(texts), dtype=np.float32)
+    a /= np.clip(np.linalg.norm(a, axis=1, keepdims=True), 1e-12, None)
+    b /= np.clip(np.linalg.norm(b, axis=1, keepdims=True), 1e-12, None)
+    cosines = (a * b).sum(axis=1)
+    return {
+        "min_cosine": round(float(cosines.min()), 5),
+        "mean_cosine": round(float(cosines.mean()), 5),
+        "threshold": threshold,
+        "passed": bool(cosines.min() >= threshold)
+    }
+
+def _torch_embeddings(config: dict) -> Embeddings:
+    return HuggingFaceEmbeddings(model_name=config["MODEL_NAME"])
+
+def _onnx_embeddings(config: dict) -> OnnxEmbeddings:
+    return OnnxEmbeddings(
+        model_name=config["MODEL_NAME"],
+        cache_dir=config["ONNX_CACHE_DIR"],
+        quantize=config["ONNX_QUANTIZE"],
+        intra_op_threads=config["ONNX_INTRA_OP_THREADS"],
+        max_length=config["MAX_SEQ_LENGTH"]
+    )
+
+def onnx_parity_report(config: dict, candidate: Embeddings = None) -> dict:
+    """Loads the PyTorch reference and compares the ONNX backend against it on PARITY_TEXTS."""
+    candidate = candidate or _onnx_embeddings(config)
+    report = check_parity(_torch_embeddings(config), candidate, threshold=config["PARITY_THRESHOLD"])
+    logger.info(f"ONNX embedding parity: {report}")
+    return report
+
+def create_embeddings(config: dict) -> Embeddings:
+    """
+    Builds the embedder selected by HUGGINGFACE_EMBEDDINGS_MODEL["BACKEND"] ("torch" or "onnx").
+    Under the pre-fork server the parity check has already run once in the parent, which clears
+    VERIFY_PARITY (or switches BACKEND to torch) before the workers get here.
+    """
+    if config["BACKEND"] != "onnx":
+        return _torch_embeddings(config)
+    try:
+        embeddings = _onnx_embeddings(config)
+    except Exception as e:
+        logger.error(f"ONNX embedding backend unavailable, falling back to PyTorch: {e}")
+        return _torch_embeddings(config)
+    if config["VERIFY_PARITY"] and not onnx_parity_report(config, embeddings)["passed"]:
+        logger.error("ONNX embeddings diverge from the PyTorch reference, using PyTorch")
+        return _torch_embeddings(config)
+    return embeddings
+
+_shared_embeddings = None
+_shared_lock = threading.Lock()
+
+def get_shared_embeddings() -> BatchedEmbeddings:
+    """The process-wide batched embedder, so the model is loaded once no matter how many callers use it."""
+    global _shared_embeddings
+    if _shared_embeddings is None:
+        with _shared_lock:
+            if _shared_embeddings is None:
+                _shared_embeddings = BatchedEmbeddings(
+                    create_embeddings(HUGGINGFACE_EMBEDDINGS_MODEL),
+                    max_batch_size=EMBEDDING_BATCHER["MAX_BATCH_SIZE"],
+                    max_wait_ms=EMBEDDING_BATCHER["MAX_WAIT_MS"],
+                    query_cache_size=EMBEDDING_BATCHER["QUERY_CACHE_SIZE"]
+                )
+    return _shared_embeddings
@@ -0,0 +1,117 @@
+import os
+import time
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings
+
+from utils.logger import logger
+
+class _EmbedRequest:
+    def __init__(self, texts: list):
+        self.texts = texts
+        self.future = Future()
+
+class BatchedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that coalesces calls from concurrent requests into micro-batches.
+    A single worker thread drains the queue, waiting at most max_wait_ms for a batch to fill
+    up to max_batch_size texts, runs one forward pass and fans the vectors back out.
+    Queries go through the same batches (the base model's document path, which is identical
+    to its query path for symmetric models like all-MiniLM) and are memoized in an LRU.
+    """
+    def __init__(self, base: Embeddings, max_batch_size: int = 64, max_wait_ms: float = 5, query_cache_size: int = 2048):
+        self.base = base
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.query_cache_size = query_cache_size
+        self._query_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+        self._pid = None
+        self._counters = {"batches": 0, "texts": 0, "requests": 0, "query_cache_hits": 0, "query_cache_misses": 0}
+
+    def _ensure_worker(self):
+        # Threads do not survive fork, so every process starts its own worker on first use
+        if self._worker is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, args=(self._queue,), name="embedding-batcher", daemon=True)
+            self._worker.start()
+
+    def _run(self, requests: queue.Queue):
+        while True:
+            batch = [requests.get()]
+            size = len(batch[0].texts)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item.texts)
+
+            texts = [text for item in batch for text in item.texts]
+            try:
+                vectors = self.base.embed_documents(texts)
+            except Exception as e:
+                logger.error(f"Batched embedding failed for {len(texts)} texts: {e}")
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+
+            self._counters["batches"] += 1
+            self._counters["texts"] += len(texts)
+            self._counters["requests"] += len(batch)
+            offset = 0
+            for item in batch:
+                item.future.set_result(vectors[offset:offset + len(item.texts)])
+                offset += len(item.texts)
+
+    def _submit(self, texts: list) -> list:
+        self._ensure_worker()
+        request = _EmbedRequest(texts)
+        self._queue.put(request)
+        return request.future.result()
+
+    def embed_documents(self, texts: list) -> list:
+        if not texts:
+            return []
+        return self._submit(list(texts))
+
+    def embed_query(self, text: str) -> list:
+        with self._cache_lock:
+            vector = self._query_cache.get(text)
+            if vector is not None:
+                self._query_cache.move_to_end(text)
+                self._counters["query_cache_hits"] += 1
+                return vector
+            self._counters["query_cache_misses"] += 1
+        vector = self._submit([text])[0]
+        with self._cache_lock:
+            self._query_cache[text] = vector
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+        return vector
+
+    def stats(self) -> dict:
+        counters = dict(self._counters)
+        batches = counters["batches"]
+        return {
+            **counters,
+            "avg_batch_texts": round(counters["texts"] / batches, 2) if batches else 0.0,
+            "avg_batch_requests": round(counters["requests"] / batches, 2) if batches else 0.0,
+            "pending": self._queue.qsize() if self._queue is not None else 0
+        }
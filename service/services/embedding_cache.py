@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.logger import logger
+
+# Bump when files are parsed into chunks differently, so stale cached chunks are not served
+CHUNKING_VERSION = 2
+# Fraction of max_disk_bytes the store is pruned down to once it goes over
+DISK_PRUNE_TARGET = 0.9
+
+class EmbeddingCache:
+    """
+    Content-addressed cache of chunked + embedded documents.
+    Entries are keyed by the file bytes and everything that changes the chunks (file name,
+    chunking params, embedding model) and live in an in-memory LRU backed by a SQLite blob store.
+    Both tiers are bounded in bytes: the LRU by max_memory_bytes as well as max_memory_entries,
+    the store by max_disk_bytes, pruned least recently used first down to DISK_PRUNE_TARGET of it.
+    """
+    def __init__(self, model_name: str, max_memory_entries: int = 512, disk_path: str = None, max_memory_bytes: int = None, max_disk_bytes: int = None):
+        self.model_name = model_name
+        self.max_memory_entries = max_memory_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_path = disk_path
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._evictions = {"memory": 0, "disk": 0}
+        self._db = None
+        if disk_path:
+            try:
+                os.makedirs(os.path.dirname(disk_path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(disk_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    "key TEXT PRIMARY KEY, texts TEXT, metadatas TEXT, dim INTEGER, vectors BLOB, created_at REAL, "
+                    "size INTEGER, accessed_at REAL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_accessed_at ON embeddings (accessed_at)")
+                self._db.commit()
+            except Exception as e:
+                logger.error(f"Embedding cache disk tier unavailable: {e}")
+                self._db = None
+
+    def make_key(self, filename: str, content: bytes, chunk_size: int, chunk_overlap: int) -> str:
+        digest = hashlib.sha256(content)
+        digest.update(f"|{filename}|{chunk_size}|{chunk_overlap}|{self.model_name}|v{CHUNKING_VERSION}".encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _entry_bytes(entry: tuple) -> int:
+        texts, metadatas, vectors = entry
+        # Text length stands in for the str objects, metadata is usually a few short fields per chunk
+        return vectors.nbytes + sum(len(t) for t in texts) + 64 * len(metadatas)
+
+    def _remember(self, key: str, entry: tuple):
+        size = self._entry_bytes(entry)
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= previous[1]
+        if self.max_memory_bytes is not None and size > self.max_memory_bytes:
+            # Would evict everything else, serve this one from disk instead
+            return
+        self._memory[key] = (entry, size)
+        self._memory_bytes += size
+        while len(self._memory) > self.max_memory_entries or (
+            self.max_memory_bytes is not None and self._memory_bytes > self.max_memory_bytes
+        ):
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self._evictions["memory"] += 1
+
+    def _prune_disk(self):
+        if self.max_disk_bytes is None:
+            return
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+        # Prune below the cap so the next few writes don't each trigger another pass
+        excess = total - int(self.max_disk_bytes * DISK_PRUNE_TARGET)
+        doomed = []
+        for key, size in self._db.execute("SELECT key, size FROM embeddings ORDER BY accessed_at"):
+            if excess <= 0:
+                break
+            doomed.append((key,))
+            excess -= size or 0
+        self._db.executemany("DELETE FROM embeddings WHERE key = ?", doomed)
+        self._evictions["disk"] += len(doomed)
+        logger.info(f"Pruned {len(doomed)} entries from the embedding cache store ({total} bytes over a {self.max_disk_bytes} byte cap)")
+
+    def get(self, key: str):
+        """Returns (texts, metadatas, vectors) or None."""
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return cached[0]
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT texts, metadatas, dim, vectors FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    texts, metadatas, dim, blob = row
+                    vectors = np.frombuffer(blob, dtype=np.float32).reshape(-1, dim) if dim else np.zeros((0, 0), dtype=np.float32)
+                    entry = (json.loads(texts), json.loads(metadatas), vectors)
+                    self._remember(key, entry)
+                    try:
+                        self._db.execute("UPDATE embeddings SET accessed_at = ? WHERE key = ?", (time.time(), key))
+                        self._db.commit()
+                    except Exception as e:
+                        logger.error(f"Embedding cache access update failed: {e}")
+                    self._counters["disk_hits"] += 1
+                    return entry
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, key: str, texts: list, metadatas: list, vectors) -> tuple:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        entry = (texts, metadatas, vectors)
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                try:
+                    dim = vectors.shape[1] if vectors.ndim == 2 and len(vectors) else 0
+                    texts_json, metadatas_json, blob = json.dumps(texts), json.dumps(metadatas), vectors.tobytes()
+                    now = time.time()
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO embeddings (key, texts, metadatas, dim, vectors, created_at, size, accessed_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (key, texts_json, metadatas_json, dim, blob, now, len(texts_json) + len(metadatas_json) + len(blob), now)
+                    )
+                    self._prune_disk()
+                    self._db.commit()
+                except Exception as e:
+                    logger.error(f"Embedding cache write failed: {e}")
+        return entry
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            evictions = dict(self._evictions)
+            memory_entries = len(self._memory)
+            memory_bytes = self._memory_bytes
+        lookups = sum(counters.values())
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        return {
+            **counters,
+            "memory_entries": memory_entries,
+            "memory_bytes": memory_bytes,
+            "evictions": evictions,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,243 @@
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.logger import logger
+from utils.exception import GenerationQueueFullError, GenerationTimeoutError
+
+class GenerationExecutor:
+    """
+    Runs blocking generation calls on a bounded thread pool so the event loop stays free.
+    Admission is capped at max_workers running + max_queue_size waiting, every request
+    carries a deadline, and queue depth / wait time are tracked for /metrics. Natively async
+    generations get the same treatment with max_async_concurrency running slots and no thread
+    held while they wait.
+    """
+    def __init__(self, max_workers: int, max_queue_size: int, request_timeout: float, metrics_window: int = 1000, max_async_concurrency: int = 256):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.request_timeout = request_timeout
+        self.max_async_concurrency = max_async_concurrency
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._async_in_flight = 0
+        self._async_queued = 0
+        self._async_slots = None
+        self._wait_times = deque(maxlen=metrics_window)
+        self._counters = {
+            "admitted": 0,
+            "rejected": 0,
+            "timed_out": 0,
+            "completed": 0,
+            "failed": 0
+        }
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue_size
+
+    def _admit(self):
+        with self._lock:
+            if self._queued + self._running >= self.capacity:
+                self._counters["rejected"] += 1
+                raise GenerationQueueFullError(
+                    f"Generation queue is full ({self._running} running, {self._queued} queued)."
+                )
+            self._queued += 1
+            self._counters["admitted"] += 1
+
+    def _execute(self, fn, args: tuple, kwargs: dict, enqueued_at: float, deadline: float):
+        started_at = time.monotonic()
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._wait_times.append(started_at - enqueued_at)
+        try:
+            if started_at >= deadline:
+                # The caller has already given up, don't burn a worker on it
+                raise GenerationTimeoutError("Generation request expired while queued.")
+            result = fn(*args, **kwargs)
+            with self._lock:
+                self._counters["completed"] += 1
+            return result
+        except GenerationTimeoutError:
+            raise
+        except Exception:
+            with self._lock:
+                self._counters["failed"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    async def run(self, fn, *args, timeout: float = None, **kwargs):
+        self._admit()
+        enqueued_at = time.monotonic()
+        deadline = enqueued_at + (timeout or self.request_timeout)
+        future = self._pool.submit(self._execute, fn, args, kwargs, enqueued_at, deadline)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=deadline - enqueued_at)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._counters["timed_out"] += 1
+                # A cancelled future never reached _execute, so release its queue slot here
+                if future.cancelled():
+                    self._queued -= 1
+            logger.warning(f"Generation request timed out after {deadline - enqueued_at:.1f}s")
+            raise GenerationTimeoutError("Generation request exceeded its deadline.")
+
+    def _check_async_capacity(self):
+        # Caller holds self._lock
+        if self._async_in_flight + self._async_queued >= self.max_async_concurrency + self.max_queue_size:
+            self._counters["rejected"] += 1
+            raise GenerationQueueFullError(
+                f"Too many in-flight generations ({self._async_in_flight} running, {self._async_queued} queued)."
+            )
+
+    def _admit_async(self) -> float:
+        with self._lock:
+            self._check_async_capacity()
+            self._async_queued += 1
+            self._counters["admitted"] += 1
+        return time.monotonic()
+
+    async def _acquire_async(self, enqueued_at: float):
+        # Created on first use so it binds to the serving event loop
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_async_concurrency)
+        try:
+            await self._async_slots.acquire()
+        except BaseException:
+            with self._lock:
+                self._async_queued -= 1
+            raise
+        with self._lock:
+            self._async_queued -= 1
+            self._async_in_flight += 1
+            self._wait_times.append(time.monotonic() - enqueued_at)
+
+    def _release_async(self):
+        self._async_slots.release()
+        with self._lock:
+            self._async_in_flight -= 1
+
+    async def _run_admitted(self, coro_fn, args: tuple, kwargs: dict, enqueued_at: float):
+        await self._acquire_async(enqueued_at)
+        try:
+            return await coro_fn(*args, **kwargs)
+        finally:
+            self._release_async()
+
+    async def run_async(self, coro_fn, *args, timeout: float = None, **kwargs):
+        """Admission control and deadline for natively async generation, no thread is held while waiting."""
+        enqueued_at = self._admit_async()
+        timeout = timeout or self.request_timeout
+        try:
+            # The deadline covers the wait for a slot as well as the generation itself
+            result = await asyncio.wait_for(self._run_admitted(coro_fn, args, kwargs, enqueued_at), timeout=timeout)
+            with self._lock:
+                self._counters["completed"] += 1
+            return result
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._counters["timed_out"] += 1
+            logger.warning(f"Async generation request timed out after {timeout:.1f}s")
+            raise GenerationTimeoutError("Generation request exceeded its deadline.")
+        except Exception:
+            with self._lock:
+                self._counters["failed"] += 1
+            raise
+
+    def stream_async(self, agen_fn, *args, timeout: float = None, **kwargs):
+        """
+        Returns an async iterator over a streaming generation's events that enforces the deadline
+        across the whole stream. Raises GenerationQueueFullError right away when there is no room,
+        but only takes a queue slot once iterated, so a stream that is never started holds nothing.
+        """
+        with self._lock:
+            self._check_async_capacity()
+        return self._stream(agen_fn, args, kwargs, timeout or self.request_timeout)
+
+    async def _stream(self, agen_fn, args: tuple, kwargs: dict, timeout: float):
+        # Admitted here rather than in stream_async: an unstarted generator never runs its finally
+        enqueued_at = self._admit_async()
+        # The producer runs as one task so callback context stays intact across events
+        queue = asyncio.Queue(maxsize=256)
+        done = object()
+        deadline = enqueued_at + timeout
+        try:
+            await asyncio.wait_for(self._acquire_async(enqueued_at), timeout=max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._counters["timed_out"] += 1
+            logger.warning(f"Streaming generation expired after {timeout:.1f}s waiting for a slot")
+            raise GenerationTimeoutError("Generation request expired while queued.")
+
+        async def produce():
+            try:
+                async for event in agen_fn(*args, **kwargs):
+                    await queue.put(event)
+                await queue.put(done)
+            except Exception as e:
+                await queue.put(e)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await asyncio.wait_for(queue.get(), timeout=max(deadline - time.monotonic(), 0))
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+            with self._lock:
+                self._counters["completed"] += 1
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._counters["timed_out"] += 1
+            logger.warning(f"Streaming generation timed out after {timeout:.1f}s")
+            raise GenerationTimeoutError("Generation request exceeded its deadline.")
+        except GenerationTimeoutError:
+            raise
+        except Exception:
+            with self._lock:
+                self._counters["failed"] += 1
+            raise
+        finally:
+            producer.cancel()
+            self._release_async()
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = sorted(self._wait_times)
+            queued = self._queued
+            running = self._running
+            async_queued = self._async_queued
+            async_in_flight = self._async_in_flight
+            counters = dict(self._counters)
+        wait_stats = {"avg_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        if waits:
+            wait_stats = {
+                "avg_ms": round(sum(waits) / len(waits) * 1000, 2),
+                "p50_ms": round(waits[len(waits) // 2] * 1000, 2),
+                "p95_ms": round(waits[min(int(len(waits) * 0.95), len(waits) - 1)] * 1000, 2),
+                "max_ms": round(waits[-1] * 1000, 2)
+            }
+        return {
+            "max_workers": self.max_workers,
+            "max_queue_size": self.max_queue_size,
+            "queue_depth": queued,
+            "running": running,
+            "max_async_concurrency": self.max_async_concurrency,
+            "async_queue_depth": async_queued,
+            "async_in_flight": async_in_flight,
+            "wait_time": wait_stats,
+            **counters
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
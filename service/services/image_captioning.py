@@ -1,19 +1,44 @@
 import sys
-from io import BytesIO
+import threading
 from PIL import Image, ImageFilter, ImageEnhance
-
-from transformers import BlipProcessor, BlipForConditionalGeneration
+import numpy as np
 
 from utils.logger import logger
+from services.image_preprocessing import fused_preprocess, preprocess_batch
 from utils.exception import SmartSaarthiException
 
 class ImageCaptioningService:
-    def __init__(self, model_name, task, processor_name):
+    def __init__(self, model_name, task, processor_name, max_new_tokens: int = 50):
         self.model_name = model_name
         self.task = task
         self.processor_name = processor_name
-        self.processor = BlipProcessor.from_pretrained(processor_name, use_fast=True)
-        self.model = BlipForConditionalGeneration.from_pretrained(model_name)
+        self.max_new_tokens = max_new_tokens
+        self._processor = None
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    def _load(self):
+        # BLIP is only loaded the first time an image is actually captioned
+        with self._load_lock:
+            if self._model is not None:
+                return
+            from transformers import BlipProcessor, BlipForConditionalGeneration
+
+            logger.info(f"Loading image captioning model {self.model_name}")
+            self._processor = BlipProcessor.from_pretrained(self.processor_name, use_fast=True)
+            self._model = BlipForConditionalGeneration.from_pretrained(self.model_name).eval()
+
+    @property
+    def processor(self):
+        if self._processor is None:
+            self._load()
+        return self._processor
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._load()
+        return self._model
     
     def denoise(self, image):
         """Apply Gaussian blur to reduce noise"""
@@ -64,7 +89,21 @@ class ImageCaptioningService:
             logger.warning(f"Segmentation failed: {str(e)}, returning original image")
             return image
 
+    def input_size(self) -> tuple:
+        """(width, height) the processor feeds the model, images are downscaled to it before preprocessing."""
+        size = getattr(self.processor.image_processor, "size", None) or {}
+        return (size.get("width", 384), size.get("height", 384))
+
     def preprocess_image(self, image):
+        """Fused NumPy version of preprocess_image_reference for a single PIL image"""
+        try:
+            image = image.convert("RGB").resize(self.input_size(), Image.BILINEAR)
+            return Image.fromarray(fused_preprocess(np.asarray(image)[None])[0])
+        except Exception as e:
+            logger.error(f"Preprocessing failed: {str(e)}, using original image")
+            return image
+
+    def preprocess_image_reference(self, image):
         """Apply all preprocessing steps in sequence"""
         try:
             logger.info("Starting image preprocessing...")
@@ -83,24 +122,28 @@ class ImageCaptioningService:
             logger.error(f"Preprocessing failed: {str(e)}, using original image")
             return image
 
-    def generate_caption(self, image_bytes: bytes, prompt=None) -> str:
+    def generate_captions(self, images: list, prompt=None) -> list:
+        """Captions a batch of image bytes with a single generate call."""
         try:
-            image = Image.open(BytesIO(image_bytes)).convert("RGB")
-            
-            image = self.preprocess_image(image)
-            
+            import torch
+
+            batch = list(preprocess_batch(images, self.input_size()))
             if prompt:
-                inputs = self.processor(image, prompt, return_tensors="pt")
+                inputs = self.processor(batch, [prompt] * len(batch), return_tensors="pt", padding=True)
             else:
-                inputs = self.processor(image, return_tensors="pt")
-            
-            out = self.model.generate(
-                **inputs,
-                max_new_tokens=50
-            )
-            caption = self.processor.decode(out[0], skip_special_tokens=True)
-            logger.info(f"Generated caption: {caption}")
-            return caption
+                inputs = self.processor(batch, return_tensors="pt")
+
+            with torch.inference_mode():
+                out = self.model.generate(
+                    **inputs,
+                    max_new_tokens=self.max_new_tokens
+                )
+            captions = self.processor.batch_decode(out, skip_special_tokens=True)
+            logger.info(f"Generated {len(captions)} captions")
+            return captions
         except Exception as e:
             logger.error(f"Image Captioning error: {str(e)}")
-            raise SmartSaarthiException(f"Image Captioning error: {str(e)}", sys)
\ No newline at end of file
+            raise SmartSaarthiException(f"Image Captioning error: {str(e)}", sys)
+
+    def generate_caption(self, image_bytes: bytes, prompt=None) -> str:
+        return self.generate_captions([image_bytes], prompt)[0]
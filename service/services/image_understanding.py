@@ -0,0 +1,180 @@
+import io
+import os
+import time
+import queue
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from PIL import Image
+
+from utils.logger import logger
+from services.image_captioning import ImageCaptioningService
+from config.models import IMAGE_CAPTIONING_MODEL, IMAGE_UNDERSTANDING
+
+class _CaptionRequest:
+    def __init__(self, key: str, content: bytes):
+        self.key = key
+        self.content = content
+        self.future = Future()
+
+class ImageUnderstandingService:
+    """
+    Turns uploaded images into searchable text: a BLIP caption plus any OCR text.
+    Captions from every request are queued to one worker thread that groups up to
+    max_batch_size images (waiting at most max_wait_ms) into a single generate call.
+    Captions are cached by content hash and concurrent requests for the same image
+    share one in-flight future.
+    """
+    def __init__(self, captioner: ImageCaptioningService, max_batch_size: int = 8, max_wait_ms: float = 20, cache_size: int = 1024, include_ocr: bool = True):
+        self.captioner = captioner
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.cache_size = cache_size
+        self.include_ocr = include_ocr
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._queue = None
+        self._worker = None
+        self._pid = None
+        self._counters = {"batches": 0, "images": 0, "cache_hits": 0, "cache_misses": 0}
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._worker is not None and self._pid == os.getpid():
+                return
+            self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, args=(self._queue,), name="image-captioner", daemon=True)
+            self._worker.start()
+
+    def _run(self, requests: queue.Queue):
+        while True:
+            batch = [requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                captions = self.captioner.generate_captions([item.content for item in batch])
+            except Exception as e:
+                logger.error(f"Batched captioning failed for {len(batch)} images: {e}")
+                with self._lock:
+                    for item in batch:
+                        self._inflight.pop(item.key, None)
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+
+            with self._lock:
+                self._counters["batches"] += 1
+                self._counters["images"] += len(batch)
+                for item, caption in zip(batch, captions):
+                    self._cache[item.key] = caption
+                    self._cache.move_to_end(item.key)
+                    self._inflight.pop(item.key, None)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            for item, caption in zip(batch, captions):
+                item.future.set_result(caption)
+
+    def _caption_future(self, content: bytes) -> Future:
+        key = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            caption = self._cache.get(key)
+            if caption is not None:
+                self._cache.move_to_end(key)
+                self._counters["cache_hits"] += 1
+                future = Future()
+                future.set_result(caption)
+                return future
+            request = self._inflight.get(key)
+            if request is not None:
+                return request.future
+        try:
+            # Undecodable uploads fail on their own here instead of failing a whole shared batch
+            Image.open(io.BytesIO(content)).verify()
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+            return future
+        with self._lock:
+            request = self._inflight.get(key)
+            if request is not None:
+                return request.future
+            self._counters["cache_misses"] += 1
+            request = _CaptionRequest(key, content)
+            self._inflight[key] = request
+        self._ensure_worker()
+        self._queue.put(request)
+        return request.future
+
+    def prefetch(self, images: list):
+        """Queues captions for (name, bytes) pairs without waiting, so a request's images share batches."""
+        for _, content in images:
+            self._caption_future(content)
+
+    def describe(self, images: list) -> list:
+        """
+        Returns caption (and OCR) text for (name, bytes) pairs, in order. Failures propagate
+        so callers don't persist a partial description; a retry reuses the cached captions.
+        """
+        futures = [self._caption_future(content) for _, content in images]
+        ocr_texts = [""] * len(images)
+        if self.include_ocr:
+            # OCR runs on its own process pool while the captions are being generated
+            from utils.ocr import ocr_engine
+
+            ocr_texts = [text.strip() for text in ocr_engine.recognize(images)]
+        results = []
+        for future, ocr_text in zip(futures, ocr_texts):
+            text = f"Image Caption: {future.result()}"
+            if ocr_text:
+                text += f"\nText in image: {ocr_text}"
+            results.append(text)
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            inflight = len(self._inflight)
+        batches = counters["batches"]
+        return {
+            **counters,
+            "avg_batch_images": round(counters["images"] / batches, 2) if batches else 0.0,
+            "inflight": inflight
+        }
+
+_image_understanding = None
+_image_understanding_lock = threading.Lock()
+
+def get_image_understanding() -> ImageUnderstandingService:
+    """The process-wide image stage; BLIP itself is only loaded on the first caption."""
+    global _image_understanding
+    if _image_understanding is None:
+        with _image_understanding_lock:
+            if _image_understanding is None:
+                _image_understanding = ImageUnderstandingService(
+                    ImageCaptioningService(
+                        model_name=IMAGE_CAPTIONING_MODEL["MODEL_NAME"],
+                        task=IMAGE_CAPTIONING_MODEL["TASK"],
+                        processor_name=IMAGE_CAPTIONING_MODEL["PROCESSOR"],
+                        max_new_tokens=IMAGE_UNDERSTANDING["MAX_NEW_TOKENS"]
+                    ),
+                    max_batch_size=IMAGE_UNDERSTANDING["MAX_BATCH_SIZE"],
+                    max_wait_ms=IMAGE_UNDERSTANDING["MAX_WAIT_MS"],
+                    cache_size=IMAGE_UNDERSTANDING["CACHE_SIZE"],
+                    include_ocr=IMAGE_UNDERSTANDING["INCLUDE_OCR"]
+                )
+    return _image_understanding
@@ -0,0 +1,156 @@
+import os
+import fcntl
+import hashlib
+
+from langchain_community.vectorstores import FAISS
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from utils.logger import logger
+from utils.files import iter_documents
+from services.vector_index import ensure_backend
+from services.vector_snapshot import save_snapshot, read_snapshot, to_vector_store, delete_snapshot
+
+KNOWLEDGE_BASE_FILE_TYPES = {"pdf", "md", "txt"}
+
+# Snapshots read by the pre-fork parent, keyed by snapshot dir; forked workers reuse them
+_preloaded_snapshots = {}
+
+def preload_snapshot(snapshot_dir: str, mmap: bool = True):
+    """
+    Reads the knowledge base snapshot without an embedding model, so a pre-fork parent can load it
+    once before forking and workers start from the same objects instead of each reading its own.
+    """
+    parts, meta = read_snapshot(snapshot_dir, mmap=mmap)
+    if parts is not None:
+        _preloaded_snapshots[snapshot_dir] = (parts, meta)
+
+class KnowledgeBase:
+    """
+    Read-only corpus (support playbooks, policies) indexed once and shared by every request.
+    The index is rebuilt only when the directory contents change, otherwise the snapshot is
+    loaded with its flat vector storage mapped from the file (IO_FLAG_MMAP_IFC) rather than
+    copied onto the heap. The docstore is a pickle and is still unpickled into memory.
+    """
+    def __init__(self, directory: str, snapshot_dir: str, embeddings, model_name: str, index_config: dict, chunk_size: int = 1000, chunk_overlap: int = 150, mmap: bool = True, embed_batch_size: int = 64):
+        self.directory = directory
+        self.snapshot_dir = snapshot_dir
+        self.embeddings = embeddings
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.model_name = model_name
+        self.index_config = index_config
+        self.mmap = mmap
+        self.embed_batch_size = embed_batch_size
+        self.vector_store = None
+        self.documents = 0
+        # Content fingerprint of the loaded corpus, None while nothing is loaded
+        self.fingerprint = None
+
+    @classmethod
+    def from_config(cls, config: dict, embeddings, model_name: str, index_config: dict, chunk_size: int, chunk_overlap: int):
+        return cls(
+            directory=config["DIRECTORY"],
+            snapshot_dir=config["SNAPSHOT_DIR"],
+            embeddings=embeddings,
+            model_name=model_name,
+            index_config=index_config,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            mmap=config["MMAP"],
+            embed_batch_size=config["EMBED_BATCH_SIZE"]
+        )
+
+    def _list_files(self) -> list:
+        paths = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.rsplit(".", 1)[-1].lower() in KNOWLEDGE_BASE_FILE_TYPES:
+                    paths.append(os.path.join(root, name))
+        return sorted(paths)
+
+    def _fingerprint(self, paths: list) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{self.model_name}|{self.chunk_size}|{self.chunk_overlap}".encode("utf-8"))
+        for path in paths:
+            stat = os.stat(path)
+            digest.update(f"|{os.path.relpath(path, self.directory)}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _add_batch(self, vector_store, chunks: list):
+        texts = [c.page_content for c in chunks]
+        metadatas = [{**c.metadata, "origin": "knowledge_base"} for c in chunks]
+        text_embeddings = list(zip(texts, self.embeddings.embed_documents(texts)))
+        if vector_store is None:
+            return FAISS.from_embeddings(text_embeddings, self.embeddings, metadatas=metadatas)
+        vector_store.add_embeddings(text_embeddings, metadatas=metadatas)
+        return vector_store
+
+    def _build(self, paths: list, fingerprint: str):
+        vector_store = None
+        for path in paths:
+            with open(path, "rb") as f:
+                content = f.read()
+            batch = []
+            for doc in iter_documents([{"filename": os.path.relpath(path, self.directory), "content": content}]):
+                batch.extend(self.splitter.split_documents([doc]))
+                if len(batch) >= self.embed_batch_size:
+                    vector_store = self._add_batch(vector_store, batch)
+                    batch = []
+            if batch:
+                vector_store = self._add_batch(vector_store, batch)
+            self.documents += 1
+        if vector_store is None:
+            # Nothing indexable left, don't keep serving a stale corpus
+            delete_snapshot(self.snapshot_dir)
+            return
+        report = ensure_backend(vector_store, self.index_config)
+        save_snapshot(vector_store, self.snapshot_dir, meta={"fingerprint": fingerprint, "documents": self.documents, "index_report": report})
+
+    def _read(self, fingerprint: str) -> tuple:
+        """Snapshot parts and meta if they match the directory contents, else (None, None)."""
+        parts, meta = _preloaded_snapshots.get(self.snapshot_dir, (None, None))
+        if parts is None or meta.get("fingerprint") != fingerprint:
+            parts, meta = read_snapshot(self.snapshot_dir, mmap=self.mmap)
+        if parts is None or meta.get("fingerprint") != fingerprint:
+            return None, None
+        return parts, meta
+
+    def load(self):
+        if not os.path.isdir(self.directory):
+            logger.info(f"Knowledge base directory {self.directory} not found, skipping shared corpus")
+            return
+        try:
+            paths = self._list_files()
+            fingerprint = self._fingerprint(paths)
+            parts, meta = self._read(fingerprint)
+            if parts is None:
+                # Other processes wait here and then find the snapshot this one built
+                os.makedirs(os.path.dirname(os.path.abspath(self.snapshot_dir)), exist_ok=True)
+                with open(f"{self.snapshot_dir}.lock", "a") as lock:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                    parts, meta = self._read(fingerprint)
+                    if parts is None:
+                        logger.info(f"Building knowledge base index from {len(paths)} files in {self.directory}")
+                        self.documents = 0
+                        self._build(paths, fingerprint)
+                        # Reload from disk so the live index maps the saved vectors instead of holding the built copy
+                        parts, meta = read_snapshot(self.snapshot_dir, mmap=self.mmap)
+            self.vector_store = to_vector_store(parts, self.embeddings) if parts is not None else None
+            self.documents = (meta or {}).get("documents", 0)
+            self.fingerprint = fingerprint if parts is not None else None
+        except Exception as e:
+            logger.error(f"Failed to load knowledge base: {e}")
+            self.vector_store = None
+            self.fingerprint = None
+
+    def search_by_vector(self, embedding: list, k: int) -> list:
+        if self.vector_store is None:
+            return []
+        return self.vector_store.similarity_search_with_score_by_vector(embedding, k=k)
+
+    def stats(self) -> dict:
+        return {
+            "documents": self.documents,
+            "vectors": self.vector_store.index.ntotal if self.vector_store is not None else 0
+        }
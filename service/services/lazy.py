@@ -0,0 +1,83 @@
+import time
+import threading
+
+from utils.logger import logger
+
+class LazyService:
+    """
+    Builds a heavy component on first use (or when warm() is called from a background thread)
+    and proxies attribute access to it, so call sites keep using it like the real object.
+    Concurrent callers wait on the same build; a failed build is retried on the next call.
+    """
+    def __init__(self, name: str, factory):
+        self._name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+        self._error = None
+        self._load_seconds = None
+        self._loading = False
+        # Guards _warmer only; _lock is held for the whole build
+        self._warm_lock = threading.Lock()
+        self._warmer = None
+
+    @property
+    def ready(self) -> bool:
+        return self._instance is not None
+
+    def get(self):
+        if self._instance is not None:
+            return self._instance
+        with self._lock:
+            if self._instance is None:
+                self._loading = True
+                started = time.perf_counter()
+                try:
+                    logger.info(f"Loading {self._name}")
+                    self._instance = self._factory()
+                    self._error = None
+                    self._load_seconds = round(time.perf_counter() - started, 3)
+                    logger.info(f"Loaded {self._name} in {self._load_seconds}s")
+                except Exception as e:
+                    self._error = str(e)
+                    logger.error(f"Failed to load {self._name}: {e}")
+                    raise
+                finally:
+                    self._loading = False
+        return self._instance
+
+    def warm_in_background(self, warmup=None) -> threading.Thread:
+        """Loads the component on a daemon thread, then runs the optional warmup(instance)."""
+        def run():
+            try:
+                instance = self.get()
+                if warmup is not None:
+                    warmup(instance)
+            except Exception as e:
+                logger.error(f"Background warmup of {self._name} failed: {e}")
+
+        thread = threading.Thread(target=run, name=f"warmup-{self._name}", daemon=True)
+        thread.start()
+        return thread
+
+    def load_in_background(self, warmup=None):
+        """Starts a background load unless the component is ready or one is already running."""
+        with self._warm_lock:
+            if self.ready or (self._warmer is not None and self._warmer.is_alive()):
+                return
+            self._warmer = self.warm_in_background(warmup)
+
+    def status(self) -> dict:
+        if self.ready:
+            state = "ready"
+        elif self._loading:
+            state = "loading"
+        elif self._error:
+            state = "failed"
+        else:
+            state = "not_loaded"
+        return {"state": state, "load_seconds": self._load_seconds, "error": self._error}
+
+    def __getattr__(self, name: str):
+        # Only reached for attributes LazyService doesn't define itself
+        return getattr(self.get(), name)
@@ -0,0 +1,216 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from utils.logger import logger
+from config.maps import GOOGLE_MAPS
+
+load_dotenv()
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Approximate geohash cell widths in meters by precision
+_CELL_WIDTHS = [(4, 39100), (5, 4890), (6, 1220), (7, 153), (8, 38)]
+_WHITESPACE = re.compile(r"\s+")
+
+def encode_geohash(lat: float, lng: float, precision: int) -> str:
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coord = (lng_range, lng) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+def geohash_precision(radius_m: float) -> int:
+    """
+    Coarsest precision whose cells are at most a quarter of the search radius wide, so users
+    sharing a cached result are never further apart than that.
+    """
+    for precision, width in _CELL_WIDTHS:
+        if width <= radius_m / 4:
+            return precision
+    return _CELL_WIDTHS[-1][0]
+
+def parse_lat_lng(location) -> tuple:
+    if isinstance(location, dict):
+        lat, lng = float(location["lat"]), float(location["lng"])
+    elif isinstance(location, (tuple, list)):
+        lat, lng = float(location[0]), float(location[1])
+    else:
+        lat, lng = (float(part) for part in str(location).split(","))
+    # Also rejects nan, which compares false against both bounds
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError(f"Coordinates out of range: {lat},{lng}")
+    return lat, lng
+
+class RateLimitExceeded(Exception):
+    pass
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, max_wait: float):
+        """Takes one token, waiting up to max_wait seconds for it; raises RateLimitExceeded otherwise."""
+        deadline = time.monotonic() + max_wait
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                raise RateLimitExceeded("Google Maps rate limit reached, try again shortly.")
+            time.sleep(wait)
+
+class MapsClient:
+    """
+    One pooled googlemaps.Client for the process with a TTL cache in front of it.
+    Text searches are keyed by the normalized query; nearby searches by keyword, radius and
+    the geohash cell of the location at a precision matched to the radius, so nearby users
+    share results. Empty results are cached for a shorter negative TTL. Outgoing calls pass
+    through a token bucket so bursts degrade to a short wait or a clear error, not a 429 storm.
+    """
+    def __init__(self, api_key: str, config: dict):
+        import googlemaps
+        from requests.adapters import HTTPAdapter
+
+        self.config = config
+        self.client = googlemaps.Client(
+            key=api_key,
+            timeout=config["TIMEOUT_SECONDS"],
+            retry_timeout=config["RETRY_TIMEOUT_SECONDS"]
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config["POOL_MAXSIZE"])
+        self.client.session.mount("https://", adapter)
+        self.bucket = TokenBucket(config["RATE_LIMIT_PER_SECOND"], config["RATE_LIMIT_BURST"])
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "negative_hits": 0, "misses": 0, "api_calls": 0, "rate_limited": 0}
+
+    def _cache_get(self, key: tuple):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or time.monotonic() >= entry[1]:
+                self._cache.pop(key, None)
+                self._counters["misses"] += 1
+                return None
+            self._cache.move_to_end(key)
+            self._counters["negative_hits" if entry[0].get("status") == "ZERO_RESULTS" else "hits"] += 1
+            return entry[0]
+
+    def _cache_put(self, key: tuple, result: dict, ttl: float):
+        if result.get("status") == "ZERO_RESULTS":
+            ttl = self.config["NEGATIVE_TTL_SECONDS"]
+        elif result.get("status") != "OK":
+            # Anything else is an error response, not an answer worth remembering
+            return
+        with self._lock:
+            self._cache[key] = (result, time.monotonic() + ttl)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.config["CACHE_SIZE"]:
+                self._cache.popitem(last=False)
+
+    def _call(self, fn, **kwargs) -> dict:
+        try:
+            self.bucket.acquire(self.config["RATE_LIMIT_MAX_WAIT_SECONDS"])
+        except RateLimitExceeded:
+            with self._lock:
+                self._counters["rate_limited"] += 1
+            raise
+        with self._lock:
+            self._counters["api_calls"] += 1
+        return fn(**kwargs)
+
+    def places(self, query: str) -> dict:
+        key = ("places", _WHITESPACE.sub(" ", query.lower()).strip())
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        result = self._call(self.client.places, query=query)
+        self._cache_put(key, result, self.config["SEARCH_TTL_SECONDS"])
+        return result
+
+    def places_nearby(self, location, keyword: str, radius: int) -> dict:
+        try:
+            lat, lng = parse_lat_lng(location)
+        except (ValueError, KeyError, IndexError, TypeError):
+            logger.warning(f"Unparseable location {location!r}, nearby search is not cached")
+            return self._call(self.client.places_nearby, location=location, keyword=keyword, radius=radius)
+        cell = encode_geohash(lat, lng, geohash_precision(radius))
+        key = ("nearby", _WHITESPACE.sub(" ", keyword.lower()).strip(), radius, cell)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        result = self._call(self.client.places_nearby, location=(lat, lng), keyword=keyword, radius=radius)
+        self._cache_put(key, result, self.config["NEARBY_TTL_SECONDS"])
+        return result
+
+    def places_nearby_page(self, page_token: str) -> dict:
+        """Next page of a nearby search. Google only accepts a token a moment after issuing it."""
+        import googlemaps
+
+        key = ("nearby_page", page_token)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        for attempt in range(self.config["PAGE_TOKEN_RETRIES"]):
+            try:
+                result = self._call(self.client.places_nearby, page_token=page_token)
+                break
+            except googlemaps.exceptions.ApiError as e:
+                if e.status != "INVALID_REQUEST" or attempt == self.config["PAGE_TOKEN_RETRIES"] - 1:
+                    raise
+                time.sleep(self.config["PAGE_TOKEN_DELAY_SECONDS"])
+        self._cache_put(key, result, self.config["NEARBY_TTL_SECONDS"])
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            entries = len(self._cache)
+        lookups = counters["hits"] + counters["negative_hits"] + counters["misses"]
+        return {
+            **counters,
+            "cached_results": entries,
+            "hit_rate": round((counters["hits"] + counters["negative_hits"]) / lookups, 4) if lookups else 0.0
+        }
+
+_maps_client = None
+_maps_client_lock = threading.Lock()
+
+def get_maps_client() -> MapsClient:
+    """The process-wide Maps client, or None when GOOGLE_MAPS_API_KEY is not configured."""
+    global _maps_client
+    if _maps_client is None:
+        api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+        if not api_key:
+            return None
+        with _maps_client_lock:
+            if _maps_client is None:
+                _maps_client = MapsClient(api_key, GOOGLE_MAPS)
+    return _maps_client
+
+def maps_client_stats() -> dict:
+    return _maps_client.stats() if _maps_client is not None else {}
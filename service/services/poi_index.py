@@ -0,0 +1,195 @@
+import os
+import csv
+import json
+import re
+import math
+import threading
+
+import numpy as np
+
+from utils.logger import logger
+from utils.geo import EARTH_RADIUS_M, haversine_m
+from config.maps import LOCAL_POI
+
+def _normalize(text: str) -> str:
+    return " ".join((text or "").lower().replace("_", " ").replace("-", " ").split())
+
+def _tokens(text: str) -> tuple:
+    """Words of the text with simple plurals folded, so "stations" matches "station"."""
+    words = re.findall(r"[a-z0-9]+", _normalize(text))
+    return tuple(w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in words)
+
+def _contains_phrase(tokens: tuple, phrase: tuple) -> bool:
+    size = len(phrase)
+    return size > 0 and any(tokens[i:i + size] == phrase for i in range(len(tokens) - size + 1))
+
+class _Grid:
+    """Fixed lat/lng cells holding row numbers into the index arrays."""
+    def __init__(self, rows: np.ndarray, lats: np.ndarray, lngs: np.ndarray, cell_degrees: float):
+        self.cell = cell_degrees
+        self.cells = {}
+        keys = zip(np.floor(lats[rows] / cell_degrees).astype(int), np.floor(lngs[rows] / cell_degrees).astype(int))
+        for row, key in zip(rows, keys):
+            self.cells.setdefault(key, []).append(row)
+        self.cells = {key: np.asarray(value) for key, value in self.cells.items()}
+        self.size = len(rows)
+
+    def ring(self, lat: float, lng: float, ring: int) -> list:
+        """Row arrays of the cells on the border of the square `ring` cells around the query cell."""
+        ci, cj = int(math.floor(lat / self.cell)), int(math.floor(lng / self.cell))
+        if ring == 0:
+            keys = [(ci, cj)]
+        else:
+            keys = [(ci + di, cj + dj) for di in (-ring, ring) for dj in range(-ring, ring + 1)]
+            keys += [(ci + di, cj + dj) for dj in (-ring, ring) for di in range(-ring + 1, ring)]
+        return [self.cells[key] for key in keys if key in self.cells]
+
+class PoiIndex:
+    """
+    In-memory points of interest with a grid index per category.
+    Queries scan outward ring by ring from the query cell, computing haversine distances for
+    the candidates in one vectorized pass, and stop once no unvisited cell can be closer than
+    the current k-th result (or the radius).
+    """
+    def __init__(self, cell_degrees: float = 0.05, aliases: dict = None):
+        self.cell_degrees = cell_degrees
+        # Other names for a category, e.g. {"ev charger": "charging station"}
+        self.aliases = {_normalize(alias): _normalize(category) for alias, category in (aliases or {}).items()}
+        self._records = []
+        self._lats = np.empty(0)
+        self._lngs = np.empty(0)
+        self._grids = {}
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def add(self, name: str, lat: float, lng: float, address: str = None, category: str = None, rating: float = None):
+        self._records.append({
+            "name": name,
+            "address": address,
+            "location": {"lat": float(lat), "lng": float(lng)},
+            "category": _normalize(category),
+            "rating": float(rating) if rating not in (None, "") else None
+        })
+
+    def load_csv(self, path: str) -> int:
+        """Rows with name, lat, lng and optional address, category, rating columns."""
+        count = 0
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    self.add(row["name"], row["lat"], row["lng"], row.get("address"), row.get("category"), row.get("rating"))
+                    count += 1
+                except (KeyError, ValueError) as e:
+                    logger.warning(f"Skipping POI row in {path}: {e}")
+        return count
+
+    def load_geojson(self, path: str) -> int:
+        """Point features; name, address, category and rating are read from the properties."""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        count = 0
+        for feature in data.get("features", []):
+            geometry = feature.get("geometry") or {}
+            if geometry.get("type") != "Point":
+                continue
+            lng, lat = geometry["coordinates"][:2]
+            props = feature.get("properties") or {}
+            self.add(props.get("name"), lat, lng, props.get("address"), props.get("category"), props.get("rating"))
+            count += 1
+        return count
+
+    def build(self):
+        self._lats = np.array([r["location"]["lat"] for r in self._records])
+        self._lngs = np.array([r["location"]["lng"] for r in self._records])
+        all_rows = np.arange(len(self._records))
+        self._grids = {None: _Grid(all_rows, self._lats, self._lngs, self.cell_degrees)}
+        categories = {}
+        for row, record in enumerate(self._records):
+            if record["category"]:
+                categories.setdefault(record["category"], []).append(row)
+        for category, rows in categories.items():
+            self._grids[category] = _Grid(np.asarray(rows), self._lats, self._lngs, self.cell_degrees)
+
+    def categories(self) -> list:
+        return [c for c in self._grids if c is not None]
+
+    def match_categories(self, keyword: str) -> list:
+        """
+        Categories named by the keyword as whole words, directly or through an alias, e.g.
+        "battery charging stations near me" -> ["charging station"]. "station" alone matches nothing.
+        """
+        tokens = _tokens(keyword)
+        matched = [c for c in self.categories() if _contains_phrase(tokens, _tokens(c))]
+        for alias, category in self.aliases.items():
+            if category in self._grids and category not in matched and _contains_phrase(tokens, _tokens(alias)):
+                matched.append(category)
+        return matched
+
+    def _unvisited_distance_m(self, lat: float, ring: int) -> float:
+        """Lower bound on the distance to any point outside the first `ring` rings around the query cell."""
+        if ring <= 1:
+            return 0.0
+        cell_m = math.radians(self.cell_degrees) * EARTH_RADIUS_M
+        # Longitude cells shrink with cos(latitude), take the narrowest latitude they can reach
+        shrink = math.cos(math.radians(min(abs(lat) + ring * self.cell_degrees, 90.0)))
+        return (ring - 1) * cell_m * max(shrink, 0.0)
+
+    def nearest(self, lat: float, lng: float, k: int = 5, radius_m: float = None, category: str = None) -> list:
+        """Up to k (record, distance_m) pairs sorted by distance, optionally limited to radius_m."""
+        grid = self._grids.get(category)
+        if grid is None or k <= 0:
+            return []
+        rows, dists = [], []
+        visited = 0
+        ring = 0
+        while visited < grid.size:
+            bound = self._unvisited_distance_m(lat, ring)
+            if radius_m is not None and bound > radius_m:
+                break
+            if visited >= k and np.partition(np.concatenate(dists), k - 1)[k - 1] <= bound:
+                break
+            for cell_rows in grid.ring(lat, lng, ring):
+                rows.append(cell_rows)
+                dists.append(haversine_m(lat, lng, self._lats[cell_rows], self._lngs[cell_rows]))
+                visited += len(cell_rows)
+            ring += 1
+        if not rows:
+            return []
+        rows, dists = np.concatenate(rows), np.concatenate(dists)
+        if radius_m is not None:
+            keep = dists <= radius_m
+            rows, dists = rows[keep], dists[keep]
+        order = np.argsort(dists)[:k]
+        return [(self._records[rows[i]], float(dists[i])) for i in order]
+
+    def within(self, lat: float, lng: float, radius_m: float, category: str = None) -> list:
+        return self.nearest(lat, lng, k=len(self._records), radius_m=radius_m, category=category)
+
+    def stats(self) -> dict:
+        return {"places": len(self._records), "categories": len(self.categories())}
+
+_poi_index = None
+_poi_index_lock = threading.Lock()
+
+def get_poi_index() -> PoiIndex:
+    """The process-wide local POI index, or None when it is disabled or has no data."""
+    global _poi_index
+    if not LOCAL_POI["ENABLED"]:
+        return None
+    if _poi_index is None:
+        with _poi_index_lock:
+            if _poi_index is None:
+                index = PoiIndex(cell_degrees=LOCAL_POI["CELL_DEGREES"], aliases=LOCAL_POI["CATEGORY_ALIASES"])
+                for path in LOCAL_POI["SOURCES"]:
+                    if not os.path.exists(path):
+                        logger.warning(f"POI source {path} not found")
+                        continue
+                    loaded = index.load_geojson(path) if path.endswith((".geojson", ".json")) else index.load_csv(path)
+                    logger.info(f"Loaded {loaded} places from {path}")
+                index.build()
+                _poi_index = index
+    return _poi_index if len(_poi_index) else None
+
+def poi_index_stats() -> dict:
+    return _poi_index.stats() if _poi_index is not None else {}
@@ -0,0 +1,179 @@
+import os
+import gc
+import time
+import signal
+import socket
+
+import uvicorn
+
+from utils.logger import logger
+from config.models import HUGGINGFACE_EMBEDDINGS_MODEL, KNOWLEDGE_BASE, VECTOR_INDEX, LLAMA
+
+def _build_knowledge_base():
+    from services.embedding_backends import get_shared_embeddings, embedding_model_id
+    from services.knowledge_base import KnowledgeBase
+
+    embeddings = get_shared_embeddings()
+    KnowledgeBase.from_config(
+        KNOWLEDGE_BASE,
+        embeddings=embeddings,
+        model_name=embedding_model_id(HUGGINGFACE_EMBEDDINGS_MODEL, embeddings.base),
+        index_config=VECTOR_INDEX,
+        chunk_size=LLAMA["CHUNK_SIZE"],
+        chunk_overlap=LLAMA["CHUNK_OVERLAP"]
+    ).load()
+
+def preload_knowledge_base():
+    """
+    Brings the knowledge base snapshot up to date once, then reads it in the parent so workers
+    neither rebuild it in parallel nor each read their own copy. Building embeds the corpus,
+    which starts inference threads, so it runs in a short-lived child and the parent only reads
+    the result.
+    """
+    if not os.path.isdir(KNOWLEDGE_BASE["DIRECTORY"]):
+        return
+    from services.knowledge_base import preload_snapshot
+
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _build_knowledge_base()
+        except BaseException as e:
+            logger.error(f"Knowledge base build failed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    if status != 0:
+        logger.error(f"Knowledge base build exited with status {status}, workers will retry it")
+    preload_snapshot(KNOWLEDGE_BASE["SNAPSHOT_DIR"], mmap=KNOWLEDGE_BASE["MMAP"])
+
+def verify_embedding_backend():
+    """
+    Runs the ONNX parity check once, before any worker exists, and settles the backend for all of
+    them: VERIFY_PARITY is cleared so workers (and the knowledge base build) skip loading the
+    PyTorch reference, and a failed check switches BACKEND to torch. The check runs inference,
+    which starts threads, so like the knowledge base build it runs in a short-lived child.
+    """
+    config = HUGGINGFACE_EMBEDDINGS_MODEL
+    if config["BACKEND"] != "onnx" or not config["VERIFY_PARITY"]:
+        return
+    from services.embedding_backends import onnx_parity_report
+
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            code = 0 if onnx_parity_report(config)["passed"] else 1
+        except BaseException as e:
+            logger.error(f"ONNX parity check failed to run: {e}")
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    if status != 0:
+        logger.error("ONNX embeddings failed the parity check, serving with PyTorch")
+        config["BACKEND"] = "torch"
+    config["VERIFY_PARITY"] = False
+
+def preload_models(preload_image_models: bool = False):
+    """
+    Loads model weights and the knowledge base in the parent so forked workers start from the
+    same pages copy-on-write.
+    Nothing here may start threads or run inference: thread pools don't survive fork.
+    ONNX Runtime sessions own their thread pools from creation, so for the ONNX backend the
+    parent only makes sure the exported int8 model is on disk and each worker opens its own
+    (small) session; the PyTorch backend's weights are loaded here and shared.
+    """
+    config = HUGGINGFACE_EMBEDDINGS_MODEL
+    if config["BACKEND"] == "onnx":
+        from services.embedding_backends import export_onnx_model
+
+        export_onnx_model(config["MODEL_NAME"], config["ONNX_CACHE_DIR"], config["ONNX_QUANTIZE"])
+        verify_embedding_backend()
+
+    preload_knowledge_base()
+
+    if config["BACKEND"] != "onnx":
+        from services.embedding_backends import get_shared_embeddings
+
+        # BatchedEmbeddings starts its worker thread lazily per pid, so only the weights are loaded
+        get_shared_embeddings()
+
+    if preload_image_models:
+        from services.image_understanding import get_image_understanding
+
+        get_image_understanding().captioner._load()
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def _run_worker(app, sock: socket.socket, worker_id: int):
+    # Workers exit on SIGTERM/SIGINT through uvicorn's own handlers
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    logger.info(f"Worker {worker_id} started with pid {os.getpid()}")
+    server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+    server.run(sockets=[sock])
+
+def serve_prefork(app, host: str, port: int, workers: int, preload_image_models: bool = False, gc_freeze: bool = True, restart_delay: float = 1.0):
+    """
+    Pre-fork server: loads models once in this process, binds the listening socket, then forks
+    `workers` uvicorn servers that accept on it. Per-request state (session stores, caches,
+    executors) is built inside each worker after the fork, so only read-only weights are shared.
+    Dead workers are replaced; SIGTERM/SIGINT are forwarded to every worker.
+    """
+    started = time.perf_counter()
+    preload_models(preload_image_models)
+    logger.info(f"Preloaded models in {time.perf_counter() - started:.2f}s")
+    sock = _bind(host, port)
+    if gc_freeze:
+        # Moves everything allocated so far out of the collector's reach, so GC passes in the
+        # workers don't write to (and un-share) the parent's object pages
+        gc.collect()
+        gc.freeze()
+
+    children = {}
+    stopping = False
+
+    def spawn(worker_id: int):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(app, sock, worker_id)
+            finally:
+                os._exit(0)
+        children[pid] = worker_id
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for worker_id in range(workers):
+        spawn(worker_id)
+    logger.info(f"Serving on {host}:{port} with {workers} workers")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        worker_id = children.pop(pid, None)
+        if worker_id is None or stopping:
+            continue
+        logger.error(f"Worker {worker_id} (pid {pid}) exited with status {status}, restarting")
+        time.sleep(restart_delay)
+        spawn(worker_id)
+    sock.close()
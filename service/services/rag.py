@@ -1,14 +1,18 @@
 import os
+import uuid
+from contextlib import contextmanager
 
 from utils.logger import logger
 from langchain_core.documents import Document
-from langchain_community.vectorstores import FAISS
-from utils.files import process_files
+from utils.files import iter_documents, normalize_file_input, IMAGE_FILE_TYPES
+from services.session_store import SessionStoreManager
+from services.embedding_cache import EmbeddingCache
+from services.knowledge_base import KnowledgeBase
+from services.embedding_backends import get_shared_embeddings, embedding_model_id
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 
-from config.models import HUGGINGFACE_EMBEDDINGS_MODEL
+from config.models import HUGGINGFACE_EMBEDDINGS_MODEL, SESSION_VECTOR_STORE, EMBEDDING_CACHE, VECTOR_INDEX, KNOWLEDGE_BASE, EMBEDDING_BATCHER
 
 from dotenv import load_dotenv
 
@@ -20,32 +24,118 @@ class RAGService:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.splitter = RecursiveCharacterTextSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
-        self.embeddings = HuggingFaceEmbeddings(model_name=HUGGINGFACE_EMBEDDINGS_MODEL["MODEL_NAME"])
-        self.vector_store = None
+        self.embeddings = get_shared_embeddings()
+        model_id = embedding_model_id(HUGGINGFACE_EMBEDDINGS_MODEL, self.embeddings.base)
+        self.embedding_cache = EmbeddingCache(
+            model_name=model_id,
+            max_memory_entries=EMBEDDING_CACHE["MAX_MEMORY_ENTRIES"],
+            disk_path=EMBEDDING_CACHE["DISK_PATH"],
+            max_memory_bytes=EMBEDDING_CACHE["MAX_MEMORY_MB"] * 1024 * 1024,
+            max_disk_bytes=EMBEDDING_CACHE["MAX_DISK_MB"] * 1024 * 1024
+        )
+        self.session_stores = SessionStoreManager(
+            embeddings=self.embeddings,
+            idle_ttl_seconds=SESSION_VECTOR_STORE["IDLE_TTL_SECONDS"],
+            max_total_vectors=SESSION_VECTOR_STORE["MAX_TOTAL_VECTORS"],
+            max_memory_bytes=SESSION_VECTOR_STORE["MAX_MEMORY_MB"] * 1024 * 1024,
+            snapshot_dir=SESSION_VECTOR_STORE["SNAPSHOT_DIR"],
+            index_config=VECTOR_INDEX,
+            write_through=SESSION_VECTOR_STORE["WRITE_THROUGH"],
+            model_id=model_id
+        )
+        self.knowledge_base = KnowledgeBase.from_config(
+            KNOWLEDGE_BASE,
+            embeddings=self.embeddings,
+            model_name=model_id,
+            index_config=VECTOR_INDEX,
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap
+        )
+        self.knowledge_base.load()
 
-    def _ingest_files(self, files: list):
+    @contextmanager
+    def _session_scope(self, session_id: str = None):
+        """Requests without a session id get a throwaway store that is dropped once they finish."""
+        if session_id:
+            yield session_id
+            return
+        ephemeral_id = f"ephemeral-{uuid.uuid4().hex}"
+        try:
+            yield ephemeral_id
+        finally:
+            self.session_stores.discard(ephemeral_id)
+
+    def _embed_file(self, filename: str, content: bytes) -> tuple:
+        """Returns (cache_key, texts, metadatas, vectors), only parsing and embedding on a cache miss."""
+        key = self.embedding_cache.make_key(filename, content, self.chunk_size, self.chunk_overlap)
+        cached = self.embedding_cache.get(key)
+        if cached is None:
+            texts, metadatas, vectors = [], [], []
+            batch_size = EMBEDDING_BATCHER["MAX_BATCH_SIZE"]
+            # Pages are split and embedded as they are parsed, so embedding overlaps extraction
+            for doc in iter_documents([{"filename": filename, "content": content}]):
+                for chunk in self.splitter.split_documents([doc]):
+                    texts.append(chunk.page_content)
+                    metadatas.append(chunk.metadata)
+                if len(texts) - len(vectors) >= batch_size:
+                    vectors.extend(self.embeddings.embed_documents(texts[len(vectors):]))
+            if len(texts) > len(vectors):
+                vectors.extend(self.embeddings.embed_documents(texts[len(vectors):]))
+            # Empty results are cached too so unparseable files are not retried every turn;
+            # transient failures (model load, OCR timeouts) raise before reaching here
+            cached = self.embedding_cache.put(key, texts, metadatas, vectors)
+        return (key, *cached)
+
+    def _prefetch_images(self, uploads: list):
+        """Queues captions for every uncached image up front so one request's images share a batch."""
+        images = []
+        for filename, content in uploads:
+            if filename.rsplit(".", 1)[-1].lower() not in IMAGE_FILE_TYPES:
+                continue
+            key = self.embedding_cache.make_key(filename, content, self.chunk_size, self.chunk_overlap)
+            if self.embedding_cache.get(key) is None:
+                images.append((filename, content))
+        if images:
+            from services.image_understanding import get_image_understanding
+
+            get_image_understanding().prefetch(images)
+
+    def _ingest_files(self, files: list, session_id: str):
         if not files:
             return
+        uploads = []
+        for f in files:
+            filename, content = normalize_file_input(f)
+            if filename and content is not None:
+                uploads.append((filename, content))
         try:
-            raw_docs = process_files(files)
-            if not raw_docs:
-                return
-            split_docs = self.splitter.split_documents(raw_docs)
-            if not split_docs:
-                return
-            if self.vector_store is None:
-                self.vector_store = FAISS.from_documents(split_docs, self.embeddings)
-            else:
-                self.vector_store.add_documents(split_docs)
+            self._prefetch_images(uploads)
         except Exception as e:
-            logger.error(f"File ingestion error: {e}")
+            logger.error(f"Image prefetch error: {e}")
+        for filename, content in uploads:
+            try:
+                key, texts, metadatas, vectors = self._embed_file(filename, content)
+                if not texts:
+                    continue
+                self.session_stores.upsert_document(session_id, filename, key, texts, vectors, metadatas)
+            except Exception as e:
+                logger.error(f"File ingestion error: {e}")
     
-    def _retrieve_context(self, query: str, k: int = 4) -> str:
-        if not self.vector_store:
+    def remove_documents(self, session_id: str, sources: list) -> list:
+        return [source for source in sources if self.session_stores.remove_document(session_id, source)]
+
+    def _retrieve_context(self, query: str, session_id: str, k: int = 4) -> str:
+        has_documents = self.session_stores.has_documents(session_id)
+        if not has_documents and self.knowledge_base.vector_store is None:
             return "No external context."
         try:
-            retriever = self.vector_store.as_retriever(search_kwargs={"k": k})
-            docs: list[Document] = retriever.invoke(query)
+            # Embed once and search both indexes, both use L2 over the same embedding space
+            embedding = self.embeddings.embed_query(query)
+            results = self.knowledge_base.search_by_vector(embedding, k)
+            if has_documents:
+                results += self.session_stores.search(session_id, embedding, k)
+            results.sort(key=lambda r: r[1])
+            docs: list[Document] = [doc for doc, _ in results[:k]]
             parts = []
             for d in docs:
                 src = d.metadata.get("source")
@@ -53,4 +143,16 @@ class RAGService:
             return "\n---\n".join(parts)
         except Exception as e:
             logger.error(f"Retrieval error: {e}")
-            return "Context retrieval failed."
\ No newline at end of file
+            return "Context retrieval failed."
+
+    def _context_version(self, session_id: str = None) -> dict:
+        """What retrieval would search for this session, without searching it."""
+        return {
+            "knowledge_base": self.knowledge_base.fingerprint,
+            "session_documents": self.session_stores.document_version(session_id) if session_id else []
+        }
+
+    def _prepare_context(self, query: str, files: list, session_id: str = None) -> str:
+        with self._session_scope(session_id) as scoped_id:
+            self._ingest_files(files, scoped_id)
+            return self._retrieve_context(query, scoped_id)
@@ -0,0 +1,145 @@
+import re
+import copy
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+class _Bucket:
+    """Normalized prompts cached under one context fingerprint, with their unit vectors."""
+    def __init__(self):
+        self.vectors = OrderedDict()
+        self._matrix = None
+        self._keys = None
+
+    def add(self, prompt: str, vector: np.ndarray):
+        self.vectors[prompt] = vector
+        self._matrix = None
+
+    def remove(self, prompt: str):
+        if self.vectors.pop(prompt, None) is not None:
+            self._matrix = None
+
+    def nearest(self, vector: np.ndarray) -> tuple:
+        if not self.vectors:
+            return None, 0.0
+        if self._matrix is None:
+            self._keys = list(self.vectors.keys())
+            self._matrix = np.stack(list(self.vectors.values()))
+        scores = self._matrix @ vector
+        best = int(np.argmax(scores))
+        return self._keys[best], float(scores[best])
+
+class ResponseCache:
+    """
+    Caches final agent responses for repeated questions. Entries are keyed by the normalized
+    prompt under a fingerprint of everything else the answer depends on (model, system prompt,
+    knowledge base and session document versions, history). Lookups try an exact match first, then the most similar cached
+    prompt under the same fingerprint if its cosine similarity clears semantic_threshold.
+    """
+    def __init__(self, embeddings, ttl_seconds: float = 21600, max_entries: int = 5000, semantic_threshold: float = 0.92, enabled: bool = True):
+        self.embeddings = embeddings
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.semantic_threshold = semantic_threshold
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._counters = {"lookups": 0, "exact_hits": 0, "semantic_hits": 0, "misses": 0, "bypassed": 0, "stores": 0}
+
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", prompt.lower())).strip()
+
+    @staticmethod
+    def fingerprint(*parts) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def _embed(self, prompt: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(prompt), dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _drop(self, key: tuple):
+        self._entries.pop(key, None)
+        bucket = self._buckets.get(key[0])
+        if bucket is not None:
+            bucket.remove(key[1])
+            if not bucket.vectors:
+                del self._buckets[key[0]]
+
+    def _live(self, key: tuple) -> dict:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() >= entry["expires_at"]:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def record_bypass(self):
+        with self._lock:
+            self._counters["bypassed"] += 1
+
+    def get(self, prompt: str, fingerprint: str) -> dict:
+        if not self.enabled:
+            return None
+        normalized = self.normalize(prompt)
+        with self._lock:
+            self._counters["lookups"] += 1
+            entry = self._live((fingerprint, normalized))
+            if entry is not None:
+                self._counters["exact_hits"] += 1
+                return copy.deepcopy(entry["response"])
+            has_bucket = fingerprint in self._buckets
+        if not has_bucket:
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+
+        vector = self._embed(prompt)
+        with self._lock:
+            bucket = self._buckets.get(fingerprint)
+            match, score = bucket.nearest(vector) if bucket is not None else (None, 0.0)
+            entry = self._live((fingerprint, match)) if match is not None and score >= self.semantic_threshold else None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["semantic_hits"] += 1
+            return copy.deepcopy(entry["response"])
+
+    def put(self, prompt: str, fingerprint: str, response: dict):
+        if not self.enabled:
+            return
+        normalized = self.normalize(prompt)
+        vector = self._embed(prompt)
+        with self._lock:
+            key = (fingerprint, normalized)
+            self._entries[key] = {"response": copy.deepcopy(response), "expires_at": time.monotonic() + self.ttl_seconds}
+            self._entries.move_to_end(key)
+            self._buckets.setdefault(fingerprint, _Bucket()).add(normalized, vector)
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            entries = len(self._entries)
+        hits = counters["exact_hits"] + counters["semantic_hits"]
+        return {
+            **counters,
+            "entries": entries,
+            "hit_rate": round(hits / counters["lookups"], 4) if counters["lookups"] else 0.0
+        }
@@ -0,0 +1,352 @@
+import os
+import time
+import fcntl
+import hashlib
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+
+from langchain_community.vectorstores import FAISS
+
+from utils.logger import logger
+from services.document_registry import DocumentRegistry, DocumentRecord
+from services.vector_snapshot import save_snapshot, load_snapshot, delete_snapshot, snapshot_version
+from services.vector_index import ensure_backend, remove_vectors, index_backend
+
+# Rough per-vector bookkeeping cost of the docstore and id maps on top of the raw floats
+_PER_VECTOR_OVERHEAD_BYTES = 256
+
+class SessionEntry:
+    def __init__(self):
+        self.vector_store = None
+        self.text_bytes = 0
+        self.registry = DocumentRegistry()
+        self.last_access = time.monotonic()
+        self.lock = threading.Lock()
+        self.snapshot_version = None
+
+    @property
+    def vector_count(self) -> int:
+        if self.vector_store is None:
+            return 0
+        return self.vector_store.index.ntotal
+
+    @property
+    def memory_bytes(self) -> int:
+        if self.vector_store is None:
+            return 0
+        index = self.vector_store.index
+        return index.ntotal * (index.d * 4 + _PER_VECTOR_OVERHEAD_BYTES) + self.text_bytes
+
+class SessionStoreManager:
+    """
+    Keeps one small FAISS index per conversation so uploads never leak across users.
+    Sessions are kept in LRU order and evicted on idle TTL, total vector cap and memory budget.
+    When a snapshot directory is set, evicted sessions are written to disk and restored on
+    their next request instead of being re-embedded.
+    With write_through, worker processes sharing the snapshot directory share sessions: every
+    change takes a per-session file lock, first reloads the session if another worker saved a
+    newer version, applies the change on top and saves before releasing the lock, so concurrent
+    uploads to one session are merged rather than overwritten. Reads pick up newer versions
+    without locking since snapshots are swapped in atomically.
+    """
+    def __init__(self, embeddings, idle_ttl_seconds: float, max_total_vectors: int, max_memory_bytes: int, snapshot_dir: str = None, index_config: dict = None, write_through: bool = False, model_id: str = None):
+        self.embeddings = embeddings
+        # Snapshots are kept apart per embedding model/backend, vectors from different ones never mix
+        self.model_id = model_id
+        self.write_through = bool(write_through and snapshot_dir)
+        self.index_config = index_config
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_total_vectors = max_total_vectors
+        self.max_memory_bytes = max_memory_bytes
+        self.snapshot_dir = snapshot_dir
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._evictions = {"ttl": 0, "vectors": 0, "memory": 0}
+        self._restores = 0
+        self._last_index_report = None
+
+    def _snapshot_path(self, session_id: str) -> str:
+        # Session ids come from clients, never use them as a path directly
+        session_key = hashlib.sha256(session_id.encode("utf-8")).hexdigest()
+        if not self.model_id:
+            return os.path.join(self.snapshot_dir, session_key)
+        model_key = hashlib.sha256(self.model_id.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.snapshot_dir, model_key, session_key)
+
+    def _snapshot_version(self, session_id: str) -> str:
+        return snapshot_version(self._snapshot_path(session_id))
+
+    @contextmanager
+    def _file_lock(self, session_id: str):
+        """Serializes read-modify-write of one session's snapshot across processes."""
+        if not self.write_through or session_id.startswith("ephemeral-"):
+            yield
+            return
+        path = self._snapshot_path(session_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refresh(self, session_id: str, entry: SessionEntry):
+        """Replaces the entry's contents with the latest snapshot if another worker saved one. Called with entry.lock held."""
+        if not self.write_through or session_id.startswith("ephemeral-"):
+            return
+        version = self._snapshot_version(session_id)
+        if version == entry.snapshot_version:
+            return
+        vector_store, meta = (None, None)
+        if version is not None:
+            vector_store, meta = load_snapshot(self._snapshot_path(session_id), self.embeddings)
+        entry.vector_store = vector_store
+        entry.text_bytes = (meta or {}).get("text_bytes", 0)
+        entry.registry = DocumentRegistry.from_state((meta or {}).get("registry"))
+        entry.snapshot_version = version
+
+    def _write_through(self, session_id: str, entry: SessionEntry):
+        # Called with entry.lock held
+        if not self.write_through or session_id.startswith("ephemeral-"):
+            return
+        path = self._snapshot_path(session_id)
+        if entry.vector_store is None:
+            delete_snapshot(path)
+            entry.snapshot_version = None
+            return
+        try:
+            entry.snapshot_version = save_snapshot(entry.vector_store, path, meta={"text_bytes": entry.text_bytes, "registry": entry.registry.to_state()})
+        except Exception as e:
+            logger.error(f"Failed to write through vector store for session {session_id}: {e}")
+
+    def _persist(self, evicted: list):
+        # With write_through every change is already on disk, and re-saving a copy that another
+        # worker has since moved past would roll its changes back
+        if not self.snapshot_dir or self.write_through:
+            return
+        for session_id, entry in evicted:
+            if session_id.startswith("ephemeral-") or entry.vector_store is None:
+                continue
+            try:
+                with entry.lock:
+                    save_snapshot(
+                        entry.vector_store,
+                        self._snapshot_path(session_id),
+                        meta={"text_bytes": entry.text_bytes, "registry": entry.registry.to_state()}
+                    )
+            except Exception as e:
+                logger.error(f"Failed to snapshot vector store for session {session_id}: {e}")
+
+    def _restore(self, session_id: str) -> SessionEntry:
+        if not self.snapshot_dir or session_id.startswith("ephemeral-"):
+            return None
+        try:
+            version = self._snapshot_version(session_id)
+            # Session stores keep receiving uploads, so they are loaded onto the heap rather than mmapped
+            vector_store, meta = load_snapshot(self._snapshot_path(session_id), self.embeddings)
+        except Exception as e:
+            logger.error(f"Failed to restore vector store for session {session_id}: {e}")
+            return None
+        if vector_store is None:
+            return None
+        entry = SessionEntry()
+        entry.vector_store = vector_store
+        entry.text_bytes = meta.get("text_bytes", 0)
+        entry.registry = DocumentRegistry.from_state(meta.get("registry"))
+        entry.snapshot_version = version
+        return entry
+
+    def _touch(self, session_id: str, create: bool = False) -> SessionEntry:
+        with self._lock:
+            evicted = self._evict_expired()
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                entry.last_access = time.monotonic()
+                self._sessions.move_to_end(session_id)
+        self._persist(evicted)
+        if entry is not None:
+            return entry
+
+        restored = self._restore(session_id)
+        if restored is None and not create:
+            return None
+        with self._lock:
+            # Another request may have created the session while we were reading the snapshot
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = restored or SessionEntry()
+                self._sessions[session_id] = entry
+                if restored is not None:
+                    self._restores += 1
+            entry.last_access = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        if restored is not None:
+            self._enforce_budgets(keep=session_id)
+        return entry
+
+    def _evict_expired(self) -> list:
+        now = time.monotonic()
+        evicted = []
+        # OrderedDict is in access order, so idle sessions are always at the front
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if now - entry.last_access < self.idle_ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+            self._evictions["ttl"] += 1
+            evicted.append((session_id, entry))
+            logger.info(f"Evicted idle vector store for session {session_id}")
+        return evicted
+
+    def _enforce_budgets(self, keep: str):
+        evicted = []
+        with self._lock:
+            total_vectors = sum(e.vector_count for e in self._sessions.values())
+            total_bytes = sum(e.memory_bytes for e in self._sessions.values())
+            for session_id in list(self._sessions.keys()):
+                over_vectors = total_vectors > self.max_total_vectors
+                over_memory = total_bytes > self.max_memory_bytes
+                if not (over_vectors or over_memory):
+                    break
+                if session_id == keep:
+                    continue
+                entry = self._sessions.pop(session_id)
+                total_vectors -= entry.vector_count
+                total_bytes -= entry.memory_bytes
+                self._evictions["vectors" if over_vectors else "memory"] += 1
+                evicted.append((session_id, entry))
+                logger.info(f"Evicted vector store for session {session_id} to stay within budget")
+        self._persist(evicted)
+
+    def upsert_document(self, session_id: str, source: str, content_hash: str, texts: list, vectors, metadatas: list) -> int:
+        """
+        Indexes one document version for a session. Unchanged documents are skipped, a changed
+        document has its previous chunks deleted before the new ones are added.
+        Returns the number of vectors added.
+        """
+        entry = self._touch(session_id, create=True)
+        with entry.lock, self._file_lock(session_id):
+            self._refresh(session_id, entry)
+            previous = entry.registry.get(source)
+            if previous is not None and previous.content_hash == content_hash:
+                return 0
+            if previous is not None:
+                self._delete_record(entry, previous)
+            ids = [f"{content_hash}:{i}" for i in range(len(texts))]
+            if texts:
+                text_embeddings = [(text, list(vector)) for text, vector in zip(texts, vectors)]
+                if entry.vector_store is None:
+                    entry.vector_store = FAISS.from_embeddings(
+                        text_embeddings, self.embeddings, metadatas=metadatas, ids=ids
+                    )
+                else:
+                    entry.vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+                if self.index_config:
+                    report = ensure_backend(entry.vector_store, self.index_config)
+                    if report is not None:
+                        self._last_index_report = report
+            text_bytes = sum(len(t) for t in texts)
+            entry.text_bytes += text_bytes
+            entry.registry.register(DocumentRecord(source, content_hash, ids, text_bytes))
+            self._write_through(session_id, entry)
+        self._enforce_budgets(keep=session_id)
+        return len(ids)
+
+    def _delete_record(self, entry: SessionEntry, record: DocumentRecord):
+        entry.registry.remove(record.source)
+        if record.chunk_ids and entry.vector_store is not None:
+            if self.index_config:
+                remove_vectors(entry.vector_store, record.chunk_ids, self.index_config)
+            else:
+                entry.vector_store.delete(record.chunk_ids)
+        entry.text_bytes -= record.text_bytes
+        logger.info(f"Removed {len(record.chunk_ids)} chunks of {record.source} from vector store")
+
+    def remove_document(self, session_id: str, source: str) -> bool:
+        entry = self._touch(session_id)
+        if entry is None:
+            return False
+        with entry.lock, self._file_lock(session_id):
+            self._refresh(session_id, entry)
+            record = entry.registry.get(source)
+            if record is None:
+                return False
+            self._delete_record(entry, record)
+            self._write_through(session_id, entry)
+        return True
+
+    def list_documents(self, session_id: str) -> list:
+        entry = self._touch(session_id)
+        if entry is None:
+            return []
+        with entry.lock:
+            self._refresh(session_id, entry)
+            return [record.to_dict() for record in entry.registry.records()]
+
+    def has_documents(self, session_id: str) -> bool:
+        entry = self._touch(session_id)
+        if entry is None:
+            return False
+        with entry.lock:
+            self._refresh(session_id, entry)
+            return entry.vector_count > 0
+
+    def document_version(self, session_id: str) -> list:
+        """Sorted (source, content_hash) pairs of the indexed documents, changes with anything searchable."""
+        entry = self._touch(session_id)
+        if entry is None:
+            return []
+        with entry.lock:
+            self._refresh(session_id, entry)
+            return sorted((record.source, record.content_hash) for record in entry.registry.records())
+
+    def search(self, session_id: str, embedding: list, k: int) -> list:
+        """
+        (Document, score) pairs from the session's store. Runs under the entry lock so a concurrent
+        upsert, index migration or delete can't swap the index or id mapping mid-search.
+        """
+        entry = self._touch(session_id)
+        if entry is None:
+            return []
+        with entry.lock:
+            self._refresh(session_id, entry)
+            if entry.vector_store is None:
+                return []
+            return entry.vector_store.similarity_search_with_score_by_vector(embedding, k=k)
+
+    def discard(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        if self.snapshot_dir and not session_id.startswith("ephemeral-"):
+            with self._file_lock(session_id):
+                delete_snapshot(self._snapshot_path(session_id))
+
+    def snapshot_all(self):
+        """Persists every live session, used on shutdown so a restarted replica warm-starts."""
+        with self._lock:
+            live = list(self._sessions.items())
+        self._persist(live)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = list(self._sessions.values())
+            evictions = dict(self._evictions)
+            restores = self._restores
+            index_report = self._last_index_report
+        backends = {}
+        for e in entries:
+            if e.vector_store is not None:
+                backend = index_backend(e.vector_store.index)
+                backends[backend] = backends.get(backend, 0) + 1
+        return {
+            "sessions": len(entries),
+            "documents": sum(len(e.registry) for e in entries),
+            "total_vectors": sum(e.vector_count for e in entries),
+            "memory_bytes": sum(e.memory_bytes for e in entries),
+            "evictions": evictions,
+            "restores": restores,
+            "index_backends": backends,
+            "last_index_migration": index_report
+        }
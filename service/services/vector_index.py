@@ -0,0 +1,142 @@
+import time
+import math
+
+import faiss
+import numpy as np
+
+from utils.logger import logger
+
+FLAT = "flat"
+HNSW = "hnsw"
+IVF_FLAT = "ivf_flat"
+IVF_PQ = "ivf_pq"
+BACKENDS = {FLAT, HNSW, IVF_FLAT, IVF_PQ}
+
+# faiss warns below ~39 training points per centroid
+_MIN_POINTS_PER_CENTROID = 39
+
+def index_backend(index) -> str:
+    if isinstance(index, faiss.IndexHNSWFlat):
+        return HNSW
+    if isinstance(index, faiss.IndexIVFPQ):
+        return IVF_PQ
+    if isinstance(index, faiss.IndexIVFFlat):
+        return IVF_FLAT
+    return FLAT
+
+def _nlist_for(count: int, config: dict) -> int:
+    nlist = config.get("IVF_NLIST") or int(4 * math.sqrt(count))
+    # Never ask for more centroids than the data can train
+    return max(1, min(nlist, count // _MIN_POINTS_PER_CENTROID))
+
+def build_index(backend: str, vectors: np.ndarray, config: dict):
+    """Creates an empty, trained index of the given backend sized for `vectors`."""
+    dim = vectors.shape[1]
+    if backend == FLAT:
+        return faiss.IndexFlatL2(dim)
+    if backend == HNSW:
+        index = faiss.IndexHNSWFlat(dim, config["HNSW_M"])
+        index.hnsw.efConstruction = config["HNSW_EF_CONSTRUCTION"]
+        index.hnsw.efSearch = config["HNSW_EF_SEARCH"]
+        return index
+
+    nlist = _nlist_for(len(vectors), config)
+    quantizer = faiss.IndexFlatL2(dim)
+    if backend == IVF_FLAT:
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+    elif backend == IVF_PQ:
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, config["PQ_M"], config["PQ_NBITS"])
+    else:
+        raise ValueError(f"Unknown vector index backend: {backend}")
+
+    sample_size = min(len(vectors), config["TRAINING_SAMPLE_SIZE"])
+    sample_idx = np.random.default_rng(0).choice(len(vectors), size=sample_size, replace=False)
+    index.train(np.ascontiguousarray(vectors[sample_idx]))
+    index.nprobe = min(config["IVF_NPROBE"], nlist)
+    # A direct map lets reconstruct_n read vectors back for migration and deletes
+    index.make_direct_map()
+    return index
+
+def target_backend(count: int, config: dict) -> str:
+    backend = config["BACKEND"]
+    if backend == "auto":
+        backend = config["AUTO_BACKEND"] if count >= config["MIGRATION_THRESHOLD"] else FLAT
+    # PQ codebooks need 2**nbits centroids per sub-quantizer, fall back until there is enough data
+    if backend == IVF_PQ and count < (2 ** config["PQ_NBITS"]) * _MIN_POINTS_PER_CENTROID:
+        backend = IVF_FLAT
+    if backend in (IVF_FLAT, IVF_PQ) and count < _MIN_POINTS_PER_CENTROID:
+        backend = FLAT
+    return backend
+
+def evaluate_index(index, vectors: np.ndarray, k: int = 10, num_queries: int = 200) -> dict:
+    """Recall@k against exact search over `vectors`, plus per-query search latency."""
+    rng = np.random.default_rng(1)
+    queries = np.ascontiguousarray(vectors[rng.choice(len(vectors), size=min(num_queries, len(vectors)), replace=False)])
+    k = min(k, len(vectors))
+    _, truth = faiss.knn(queries, vectors, k)
+
+    latencies = []
+    found = np.empty_like(truth)
+    for i, query in enumerate(queries):
+        started = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        found[i] = ids[0]
+
+    hits = sum(len(set(found[i]) & set(truth[i])) for i in range(len(queries)))
+    latencies.sort()
+    return {
+        "backend": index_backend(index),
+        "vectors": int(index.ntotal),
+        "k": k,
+        "recall_at_k": round(hits / (len(queries) * k), 4),
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p95_ms": round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)], 3)
+    }
+
+def ensure_backend(vector_store, config: dict) -> dict:
+    """
+    Migrates a LangChain FAISS store to the configured backend once it crosses the threshold.
+    Vector positions are preserved, so index_to_docstore_id stays valid. Returns the
+    recall/latency report of the new index, or None when no migration was needed.
+    """
+    index = vector_store.index
+    backend = target_backend(index.ntotal, config)
+    if backend == index_backend(index) or backend == FLAT:
+        return None
+
+    started = time.perf_counter()
+    vectors = index.reconstruct_n(0, index.ntotal)
+    new_index = build_index(backend, vectors, config)
+    new_index.add(vectors)
+    report = evaluate_index(new_index, vectors)
+    report["build_seconds"] = round(time.perf_counter() - started, 2)
+    vector_store.index = new_index
+    logger.info(f"Migrated vector index to {backend}: {report}")
+    return report
+
+def remove_vectors(vector_store, ids: list, config: dict):
+    """
+    Deletes docstore ids from a LangChain FAISS store of any backend.
+    FAISS.delete assumes remove_ids compacts positions, which only holds for flat indexes,
+    so approximate indexes are rebuilt from their remaining vectors instead.
+    """
+    index = vector_store.index
+    if index_backend(index) == FLAT:
+        vector_store.delete(ids)
+        return
+
+    doomed = set(ids)
+    id_map = vector_store.index_to_docstore_id
+    positions = sorted(id_map)
+    keep = [p for p in positions if id_map[p] not in doomed]
+    vectors = index.reconstruct_n(0, index.ntotal)[keep]
+    if len(vectors):
+        new_index = build_index(target_backend(len(vectors), config), vectors, config)
+        new_index.add(vectors)
+    else:
+        new_index = faiss.IndexFlatL2(index.d)
+
+    vector_store.docstore.delete([id_map[p] for p in positions if id_map[p] in doomed])
+    vector_store.index_to_docstore_id = {i: id_map[p] for i, p in enumerate(keep)}
+    vector_store.index = new_index
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import pickle
+
+import faiss
+from langchain_community.vectorstores import FAISS
+
+from utils.logger import logger
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "index.pkl"
+META_FILE = "meta.json"
+# Names the live version directory inside a snapshot path
+CURRENT_FILE = "CURRENT"
+# Superseded versions kept around for readers that resolved CURRENT just before a swap
+KEEP_VERSIONS = 2
+# Temp directories left behind by a writer that died mid-save
+STALE_TMP_SECONDS = 3600
+
+def _unique_name(prefix: str) -> str:
+    return f"{prefix}{time.time_ns()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+def snapshot_version(path: str) -> str:
+    """Name of the live version of the snapshot at path, or None if there is none."""
+    try:
+        with open(os.path.join(path, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def _version_path(path: str, version: str) -> str:
+    if version is not None:
+        return os.path.join(path, version)
+    # Snapshots written before versioning keep their files at the top level
+    return path if os.path.exists(os.path.join(path, INDEX_FILE)) else None
+
+def _prune_versions(path: str, current: str):
+    # Version names sort by creation time; anything newer than ours belongs to a writer mid-swap
+    older = sorted(name for name in os.listdir(path) if name.startswith("v-") and name < current)
+    for name in older[:-(KEEP_VERSIONS - 1) or None]:
+        shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+    now = time.time()
+    for name in os.listdir(path):
+        if not name.startswith((".tmp-", ".current-")):
+            continue
+        leftover = os.path.join(path, name)
+        try:
+            if now - os.stat(leftover).st_mtime < STALE_TMP_SECONDS:
+                continue
+            if os.path.isdir(leftover):
+                shutil.rmtree(leftover, ignore_errors=True)
+            else:
+                os.remove(leftover)
+        except OSError:
+            pass
+
+def save_snapshot(vector_store: FAISS, path: str, meta: dict = None) -> str:
+    """
+    Writes the FAISS index, docstore sidecar and meta into a new version directory under path
+    (the layout FAISS.load_local expects), then atomically repoints CURRENT at it. Concurrent
+    writers each get their own directory and the last swap wins; readers always see one
+    complete version. Returns the new version name.
+    """
+    os.makedirs(path, exist_ok=True)
+    tmp_path = os.path.join(path, _unique_name(".tmp-"))
+    try:
+        os.makedirs(tmp_path)
+        faiss.write_index(vector_store.index, os.path.join(tmp_path, INDEX_FILE))
+        with open(os.path.join(tmp_path, DOCSTORE_FILE), "wb") as f:
+            pickle.dump((vector_store.docstore, vector_store.index_to_docstore_id), f)
+        with open(os.path.join(tmp_path, META_FILE), "w") as f:
+            json.dump(meta or {}, f)
+        version = _unique_name("v-")
+        os.rename(tmp_path, os.path.join(path, version))
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    pointer_tmp = os.path.join(path, _unique_name(".current-"))
+    with open(pointer_tmp, "w") as f:
+        f.write(version)
+    os.replace(pointer_tmp, os.path.join(path, CURRENT_FILE))
+    _prune_versions(path, version)
+    logger.info(f"Saved vector snapshot with {vector_store.index.ntotal} vectors to {path} ({version})")
+    return version
+
+def _read_version(version_path: str, mmap: bool) -> tuple:
+    meta = {}
+    meta_path = os.path.join(version_path, META_FILE)
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+    flags = faiss.IO_FLAG_MMAP_IFC if mmap else 0
+    index = faiss.read_index(os.path.join(version_path, INDEX_FILE), flags)
+    with open(os.path.join(version_path, DOCSTORE_FILE), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return (index, docstore, index_to_docstore_id), meta
+
+def read_snapshot(path: str, mmap: bool = False) -> tuple:
+    """
+    Reads ((index, docstore, index_to_docstore_id), meta) of the live version, or (None, None).
+    With mmap=True the flat vector storage (IndexFlat, HNSW's storage) is mapped from the file
+    instead of copied onto the heap; the HNSW graph and the pickled docstore are still loaded
+    into memory. A mapped index cannot grow: adding to it aborts, so only use it for stores
+    that are never written to.
+    """
+    for attempt in range(KEEP_VERSIONS + 1):
+        version = snapshot_version(path)
+        version_path = _version_path(path, version)
+        if version_path is None:
+            return None, None
+        try:
+            parts, meta = _read_version(version_path, mmap)
+            break
+        except (OSError, RuntimeError):
+            # Pruned by writers that swapped in newer versions while we were reading, try the latest
+            if version is None or snapshot_version(path) == version or attempt == KEEP_VERSIONS:
+                raise
+    logger.info(f"Loaded vector snapshot with {parts[0].ntotal} vectors from {version_path} (mmap={mmap})")
+    return parts, meta
+
+def to_vector_store(parts: tuple, embeddings) -> FAISS:
+    index, docstore, index_to_docstore_id = parts
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id
+    )
+
+def load_snapshot(path: str, embeddings, mmap: bool = False) -> tuple:
+    """Restores (vector_store, meta) from save_snapshot output, or (None, None) if absent. See read_snapshot for mmap."""
+    parts, meta = read_snapshot(path, mmap)
+    if parts is None:
+        return None, None
+    return to_vector_store(parts, embeddings), meta
+
+def delete_snapshot(path: str):
+    shutil.rmtree(path, ignore_errors=True)
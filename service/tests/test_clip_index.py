@@ -0,0 +1,69 @@
+import os
+import hashlib
+
+import numpy as np
+import pytest
+
+from services.clip_index import ClipImageIndex, EMBEDDINGS_FILE, IDS_FILE
+
+class _Encoder:
+    """Deterministic unit vectors per input, standing in for ClipService's encoders."""
+    def __init__(self, dim: int = 8, model_name: str = "clip-test"):
+        self.dim = dim
+        self.model_name = model_name
+
+    def _vector(self, data: bytes) -> np.ndarray:
+        seed = int(hashlib.sha256(data).hexdigest()[:8], 16)
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def encode_image(self, images: list, batch_size: int = None) -> np.ndarray:
+        return np.stack([self._vector(data) for data in images])
+
+    def encode_text(self, query: str) -> np.ndarray:
+        return self._vector(query.encode())[None, :]
+
+def _images(count: int, offset: int = 0) -> list:
+    return [(f"id{i}", f"image {i}".encode()) for i in range(offset, offset + count)]
+
+def test_add_skips_duplicate_content_and_survives_reload(tmp_path):
+    index = ClipImageIndex(_Encoder(), str(tmp_path), batch_size=4)
+    assert index.add(_images(10)) == 10
+    assert index.add([("copy", b"image 3")]) == 0
+
+    reloaded = ClipImageIndex(_Encoder(), str(tmp_path))
+    assert reloaded.stats()["images"] == 10
+    best, score = reloaded.search("image 3", k=1)[0]
+    assert best == "id3" and score > 0.99
+    assert reloaded.add(_images(1, offset=10)) == 1
+
+def test_uncommitted_ids_are_dropped_on_load(tmp_path):
+    ClipImageIndex(_Encoder(), str(tmp_path)).add(_images(3))
+    with open(os.path.join(tmp_path, IDS_FILE), "a") as f:
+        f.write('["partial", "digest"]\n')
+    index = ClipImageIndex(_Encoder(), str(tmp_path))
+    assert index.ids == ["id0", "id1", "id2"]
+    with open(os.path.join(tmp_path, IDS_FILE)) as f:
+        assert len(f.readlines()) == 3
+
+def test_index_of_another_width_is_rejected(tmp_path):
+    ClipImageIndex(_Encoder(dim=8), str(tmp_path)).add(_images(2))
+    with pytest.raises(ValueError):
+        ClipImageIndex(_Encoder(dim=8), str(tmp_path), embedding_dim=16)
+
+def test_encoder_of_another_width_is_rejected(tmp_path):
+    index = ClipImageIndex(_Encoder(dim=8), str(tmp_path), embedding_dim=16)
+    with pytest.raises(ValueError):
+        index.add(_images(1))
+    assert index.stats()["images"] == 0
+
+def test_truncated_embeddings_file_is_rejected(tmp_path):
+    ClipImageIndex(_Encoder(), str(tmp_path)).add(_images(2))
+    with open(os.path.join(tmp_path, EMBEDDINGS_FILE), "r+b") as f:
+        f.truncate(10)
+    with pytest.raises(ValueError):
+        ClipImageIndex(_Encoder(), str(tmp_path))
+
+def test_a_different_model_starts_a_new_index(tmp_path):
+    ClipImageIndex(_Encoder(), str(tmp_path)).add(_images(2))
+    assert ClipImageIndex(_Encoder(model_name="other"), str(tmp_path)).stats()["images"] == 0
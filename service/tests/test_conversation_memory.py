@@ -0,0 +1,84 @@
+from langchain_core.messages import HumanMessage, AIMessage
+
+from services.conversation_memory import ConversationMemory
+
+class _WordCounter:
+    """One token per word and no per-message overhead, so budgets are easy to reason about."""
+    exact = True
+
+    def count(self, text: str) -> int:
+        return len(text.split())
+
+    def count_message(self, message) -> int:
+        return self.count(message.content)
+
+def _turns(count: int, words: int = 10) -> list:
+    messages = []
+    for i in range(count):
+        messages.append(HumanMessage(content=" ".join([f"q{i}"] * words)))
+        messages.append(AIMessage(content=" ".join([f"a{i}"] * words)))
+    return messages
+
+def _memory(calls: list, **kwargs) -> ConversationMemory:
+    def summarize(previous, messages):
+        calls.append((previous, [m.content.split()[0] for m in messages]))
+        return "summary " + " ".join(m.content.split()[0] for m in messages)
+    return ConversationMemory(summarize, _WordCounter(), **{"max_history_tokens": 60, "recent_tokens": 30, **kwargs})
+
+def test_short_history_is_sent_verbatim():
+    calls = []
+    messages = _turns(2)
+    assert _memory(calls).compact("s", messages) == (None, messages)
+    assert calls == []
+
+def test_long_history_is_folded_into_a_summary():
+    calls = []
+    memory = _memory(calls)
+    messages = _turns(5)
+    summary, history = memory.compact("s", messages)
+    # The newest 30 tokens would open on a3, the tail moves up to the next user turn
+    assert history == messages[8:]
+    assert calls == [(None, ["q0", "a0", "q1", "a1", "q2", "a2", "q3", "a3"])]
+    assert summary == "summary q0 a0 q1 a1 q2 a2 q3 a3"
+
+def test_following_turns_only_summarize_new_messages():
+    calls = []
+    memory = _memory(calls)
+    memory.compact("s", _turns(5))
+    memory.compact("s", _turns(8))
+    assert len(calls) == 2
+    first_covered, second_previous = calls[0][1], calls[1][0]
+    assert second_previous == "summary " + " ".join(first_covered)
+    assert not set(calls[1][1]) & set(first_covered)
+
+def test_rewritten_history_starts_a_fresh_summary():
+    calls = []
+    memory = _memory(calls)
+    memory.compact("s", _turns(5))
+    edited = _turns(6)
+    edited[0] = HumanMessage(content="edited " * 10)
+    memory.compact("s", edited)
+    assert calls[1][0] is None
+    assert memory.stats()["summary_resets"] == 1
+
+def test_summarize_failure_keeps_recent_turns():
+    def summarize(previous, messages):
+        raise RuntimeError("model unavailable")
+    memory = ConversationMemory(summarize, _WordCounter(), max_history_tokens=60, recent_tokens=30)
+    messages = _turns(5)
+    summary, history = memory.compact("s", messages)
+    assert summary is None
+    assert history == messages[-len(history):] and len(history) < len(messages)
+    assert memory.stats()["summary_failures"] == 1
+
+def test_sessions_are_bounded():
+    calls = []
+    memory = _memory(calls, max_sessions=2)
+    for session in ("a", "b", "c"):
+        memory.compact(session, _turns(5))
+    assert memory.stats()["sessions"] == 2
+
+def test_anonymous_sessions_are_keyed_by_the_opening_message():
+    messages = _turns(1)
+    assert ConversationMemory.session_key(None, messages) == ConversationMemory.session_key(None, messages + _turns(1))
+    assert ConversationMemory.session_key("abc", messages) == "abc"
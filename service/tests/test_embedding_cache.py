@@ -0,0 +1,40 @@
+import sqlite3
+
+import numpy as np
+
+from services.embedding_cache import EmbeddingCache
+
+def _put(cache: EmbeddingCache, key: str, rows: int = 2, dim: int = 512):
+    return cache.put(key, ["t" * 100] * rows, [{}] * rows, np.ones((rows, dim), dtype=np.float32))
+
+def test_memory_tier_stays_within_its_byte_budget(tmp_path):
+    cache = EmbeddingCache("model", max_memory_entries=100, max_memory_bytes=10000)
+    for i in range(10):
+        _put(cache, f"k{i}")
+    stats = cache.stats()
+    assert stats["memory_bytes"] <= 10000
+    assert stats["memory_entries"] == 2
+    assert cache.get("k9") is not None and cache.get("k0") is None
+
+def test_entries_over_the_memory_budget_are_served_from_disk(tmp_path):
+    cache = EmbeddingCache("model", disk_path=str(tmp_path / "e.sqlite3"), max_memory_bytes=1000)
+    _put(cache, "big")
+    assert cache.stats()["memory_entries"] == 0
+    texts, _, vectors = cache.get("big")
+    assert len(texts) == 2 and vectors.shape == (2, 512)
+    assert cache.stats()["disk_hits"] == 1
+
+def test_disk_tier_prunes_least_recently_used(tmp_path):
+    path = str(tmp_path / "e.sqlite3")
+    cache = EmbeddingCache("model", max_memory_entries=0, disk_path=path, max_disk_bytes=30000)
+    _put(cache, "first")
+    for i in range(5):
+        _put(cache, f"k{i}")
+        # Reading keeps "first" recently used
+        assert cache.get("first") is not None
+    for i in range(5, 10):
+        _put(cache, f"k{i}")
+    total = sqlite3.connect(path).execute("SELECT SUM(size) FROM embeddings").fetchone()[0]
+    assert total <= 30000
+    assert cache.get("k0") is None and cache.get("k9") is not None
+    assert cache.stats()["evictions"]["disk"] > 0
@@ -0,0 +1,21 @@
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("sentence_transformers")
+
+from config.models import HUGGINGFACE_EMBEDDINGS_MODEL
+from services.embedding_backends import OnnxEmbeddings, check_parity, _torch_embeddings
+
+# Downloads and exports the embedding model on first run
+@pytest.mark.slow
+def test_onnx_backend_matches_torch_reference():
+    config = HUGGINGFACE_EMBEDDINGS_MODEL
+    candidate = OnnxEmbeddings(
+        model_name=config["MODEL_NAME"],
+        cache_dir=config["ONNX_CACHE_DIR"],
+        quantize=config["ONNX_QUANTIZE"],
+        intra_op_threads=config["ONNX_INTRA_OP_THREADS"],
+        max_length=config["MAX_SEQ_LENGTH"]
+    )
+    report = check_parity(_torch_embeddings(config), candidate, threshold=config["PARITY_THRESHOLD"])
+    assert report["passed"], report
@@ -0,0 +1,160 @@
+import time
+import asyncio
+import threading
+
+import pytest
+
+from services.executor import GenerationExecutor
+from utils.exception import GenerationQueueFullError, GenerationTimeoutError
+
+# /generate-chat answers GenerationQueueFullError with 429 and GenerationTimeoutError with 503
+
+def _executor(**kwargs) -> GenerationExecutor:
+    return GenerationExecutor(**{"max_workers": 1, "max_queue_size": 1, "request_timeout": 5, **kwargs})
+
+def test_thread_pool_rejects_past_capacity():
+    executor = _executor()
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(GenerationQueueFullError):
+            await executor.run(lambda: "rejected")
+        release.set()
+        return await running, await queued
+
+    assert asyncio.run(scenario()) == (True, "queued")
+    stats = executor.stats()
+    assert (stats["admitted"], stats["rejected"], stats["completed"]) == (2, 1, 2)
+    assert stats["queue_depth"] == 0 and stats["running"] == 0
+    executor.shutdown()
+
+def test_thread_pool_times_out_and_frees_the_queue_slot():
+    executor = _executor(request_timeout=0.1)
+    release = threading.Event()
+
+    async def scenario():
+        blocker = asyncio.ensure_future(executor.run(release.wait, timeout=5))
+        await asyncio.sleep(0.05)
+        with pytest.raises(GenerationTimeoutError):
+            await executor.run(lambda: "never runs")
+        release.set()
+        await blocker
+
+    asyncio.run(scenario())
+    stats = executor.stats()
+    assert stats["timed_out"] == 1
+    # The expired request is dropped when a worker reaches it, never run
+    deadline = time.monotonic() + 2
+    while executor.stats()["queue_depth"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert executor.stats()["queue_depth"] == 0
+    assert executor.stats()["completed"] == 1
+    executor.shutdown()
+
+def test_async_path_queues_then_rejects():
+    executor = _executor(max_async_concurrency=1)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def wait():
+            await release.wait()
+            return "done"
+
+        running = asyncio.ensure_future(executor.run_async(wait))
+        queued = asyncio.ensure_future(executor.run_async(wait))
+        await asyncio.sleep(0.05)
+        stats = executor.stats()
+        assert (stats["async_in_flight"], stats["async_queue_depth"]) == (1, 1)
+        with pytest.raises(GenerationQueueFullError):
+            await executor.run_async(wait)
+        release.set()
+        return await running, await queued
+
+    assert asyncio.run(scenario()) == ("done", "done")
+    stats = executor.stats()
+    assert (stats["completed"], stats["rejected"], stats["async_in_flight"], stats["async_queue_depth"]) == (2, 1, 0, 0)
+    # The queued request's wait for a slot is reported
+    assert stats["wait_time"]["max_ms"] >= 40
+
+def test_async_timeout_covers_the_wait_for_a_slot():
+    executor = _executor(max_async_concurrency=1)
+
+    async def scenario():
+        blocker = asyncio.ensure_future(executor.run_async(asyncio.sleep, 0.3))
+        await asyncio.sleep(0.01)
+        with pytest.raises(GenerationTimeoutError):
+            await executor.run_async(asyncio.sleep, 0, timeout=0.1)
+        await blocker
+
+    asyncio.run(scenario())
+    stats = executor.stats()
+    assert (stats["timed_out"], stats["async_in_flight"], stats["async_queue_depth"]) == (1, 0, 0)
+
+def test_stream_times_out_and_releases_its_slot():
+    executor = _executor(max_async_concurrency=1, request_timeout=0.1)
+
+    async def slow_events():
+        yield {"event": "token", "data": "a"}
+        await asyncio.sleep(1)
+        yield {"event": "token", "data": "b"}
+
+    async def scenario():
+        events = []
+        with pytest.raises(GenerationTimeoutError):
+            async for event in executor.stream_async(slow_events):
+                events.append(event)
+        return events
+
+    assert asyncio.run(scenario()) == [{"event": "token", "data": "a"}]
+    stats = executor.stats()
+    assert (stats["timed_out"], stats["async_in_flight"]) == (1, 0)
+
+def test_closed_stream_releases_its_slot():
+    executor = _executor(max_async_concurrency=1)
+
+    async def events():
+        for i in range(10):
+            yield i
+
+    async def scenario():
+        stream = executor.stream_async(events)
+        assert await stream.__anext__() == 0
+        await stream.aclose()
+
+    asyncio.run(scenario())
+    assert executor.stats()["async_in_flight"] == 0
+
+def test_unstarted_stream_holds_no_slot():
+    executor = _executor(max_async_concurrency=1, max_queue_size=0)
+
+    async def events():
+        yield 0
+
+    async def scenario():
+        # Created and closed without ever being iterated, like a client that disconnects early
+        stream = executor.stream_async(events)
+        await stream.aclose()
+        stats = executor.stats()
+        assert (stats["async_queue_depth"], stats["async_in_flight"]) == (0, 0)
+        assert [event async for event in executor.stream_async(events)] == [0]
+
+    asyncio.run(scenario())
+
+def test_full_executor_rejects_streams_before_they_start():
+    executor = _executor(max_async_concurrency=1, max_queue_size=0)
+
+    async def scenario():
+        release = asyncio.Event()
+        running = asyncio.ensure_future(executor.run_async(release.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(GenerationQueueFullError):
+            executor.stream_async(release.wait)
+        release.set()
+        await running
+
+    asyncio.run(scenario())
+    assert executor.stats()["rejected"] == 1
@@ -0,0 +1,33 @@
+import numpy as np
+
+from utils.geo import haversine_m, rank_places
+
+def _place(name: str, lat: float, lng: float, rating: float = None) -> dict:
+    return {"name": name, "location": {"lat": lat, "lng": lng}, "rating": rating}
+
+def test_haversine_known_distance():
+    # One degree of latitude is ~111.2 km everywhere
+    np.testing.assert_allclose(haversine_m(0.0, 0.0, np.array([1.0]), np.array([0.0])), [111195], rtol=1e-3)
+    assert haversine_m(12.9, 77.6, np.array([12.9]), np.array([77.6]))[0] == 0
+
+def test_rank_places_adds_distance_and_limits():
+    places = [_place("far", 12.99, 77.6), _place("near", 12.901, 77.6), _place("mid", 12.93, 77.6)]
+    ranked = rank_places(places, 12.9, 77.6, 10000, limit=2)
+    assert [p["name"] for p in ranked] == ["near", "mid"]
+    assert ranked[0]["distance_m"] == round(haversine_m(12.9, 77.6, np.array([12.901]), np.array([77.6]))[0])
+    # Input dicts are not modified
+    assert "distance_m" not in places[1]
+
+def test_rating_can_outweigh_a_small_distance():
+    places = [_place("close, poor", 12.901, 77.6, 1.0), _place("a bit further, great", 12.905, 77.6, 5.0)]
+    ranked = rank_places(places, 12.9, 77.6, 5000, limit=2, distance_weight=0.5, rating_weight=0.5)
+    assert ranked[0]["name"] == "a bit further, great"
+
+def test_unrated_places_score_at_the_midpoint():
+    places = [_place("unrated", 12.91, 77.6), _place("rated 2.5", 12.91, 77.6, 2.5), _place("rated 3", 12.91, 77.6, 3.0)]
+    ranked = rank_places(places, 12.9, 77.6, 5000, limit=3)
+    assert ranked[0]["name"] == "rated 3"
+    assert {p["name"] for p in ranked[1:]} == {"unrated", "rated 2.5"}
+
+def test_rank_places_empty():
+    assert rank_places([], 0, 0, 1000, limit=5) == []
@@ -0,0 +1,42 @@
+import time
+import threading
+
+from services.lazy import LazyService
+
+def test_background_load_runs_once_for_concurrent_callers():
+    builds = []
+    started = threading.Event()
+
+    def build():
+        builds.append(1)
+        started.set()
+        time.sleep(0.1)
+        return "instance"
+
+    service = LazyService("test", build)
+    for _ in range(20):
+        service.load_in_background()
+    started.wait(1)
+    assert service.status()["state"] == "loading"
+    deadline = time.monotonic() + 2
+    while not service.ready and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert service.get() == "instance"
+    assert len(builds) == 1
+
+def test_failed_background_load_can_be_retried():
+    attempts = []
+
+    def build():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("weights missing")
+        return "instance"
+
+    service = LazyService("test", build)
+    service.load_in_background()
+    service._warmer.join(1)
+    assert service.status()["state"] == "failed"
+    service.load_in_background()
+    service._warmer.join(1)
+    assert service.ready and len(attempts) == 2
@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from services.maps_client import TokenBucket, RateLimitExceeded, encode_geohash, geohash_precision, parse_lat_lng
+
+def test_geohash_reference_values():
+    # Reference cells from the original geohash.org examples
+    assert encode_geohash(42.605, -5.603, 5) == "ezs42"
+    assert encode_geohash(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+def test_nearby_users_share_a_geohash_cell():
+    precision = geohash_precision(5000)
+    assert encode_geohash(12.9716, 77.5946, precision) == encode_geohash(12.9720, 77.5950, precision)
+    assert encode_geohash(12.9716, 77.5946, precision) != encode_geohash(13.0827, 80.2707, precision)
+
+def test_geohash_precision_scales_with_radius():
+    assert geohash_precision(200000) == 4
+    assert geohash_precision(5000) == 6
+    assert geohash_precision(1000) == 7
+    # Smaller radii than the finest cell supports fall back to it
+    assert geohash_precision(10) == 8
+
+@pytest.mark.parametrize("location", ["12.9,77.6", " 12.9 , 77.6 ", {"lat": "12.9", "lng": 77.6}, (12.9, 77.6), [12.9, 77.6]])
+def test_parse_lat_lng_forms(location):
+    assert parse_lat_lng(location) == (12.9, 77.6)
+
+@pytest.mark.parametrize("location", ["", "12.9", "12.9,77.6,1", "north,east", "91,0", "0,181", "nan,0", {"lat": 1}])
+def test_parse_lat_lng_rejects(location):
+    with pytest.raises((ValueError, KeyError)):
+        parse_lat_lng(location)
+
+def test_token_bucket_allows_the_burst_then_rejects():
+    bucket = TokenBucket(rate=1, burst=3)
+    for _ in range(3):
+        bucket.acquire(max_wait=0)
+    with pytest.raises(RateLimitExceeded):
+        bucket.acquire(max_wait=0)
+
+def test_token_bucket_waits_for_a_refill():
+    bucket = TokenBucket(rate=50, burst=1)
+    bucket.acquire(max_wait=0)
+    started = time.monotonic()
+    bucket.acquire(max_wait=1)
+    # One token at 50/s takes ~20ms
+    assert 0.005 < time.monotonic() - started < 0.5
+
+def test_token_bucket_never_exceeds_capacity():
+    bucket = TokenBucket(rate=1000, burst=2)
+    time.sleep(0.05)
+    bucket.acquire(max_wait=0)
+    assert bucket.tokens <= 1
@@ -0,0 +1,45 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+pytest.importorskip("pytesseract")
+
+import utils.ocr as ocr
+from utils.exception import SmartSaarthiException
+
+def _png(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (width, height), 255).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+@pytest.fixture
+def engine(monkeypatch):
+    # Threads instead of the process pool, so the patched recognizer is the one that runs
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(ocr, "get_process_pool", lambda name, workers: pool)
+    yield ocr.OcrEngine(workers=2, tile_threshold_pixels=10_000, tile_height=50, tile_overlap=10)
+    pool.shutdown()
+
+@pytest.mark.parametrize("size", [(50, 50), (100, 300)])
+def test_failing_tile_raises_smartsaarthi_exception(engine, monkeypatch, size):
+    def fail(content, scale, dpi):
+        raise RuntimeError("tesseract crashed")
+    monkeypatch.setattr(ocr, "_ocr_region", fail)
+    with pytest.raises(SmartSaarthiException) as raised:
+        engine.recognize([("scan.png", _png(*size))])
+    assert "tesseract crashed" in raised.value.error_message
+
+def test_tiles_are_recognized_and_merged_in_order(engine, monkeypatch):
+    calls = []
+    def recognize(content, scale, dpi):
+        calls.append(content)
+        return f"line {len(calls)}"
+    monkeypatch.setattr(ocr, "_ocr_region", recognize)
+    content = _png(100, 300)
+    text = engine.recognize([("scan.png", content)])[0]
+    assert len(calls) > 1 and len(text.splitlines()) == len(calls)
+    # Cached by content, the second call never reaches the recognizer
+    assert engine.recognize([("again.png", content)]) == [text]
+    assert len(calls) == len(text.splitlines())
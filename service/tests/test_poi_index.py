@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from services.poi_index import PoiIndex
+from utils.geo import haversine_m
+
+def _random_index(count: int = 2000, seed: int = 0, cell_degrees: float = 0.05) -> PoiIndex:
+    rng = np.random.default_rng(seed)
+    index = PoiIndex(cell_degrees=cell_degrees)
+    # Spread around Bengaluru, across a few dozen cells
+    for i, (lat, lng) in enumerate(zip(rng.uniform(12.7, 13.2, count), rng.uniform(77.3, 77.9, count))):
+        index.add(f"p{i}", lat, lng, category="charging station" if i % 2 else "bank")
+    index.build()
+    return index
+
+def _brute_force(index: PoiIndex, lat: float, lng: float, category: str = None) -> tuple:
+    lats = np.array([r["location"]["lat"] for r in index._records])
+    lngs = np.array([r["location"]["lng"] for r in index._records])
+    dists = haversine_m(lat, lng, lats, lngs)
+    if category is not None:
+        dists = np.where([r["category"] == category for r in index._records], dists, np.inf)
+    return dists
+
+@pytest.mark.parametrize("lat,lng", [(12.97, 77.59), (12.71, 77.31), (13.5, 78.2)])
+def test_nearest_matches_brute_force(lat, lng):
+    index = _random_index()
+    dists = _brute_force(index, lat, lng)
+    expected = np.sort(dists)[:10]
+    found = [d for _, d in index.nearest(lat, lng, k=10)]
+    np.testing.assert_allclose(found, expected)
+
+def test_nearest_by_category_and_radius():
+    index = _random_index()
+    dists = _brute_force(index, 12.97, 77.59, category="bank")
+    expected = np.sort(dists[dists <= 3000])
+    found = index.within(12.97, 77.59, 3000, category="bank")
+    assert all(record["category"] == "bank" for record, _ in found)
+    np.testing.assert_allclose([d for _, d in found], expected)
+
+def test_unknown_category_and_empty_k():
+    index = _random_index(count=10)
+    assert index.nearest(12.97, 77.59, category="hospital") == []
+    assert index.nearest(12.97, 77.59, k=0) == []
+
+def test_match_categories_on_whole_words_and_aliases():
+    index = PoiIndex(aliases={"ev charger": "charging station"})
+    for category in ("charging station", "bus station", "gas"):
+        index.add(category, 12.97, 77.59, category=category)
+    index.build()
+    assert index.match_categories("battery charging stations near me") == ["charging station"]
+    assert index.match_categories("EV chargers") == ["charging station"]
+    assert index.match_categories("station") == []
+    assert index.match_categories("gasoline pump") == []
+    assert index.match_categories("") == []
+
+def test_load_csv_skips_bad_rows(tmp_path):
+    path = tmp_path / "poi.csv"
+    path.write_text("name,lat,lng,category,rating\nA,12.9,77.5,Charging_Station,4.5\nB,oops,77.5,bank,\n")
+    index = PoiIndex()
+    assert index.load_csv(str(path)) == 1
+    index.build()
+    record, _ = index.nearest(12.9, 77.5, k=1)[0]
+    assert record["category"] == "charging station" and record["rating"] == 4.5
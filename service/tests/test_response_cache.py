@@ -0,0 +1,77 @@
+from services.response_cache import ResponseCache
+
+class _Embeddings:
+    """Maps known phrasings to fixed directions so similarity is predictable."""
+    def __init__(self, vectors: dict):
+        self.vectors = vectors
+        self.calls = 0
+
+    def embed_query(self, text: str) -> list:
+        self.calls += 1
+        return self.vectors.get(text, [0.0, 0.0, 1.0])
+
+def _cache(**kwargs) -> tuple:
+    embeddings = _Embeddings({
+        "How do I charge my EV?": [1.0, 0.0, 0.0],
+        "How can I charge my EV?": [0.99, 0.1, 0.0],
+        "Where is the nearest bank?": [0.0, 1.0, 0.0]
+    })
+    return ResponseCache(embeddings, **kwargs), embeddings
+
+def test_exact_hit_ignores_case_punctuation_and_spacing():
+    cache, embeddings = _cache()
+    fingerprint = ResponseCache.fingerprint("model", "prompt", [])
+    cache.put("How do I charge my EV?", fingerprint, {"content": "Plug it in."})
+    calls = embeddings.calls
+    assert cache.get("  how do i charge my ev ", fingerprint) == {"content": "Plug it in."}
+    # Exact hits never embed the prompt
+    assert embeddings.calls == calls
+    assert cache.stats()["exact_hits"] == 1
+
+def test_semantic_hit_above_threshold_only():
+    cache, _ = _cache(semantic_threshold=0.9)
+    fingerprint = ResponseCache.fingerprint("model")
+    cache.put("How do I charge my EV?", fingerprint, {"content": "Plug it in."})
+    assert cache.get("How can I charge my EV?", fingerprint) == {"content": "Plug it in."}
+    assert cache.get("Where is the nearest bank?", fingerprint) is None
+    stats = cache.stats()
+    assert (stats["semantic_hits"], stats["misses"]) == (1, 1)
+
+def test_entries_are_scoped_by_fingerprint():
+    cache, _ = _cache()
+    cache.put("How do I charge my EV?", ResponseCache.fingerprint("kb-v1"), {"content": "old"})
+    assert cache.get("How do I charge my EV?", ResponseCache.fingerprint("kb-v2")) is None
+
+def test_fingerprint_is_order_insensitive_for_dict_keys():
+    assert ResponseCache.fingerprint({"a": 1, "b": 2}) == ResponseCache.fingerprint({"b": 2, "a": 1})
+    assert ResponseCache.fingerprint("a", "b") != ResponseCache.fingerprint("ab")
+
+def test_expired_entries_are_dropped(monkeypatch):
+    cache, _ = _cache(ttl_seconds=10)
+    fingerprint = ResponseCache.fingerprint("model")
+    now = [1000.0]
+    monkeypatch.setattr("services.response_cache.time.monotonic", lambda: now[0])
+    cache.put("How do I charge my EV?", fingerprint, {"content": "Plug it in."})
+    now[0] += 11
+    assert cache.get("How do I charge my EV?", fingerprint) is None
+    assert cache.stats()["entries"] == 0
+
+def test_lru_bound_and_returned_copies():
+    cache, _ = _cache(max_entries=2)
+    fingerprint = ResponseCache.fingerprint("model")
+    cache.put("How do I charge my EV?", fingerprint, {"content": "a"})
+    cache.put("Where is the nearest bank?", fingerprint, {"content": "b"})
+    cache.put("something else", fingerprint, {"content": "c"})
+    assert cache.stats()["entries"] == 2
+    assert cache.get("How do I charge my EV?", fingerprint) is None
+
+    response = cache.get("something else", fingerprint)
+    response["content"] = "mutated"
+    assert cache.get("something else", fingerprint) == {"content": "c"}
+
+def test_disabled_cache_stores_nothing():
+    cache, embeddings = _cache(enabled=False)
+    fingerprint = ResponseCache.fingerprint("model")
+    cache.put("How do I charge my EV?", fingerprint, {"content": "a"})
+    assert cache.get("How do I charge my EV?", fingerprint) is None
+    assert embeddings.calls == 0
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from services.vector_index import FLAT, HNSW, IVF_FLAT, index_backend, ensure_backend, remove_vectors, target_backend
+
+DIM = 16
+
+def _config(**overrides) -> dict:
+    config = {
+        "BACKEND": "auto",
+        "AUTO_BACKEND": HNSW,
+        "MIGRATION_THRESHOLD": 200,
+        "HNSW_M": 16,
+        "HNSW_EF_CONSTRUCTION": 100,
+        "HNSW_EF_SEARCH": 64,
+        "IVF_NLIST": None,
+        "IVF_NPROBE": 16,
+        "PQ_M": 4,
+        "PQ_NBITS": 8,
+        "TRAINING_SAMPLE_SIZE": 10000
+    }
+    config.update(overrides)
+    return config
+
+def _store(count: int, seed: int = 0) -> tuple:
+    vectors = np.random.default_rng(seed).standard_normal((count, DIM)).astype(np.float32)
+    ids = [f"doc-{i}" for i in range(count)]
+    store = FAISS.from_embeddings(
+        [(f"text {i}", list(v)) for i, v in enumerate(vectors)],
+        DeterministicFakeEmbedding(size=DIM),
+        metadatas=[{"i": i} for i in range(count)],
+        ids=ids
+    )
+    return store, vectors
+
+def _top_id(store, vector) -> str:
+    doc, _ = store.similarity_search_with_score_by_vector(list(vector), k=1)[0]
+    return doc.page_content
+
+def test_target_backend_stays_flat_below_threshold():
+    config = _config()
+    assert target_backend(199, config) == FLAT
+    assert target_backend(200, config) == HNSW
+    # Too few points to train any IVF centroids
+    assert target_backend(10, _config(BACKEND=IVF_FLAT)) == FLAT
+
+def test_no_migration_below_threshold():
+    store, _ = _store(50)
+    assert ensure_backend(store, _config()) is None
+    assert index_backend(store.index) == FLAT
+
+@pytest.mark.parametrize("backend", [HNSW, IVF_FLAT])
+def test_migration_preserves_positions(backend):
+    store, vectors = _store(400)
+    report = ensure_backend(store, _config(AUTO_BACKEND=backend))
+    assert report["backend"] == backend
+    assert index_backend(store.index) == backend
+    assert store.index.ntotal == 400
+    assert report["recall_at_k"] > 0.8
+    # index_to_docstore_id still points each position at its own document
+    for i in (0, 123, 399):
+        assert _top_id(store, vectors[i]) == f"text {i}"
+
+@pytest.mark.parametrize("backend", [FLAT, HNSW, IVF_FLAT])
+def test_remove_vectors_keeps_mapping_consistent(backend):
+    store, vectors = _store(400)
+    config = _config(AUTO_BACKEND=backend)
+    ensure_backend(store, config)
+    doomed = [f"doc-{i}" for i in range(0, 400, 3)]
+    remove_vectors(store, doomed, config)
+
+    remaining = 400 - len(doomed)
+    assert store.index.ntotal == remaining
+    assert len(store.index_to_docstore_id) == remaining
+    assert not set(doomed) & set(store.index_to_docstore_id.values())
+    for i in (1, 200, 398):
+        assert _top_id(store, vectors[i]) == f"text {i}"
+
+def test_remove_everything_leaves_an_empty_flat_index():
+    store, _ = _store(300)
+    config = _config()
+    ensure_backend(store, config)
+    remove_vectors(store, [f"doc-{i}" for i in range(300)], config)
+    assert store.index.ntotal == 0
+    assert index_backend(store.index) == FLAT
+    assert store.index_to_docstore_id == {}
@@ -0,0 +1,68 @@
+import json
+import functools
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tools import StructuredTool
+
+PLACE_ARTIFACT = "place"
+
+def place_artifact(result) -> dict:
+    """Typed payload of a successful maps lookup for the client, or None."""
+    if not isinstance(result, dict) or result.get("status") != "found":
+        return None
+    artifact = {
+        "type": PLACE_ARTIFACT,
+        "location": result.get("location"),
+        "name": result.get("name"),
+        "address": result.get("address")
+    }
+    if result.get("places"):
+        artifact["places"] = result["places"]
+        artifact["next_page_token"] = result.get("next_page_token")
+    return artifact
+
+def _to_content(result) -> str:
+    # What the model reads; the artifact travels next to it untouched
+    return result if isinstance(result, str) else json.dumps(result, default=str)
+
+def artifact_tool(tool, coroutine, artifact_fn=place_artifact) -> StructuredTool:
+    """
+    Wraps an @tool's function (and its async variant) so the agent gets the result as text while
+    the structured payload rides along on the ToolMessage's `artifact`.
+    """
+    @functools.wraps(tool.func)
+    def func(*args, **kwargs):
+        result = tool.func(*args, **kwargs)
+        return _to_content(result), artifact_fn(result)
+
+    @functools.wraps(coroutine)
+    async def afunc(*args, **kwargs):
+        result = await coroutine(*args, **kwargs)
+        return _to_content(result), artifact_fn(result)
+
+    return StructuredTool.from_function(
+        func=func,
+        coroutine=afunc,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        response_format="content_and_artifact"
+    )
+
+class ToolArtifactCollector(BaseCallbackHandler):
+    """Collects tool artifacts of one agent run as the tools finish, in order."""
+    run_inline = True
+
+    def __init__(self):
+        self.artifacts = []
+
+    def on_tool_end(self, output, **kwargs):
+        artifact = getattr(output, "artifact", None)
+        if artifact:
+            self.artifacts.append(artifact)
+
+    def latest(self, artifact_type: str) -> dict:
+        for artifact in reversed(self.artifacts):
+            if artifact.get("type") == artifact_type:
+                return artifact
+        return None
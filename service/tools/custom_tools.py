@@ -1,29 +1,166 @@
 import sys
 import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 
-from langchain_community.document_loaders import WebBaseLoader
+import requests
+from bs4 import BeautifulSoup
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain.tools.retriever import create_retriever_tool
 from dotenv import load_dotenv
 
-from config.custom_tools import SCRAPE_WEBSITE_TOOL
+from config.custom_tools import SCRAPE_WEBSITE_TOOL, SCRAPE_WEBSITE_CACHE
+from services.embedding_backends import get_shared_embeddings
 from utils.logger import logger
 from utils.exception import SmartSaarthiException
 
 load_dotenv()
 os.environ["HF_TOKEN"] = os.getenv("HUGGINGFACE_ACCESS_TOKEN")
 
+class _UrlIndex:
+    def __init__(self, vector_store, etag: str, last_modified: str, chunks: int):
+        self.vector_store = vector_store
+        self.etag = etag
+        self.last_modified = last_modified
+        self.chunks = chunks
+        self.fetched_at = time.monotonic()
+
+class UrlIndexCache:
+    """
+    Per-URL FAISS indexes built with the shared embedder. Entries are served as-is within the TTL,
+    revalidated with ETag / Last-Modified after it, and evicted LRU beyond max_urls. Concurrent
+    requests for a URL that needs fetching wait on the first one's fetch.
+    """
+    def __init__(self, ttl_seconds: float, max_urls: int, chunk_size: int, chunk_overlap: int, embed_batch_size: int, request_timeout: float):
+        self.ttl_seconds = ttl_seconds
+        self.max_urls = max_urls
+        self.embed_batch_size = embed_batch_size
+        self.request_timeout = request_timeout
+        self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._counters = {"fresh_hits": 0, "revalidated": 0, "fetched": 0, "shared_fetches": 0}
+
+    def _build(self, url: str, html: str):
+        text = BeautifulSoup(html, "html.parser").get_text(separator="\n", strip=True)
+        vector_store = None
+        chunks = 0
+        embeddings = get_shared_embeddings()
+        batch = []
+        # Embed in bounded batches so only one batch of vectors is in flight per page
+        for chunk in self.splitter.split_text(text):
+            batch.append(chunk)
+            if len(batch) < self.embed_batch_size:
+                continue
+            vector_store = self._add_batch(vector_store, url, batch, embeddings)
+            chunks += len(batch)
+            batch = []
+        if batch:
+            vector_store = self._add_batch(vector_store, url, batch, embeddings)
+            chunks += len(batch)
+        return vector_store, chunks
+
+    def _add_batch(self, vector_store, url: str, texts: list, embeddings):
+        text_embeddings = list(zip(texts, embeddings.embed_documents(texts)))
+        metadatas = [{"source": url} for _ in texts]
+        if vector_store is None:
+            return FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas)
+        vector_store.add_embeddings(text_embeddings, metadatas=metadatas)
+        return vector_store
+
+    def _refresh(self, url: str, entry: _UrlIndex):
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        response = self._session.get(url, headers=headers, timeout=self.request_timeout)
+        if response.status_code == 304 and entry is not None:
+            with self._lock:
+                entry.fetched_at = time.monotonic()
+                self._counters["revalidated"] += 1
+            return entry.vector_store
+        response.raise_for_status()
+
+        vector_store, chunks = self._build(url, response.text)
+        if vector_store is None:
+            raise ValueError(f"No text content found at {url}")
+        with self._lock:
+            self._entries[url] = _UrlIndex(
+                vector_store, response.headers.get("ETag"), response.headers.get("Last-Modified"), chunks
+            )
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_urls:
+                self._entries.popitem(last=False)
+            self._counters["fetched"] += 1
+        return vector_store
+
+    def get(self, url: str):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+                if time.monotonic() - entry.fetched_at < self.ttl_seconds:
+                    self._counters["fresh_hits"] += 1
+                    return entry.vector_store
+            # Concurrent misses for one URL share a single fetch and embed
+            pending = self._inflight.get(url)
+            owner = pending is None
+            if owner:
+                pending = self._inflight[url] = Future()
+            else:
+                self._counters["shared_fetches"] += 1
+        if not owner:
+            return pending.result()
+
+        try:
+            vector_store = self._refresh(url, entry)
+            pending.set_result(vector_store)
+            return vector_store
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(url, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "cached_urls": len(self._entries)}
+
+url_index_cache = UrlIndexCache(
+    ttl_seconds=SCRAPE_WEBSITE_CACHE["TTL_SECONDS"],
+    max_urls=SCRAPE_WEBSITE_CACHE["MAX_URLS"],
+    chunk_size=SCRAPE_WEBSITE_CACHE["CHUNK_SIZE"],
+    chunk_overlap=SCRAPE_WEBSITE_CACHE["CHUNK_OVERLAP"],
+    embed_batch_size=SCRAPE_WEBSITE_CACHE["EMBED_BATCH_SIZE"],
+    request_timeout=SCRAPE_WEBSITE_CACHE["REQUEST_TIMEOUT_SECONDS"]
+)
+
 class CustomTools():
-    def get_scrape_website_tool(self, url: str) -> str:
+    def get_scrape_website_tool(self, url: str | list) -> str:
         try:
-            loader = WebBaseLoader(url)
-            documents = loader.load()
-            text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-            chunks = text_splitter.split_documents(documents)
-            embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-            vectorstore = FAISS.from_documents(chunks, embeddings)
+            # A repeated URL would merge the same cached index twice, which merge_from rejects
+            urls = [url] if isinstance(url, str) else list(dict.fromkeys(url))
+            # Pages are fetched and embedded one at a time, so a crawl never holds every page's text
+            stores = [url_index_cache.get(u) for u in urls]
+            vectorstore = stores[0]
+            if len(stores) > 1:
+                # Merge into a fresh index so the cached per-page indexes stay untouched
+                vectorstore = FAISS(
+                    embedding_function=get_shared_embeddings(),
+                    index=type(stores[0].index)(stores[0].index.d),
+                    docstore=type(stores[0].docstore)(),
+                    index_to_docstore_id={}
+                )
+                for store in stores:
+                    vectorstore.merge_from(store)
             retriever = vectorstore.as_retriever()
             tool = create_retriever_tool(
                 retriever,
@@ -33,4 +170,4 @@ class CustomTools():
             return tool
         except Exception as e:
             logger.error(f"{SCRAPE_WEBSITE_TOOL['name']} tool error: {str(e)}")
-            raise SmartSaarthiException(f"{SCRAPE_WEBSITE_TOOL['name']} tool error: {str(e)}", sys)
\ No newline at end of file
+            raise SmartSaarthiException(f"{SCRAPE_WEBSITE_TOOL['name']} tool error: {str(e)}", sys)
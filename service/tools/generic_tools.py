@@ -1,6 +1,7 @@
 from langchain_community.tools import ArxivQueryRun, WikipediaQueryRun, DuckDuckGoSearchResults
 from langchain_community.utilities import ArxivAPIWrapper, WikipediaAPIWrapper, DuckDuckGoSearchAPIWrapper
 from tools.google_maps_tool import GoogleMapsTools
+from tools.local_poi_tool import LocalPoiTools
 # from langchain.agents import create_openai_tools_agent, AgentExecutor
 # from langchain import hub
 
@@ -39,9 +40,12 @@ class GenericTools:
         arxiv_tool = self.get_arxiv_tool(top_k, doc_content_chars_max)
         duckduckgo_tool = self.get_duckduckgo_tool(max_results)
         
+        # Wikipedia/Arxiv/DuckDuckGo have no native async client, their default _arun
+        # offloads to the event loop's default executor (sized by ASYNC_IO_THREADS)
         gmaps_tools = GoogleMapsTools().get_tools()
+        local_poi_tools = LocalPoiTools().get_tools()
 
-        tools = [wikipedia_tool, arxiv_tool, duckduckgo_tool, *gmaps_tools]
+        tools = [wikipedia_tool, arxiv_tool, duckduckgo_tool, *gmaps_tools, *local_poi_tools]
         return tools
     
     # Not using the agent executor for now, using direct tool binding and chain invocation
@@ -1,20 +1,32 @@
-import os
-import googlemaps
+import asyncio
 from langchain.tools import tool
-from dotenv import load_dotenv
 from utils.logger import logger
+from services.maps_client import get_maps_client, parse_lat_lng
+from tools.local_poi_tool import search_local_places
+from tools.artifacts import artifact_tool
+from utils.geo import rank_places
+from config.maps import GOOGLE_MAPS, LOCAL_POI
 
-load_dotenv()
-
-GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
+def _local_fallback(keyword: str, location: str, radius, reason: str):
+    """Answers a nearby search from the local POI index when Google Maps can't, else None."""
+    if not LOCAL_POI["USE_AS_FALLBACK"]:
+        return None
+    try:
+        result = search_local_places(keyword, location, radius)
+    except Exception as e:
+        logger.error(f"Local POI fallback failed: {str(e)}")
+        return None
+    if result is not None and result["status"] == "found":
+        logger.info(f"Answered nearby search for '{keyword}' from local POI data ({reason})")
+        return result
+    return None
 
 class GoogleMapsTools:
     def __init__(self):
         try:
-            if GOOGLE_MAPS_API_KEY:
-                self.gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
-            else:
-                self.gmaps = None
+            # Shared, pooled and cached client; the tools below use the same instance
+            self.gmaps = get_maps_client()
+            if self.gmaps is None:
                 logger.warning("GOOGLE_MAPS_API_KEY not found in environment variables.")
         except Exception as e:
             logger.error(f"Error initializing Google Maps Client: {str(e)}")
@@ -28,17 +40,9 @@ class GoogleMapsTools:
         Returns the name, address, and geometry (lat/lng).
         """
         try:
-            # We need to access the instance 'gmaps' but @tool makes it a static function effectively if not bound carefully.
-            # A better way for class-based tools in LangChain is using `StructuredTool` or binding methods.
-            # However, simpler is to instantiate client inside or use a global if acceptable, or use the class method approach.
-            
-            # Let's use a standalone instance for the tool function to keep it simple with @tool decorator
-            # or we pass the instance.
-            
-            if not GOOGLE_MAPS_API_KEY:
+            gmaps = get_maps_client()
+            if gmaps is None:
                 return "Google Maps API Key not configured."
-                
-            gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
             
             # Text Search
             result = gmaps.places(query=query)
@@ -63,49 +67,86 @@ class GoogleMapsTools:
             return {"status": "error", "message": str(e)}
 
     @tool
-    def find_places_nearby(keyword: str, location: str, radius: int | str = 5000):
+    def find_places_nearby(keyword: str, location: str, radius: int | str = 5000, page_token: str | None = None):
         """
         Search for nearby places using Google Maps Places API.
         Args:
             keyword: The term to search for (e.g., "battery charging station").
             location: The latitude/longitude around which to retrieve place information. This must be specified as 'latitude,longitude'.
             radius: Distance in meters within which to bias results. (Default: 5000)
+            page_token: The next_page_token from a previous call, only when the user asks for more results.
         Returns:
-            A list of nearby places with names and addresses.
+            The best place plus a "places" list of the top matches ranked by distance and rating.
         """
         try:
-            if not GOOGLE_MAPS_API_KEY:
-                return "Google Maps API Key not configured."
-                
-            gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
-            
-            # Parse location string to dict or tuple if needed, but client might accept string "lat,lng"
-            # googlemaps python client expects location as (lat, lng) tuple or dict or string "lat,lng"
+            lat, lng = parse_lat_lng(location)
             radius = int(radius)
-            result = gmaps.places_nearby(location=location, keyword=keyword, radius=radius)
+        except (ValueError, KeyError, IndexError, TypeError):
+            # One clear error the agent can correct, rather than an uncached call that fails in ranking
+            return {"status": "error", "message": f"Invalid location {location!r} or radius {radius!r}, expected location as 'latitude,longitude' and radius in meters."}
+        # Canonical form, so equivalent spellings of a position share the client's cache entries
+        location = f"{lat},{lng}"
+        try:
+            gmaps = get_maps_client()
+            if gmaps is None:
+                return _local_fallback(keyword, location, radius, "maps not configured") or "Google Maps API Key not configured."
+            
+            if page_token:
+                result = gmaps.places_nearby_page(page_token)
+            else:
+                result = gmaps.places_nearby(location=location, keyword=keyword, radius=radius)
             
             if result['status'] == 'OK' and result['results']:
-                # Return top result for simplicity, or list
-                # For the app flow, we usually just want to show one or a list.
-                # Let's return the top match similar to search_place
-                place = result['results'][0]
-                name = place.get('name')
-                address = place.get('vicinity') # Vicinity is used for nearby search results
-                loc = place['geometry']['location']
-                
+                places = [
+                    {
+                        "name": place.get('name'),
+                        "address": place.get('vicinity'), # Vicinity is used for nearby search results
+                        "location": place['geometry']['location'],
+                        "rating": place.get('rating'),
+                        "user_ratings_total": place.get('user_ratings_total'),
+                        "open_now": (place.get('opening_hours') or {}).get('open_now'),
+                        "place_id": place.get('place_id')
+                    }
+                    for place in result['results']
+                ]
+                places = rank_places(
+                    places, lat, lng, radius,
+                    limit=GOOGLE_MAPS["NEARBY_MAX_RESULTS"],
+                    distance_weight=GOOGLE_MAPS["NEARBY_DISTANCE_WEIGHT"],
+                    rating_weight=GOOGLE_MAPS["NEARBY_RATING_WEIGHT"]
+                )
+                best = places[0]
                 return {
-                    "name": name,
-                    "address": address,
-                    "location": loc,
+                    "name": best["name"],
+                    "address": best["address"],
+                    "location": best["location"],
+                    "distance_m": best["distance_m"],
                     "status": "found",
-                    "results_count": len(result['results'])
+                    "results_count": len(result['results']),
+                    "places": places,
+                    # The next page is only fetched if the agent passes this back
+                    "next_page_token": result.get('next_page_token')
                 }
             else:
-                return {"status": "not_found", "message": "No nearby places found."}
+                return _local_fallback(keyword, location, radius, "no maps results") or {"status": "not_found", "message": "No nearby places found."}
                 
         except Exception as e:
             logger.error(f"Google Maps Nearby Search Error: {str(e)}")
-            return {"status": "error", "message": str(e)}
+            return _local_fallback(keyword, location, radius, "maps error") or {"status": "error", "message": str(e)}
+
+    @staticmethod
+    async def asearch_place(query: str):
+        # googlemaps is requests based, run it on the loop's I/O pool instead of blocking it
+        return await asyncio.to_thread(GoogleMapsTools.search_place.func, query)
+
+    @staticmethod
+    async def afind_places_nearby(keyword: str, location: str, radius: int | str = 5000, page_token: str | None = None):
+        return await asyncio.to_thread(GoogleMapsTools.find_places_nearby.func, keyword, location, radius, page_token)
 
     def get_tools(self):
-        return [self.search_place, self.find_places_nearby]
+        # Each sync tool is paired with its coroutine so agent.ainvoke never blocks the event loop,
+        # and found places are returned as artifacts for the response instead of being parsed back out
+        return [
+            artifact_tool(self.search_place, self.asearch_place),
+            artifact_tool(self.find_places_nearby, self.afind_places_nearby)
+        ]
@@ -0,0 +1,75 @@
+from langchain.tools import tool
+from utils.logger import logger
+from services.poi_index import get_poi_index
+from services.maps_client import parse_lat_lng
+from tools.artifacts import artifact_tool
+from utils.geo import rank_places
+from config.maps import GOOGLE_MAPS, LOCAL_POI
+
+def search_local_places(keyword: str, location, radius: int = 5000) -> dict:
+    """
+    Best-ranked places for the keyword from the local POI index, in the same shape as
+    find_places_nearby. Returns None when the index is off or has no category for the keyword.
+    """
+    index = get_poi_index()
+    if index is None:
+        return None
+    categories = index.match_categories(keyword)
+    if not categories:
+        return None
+    lat, lng = parse_lat_lng(location)
+    hits = []
+    for category in categories:
+        hits.extend(index.nearest(lat, lng, k=LOCAL_POI["MAX_RESULTS"], radius_m=int(radius), category=category))
+    if not hits:
+        return {"status": "not_found", "message": "No nearby places found.", "source": "local"}
+    places = rank_places(
+        [{key: place[key] for key in ("name", "address", "location", "rating")} for place, _ in hits],
+        lat, lng, int(radius),
+        limit=LOCAL_POI["MAX_RESULTS"],
+        distance_weight=GOOGLE_MAPS["NEARBY_DISTANCE_WEIGHT"],
+        rating_weight=GOOGLE_MAPS["NEARBY_RATING_WEIGHT"]
+    )
+    best = places[0]
+    return {
+        "name": best["name"],
+        "address": best["address"],
+        "location": best["location"],
+        "status": "found",
+        "results_count": len(hits),
+        "distance_m": best["distance_m"],
+        "places": places,
+        "source": "local"
+    }
+
+class LocalPoiTools:
+    @tool
+    def find_local_places(keyword: str, location: str, radius: int | str = 5000):
+        """
+        Find the nearest place of a known category (e.g. "battery charging station") from the
+        local points-of-interest database. Faster than Google Maps, prefer it for these categories.
+        Args:
+            keyword: The kind of place to look for.
+            location: The user's position as 'latitude,longitude'.
+            radius: Maximum distance in meters. (Default: 5000)
+        Returns:
+            The best matching place plus a "places" list ranked by distance and rating.
+        """
+        try:
+            result = search_local_places(keyword, location, radius)
+            if result is None:
+                return {"status": "not_found", "message": f"No local data for '{keyword}', use find_places_nearby instead."}
+            return result
+        except Exception as e:
+            logger.error(f"Local POI Search Error: {str(e)}")
+            return {"status": "error", "message": str(e)}
+
+    @staticmethod
+    async def afind_local_places(keyword: str, location: str, radius: int | str = 5000):
+        # In-memory lookup, cheaper to run inline than to hand off to a thread
+        return LocalPoiTools.find_local_places.func(keyword, location, radius)
+
+    def get_tools(self):
+        if not LOCAL_POI["REGISTER_TOOL"] or get_poi_index() is None:
+            return []
+        return [artifact_tool(self.find_local_places, self.afind_local_places)]
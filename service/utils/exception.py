@@ -8,4 +8,11 @@ class SmartSaarthiException(Exception):
         self.file_name = exc_tb.tb_frame.f_code.co_filename
     
     def __str__(self):
-        return "Error occured in python script name [{0}] line number [{1}] with error message [{2}]".format(self.file_name, self.line_number, self.error_message)
\ No newline at end of file
+        return "Error occured in python script name [{0}] line number [{1}] with error message [{2}]".format(self.file_name, self.line_number, self.error_message)
+
+class GenerationQueueFullError(Exception):
+    """Raised when the generation executor has no free worker or queue slot."""
+
+
+class GenerationTimeoutError(Exception):
+    """Raised when a generation request misses its deadline."""
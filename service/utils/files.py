@@ -1,21 +1,17 @@
 import io
+import os
 import base64
-from typing import List, Dict
+import tempfile
+from collections import deque
+from typing import List, Dict, Iterator
 from pypdf import PdfReader
 from langchain_core.documents import Document
 
-from config.files import ALLOWED_FILE_TYPES
-from config.models import IMAGE_CAPTIONING_MODEL
+from config.files import ALLOWED_FILE_TYPES, PDF_PROCESSING
 
-# from services.image_captioning import ImageCaptioningService
+IMAGE_FILE_TYPES = {"png", "jpg", "jpeg"}
 
-# image_captioning = ImageCaptioningService(
-#     model_name=IMAGE_CAPTIONING_MODEL["MODEL_NAME"],
-#     task=IMAGE_CAPTIONING_MODEL["TASK"],
-#     processor_name=IMAGE_CAPTIONING_MODEL["PROCESSOR"]
-# )
-
-def _normalize_file_input(file_obj):
+def normalize_file_input(file_obj):
     """
     Accepts:
       - {"filename": str, "content": bytes|str (raw or base64)}
@@ -32,13 +28,79 @@ def _normalize_file_input(file_obj):
         return filename, content
     return None, None
 
-def process_pdf(filename: str, data: bytes) -> str:
+def _extract_pages(reader: PdfReader, start: int, end: int) -> List[str]:
+    texts = []
+    for i in range(start, end):
+        try:
+            texts.append(reader.pages[i].extract_text() or "")
+        except Exception:
+            # One broken page shouldn't drop the rest of the document
+            texts.append("")
+    return texts
+
+def _extract_page_range(path: str, start: int, end: int) -> List[str]:
+    # Runs in a worker process, the PDF is shared through a temp file instead of pickled per task
+    return _extract_pages(PdfReader(path), start, end)
+
+def _page_document(filename: str, page: int, pages: int, text: str) -> Document:
+    text = text.strip()
+    if not text:
+        return None
+    content = f"Name of the file: {filename} (page {page} of {pages})\n{text}"
+    return Document(
+        page_content=content,
+        metadata={
+            "source": filename,
+            "extension": "pdf",
+            "page": page,
+            "pages": pages,
+            "length": len(content)
+        }
+    )
+
+def iter_pdf_pages(filename: str, data: bytes) -> Iterator[Document]:
+    """
+    Yields one Document per non-empty page, in page order.
+    Small PDFs are read in-process; larger ones are split into page ranges extracted in the
+    shared process pool, with at most MAX_IN_FLIGHT_TASKS ranges outstanding so memory stays
+    bounded and the first pages are available before the last ones are parsed.
+    """
     try:
         reader = PdfReader(io.BytesIO(data))
-        pages = [page.extract_text() or "" for page in reader.pages]
-        return f"Name of the file: {filename}\n" + "\n".join(pages).strip()
+        page_count = len(reader.pages)
     except Exception:
-        return ""
+        return
+    pages_per_task = PDF_PROCESSING["PAGES_PER_TASK"]
+    if page_count <= pages_per_task:
+        for i, text in enumerate(_extract_pages(reader, 0, page_count)):
+            doc = _page_document(filename, i + 1, page_count, text)
+            if doc is not None:
+                yield doc
+        return
+    del reader
+
+    from utils.pools import get_process_pool
+
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    pending = deque()
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        pool = get_process_pool("pdf", PDF_PROCESSING["WORKERS"])
+        ranges = deque((start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task))
+        while ranges or pending:
+            while ranges and len(pending) < PDF_PROCESSING["MAX_IN_FLIGHT_TASKS"]:
+                start, end = ranges.popleft()
+                pending.append((start, pool.submit(_extract_page_range, path, start, end)))
+            start, future = pending.popleft()
+            for offset, text in enumerate(future.result()):
+                doc = _page_document(filename, start + offset + 1, page_count, text)
+                if doc is not None:
+                    yield doc
+    finally:
+        for _, future in pending:
+            future.cancel()
+        os.remove(path)
 
 def process_txt(filename: str, data: bytes) -> str:
     try:
@@ -50,41 +112,47 @@ def process_txt(filename: str, data: bytes) -> str:
 def process_md(filename: str, data: bytes) -> str:
     return process_txt(filename, data)
 
-# def process_image(filename: str, data: bytes) -> str:
-#     try:
-#         caption = image_captioning.generate_caption(data)
-#         return f"Based on the given data generate a description of the image, it should be descriptive, the given data is just for reference: Name of the file: {filename}\nImage Caption: {caption}"
-#     except Exception:
-#         return ""
+def process_image(filename: str, data: bytes) -> str:
+    """
+    Only undecodable images yield "" (and get cached as empty); model load failures, OCR
+    timeouts and other transient errors propagate so the upload is retried next time.
+    """
+    # Imported lazily so parsing text files never pulls in the vision stack
+    from PIL import Image, UnidentifiedImageError
+    from services.image_understanding import get_image_understanding
 
-def process_files(files: List[Dict]) -> List[Document]:
-    docs: List[Document] = []
+    try:
+        description = get_image_understanding().describe([(filename, data)])[0]
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        return ""
+    return f"Name of the file: {filename}\n{description}"
+
+def iter_documents(files: List[Dict]) -> Iterator[Document]:
+    """Streams Documents for the given uploads, PDFs page by page."""
     for f in files:
-        filename, content = _normalize_file_input(f)
+        filename, content = normalize_file_input(f)
         if not filename or content is None:
             continue
         ext = filename.rsplit(".", 1)[-1].lower()
         if ext not in ALLOWED_FILE_TYPES:
             continue
-        text = ""
         if ext == "pdf":
-            text = process_pdf(filename, content)
-        elif ext == "txt":
+            yield from iter_pdf_pages(filename, content)
+            continue
+        text = ""
+        if ext == "txt":
             text = process_txt(filename, content)
         elif ext == "md":
             text = process_md(filename, content)
-        # elif ext == "png" or ext == "jpg" or ext == "jpeg":
-        #     text = process_image(filename, content)
+        elif ext in IMAGE_FILE_TYPES:
+            text = process_image(filename, content)
         if not text.strip():
             continue
-        docs.append(
-            Document(
-                page_content=text,
-                metadata={
-                    "source": filename,
-                    "extension": ext,
-                    "length": len(text)
-                }
-            )
+        yield Document(
+            page_content=text,
+            metadata={
+                "source": filename,
+                "extension": ext,
+                "length": len(text)
+            }
         )
-    return docs
\ No newline at end of file
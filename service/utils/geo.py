@@ -0,0 +1,29 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+def haversine_m(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Distances in meters from one point to arrays of points, all in degrees."""
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def rank_places(places: list, lat: float, lng: float, radius_m: float, limit: int, distance_weight: float = 0.7, rating_weight: float = 0.3) -> list:
+    """
+    Adds distance_m to each place ({"location": {"lat", "lng"}, "rating", ...}) and returns the
+    best `limit` by a blend of closeness within the radius and rating; unrated places score as
+    if rated at the midpoint so they neither win nor lose on rating alone.
+    """
+    if not places:
+        return []
+    lats = np.array([p["location"]["lat"] for p in places], dtype=np.float64)
+    lngs = np.array([p["location"]["lng"] for p in places], dtype=np.float64)
+    distances = haversine_m(lat, lng, lats, lngs)
+    ratings = np.array([p.get("rating") if p.get("rating") is not None else 2.5 for p in places], dtype=np.float64)
+    closeness = 1 - np.clip(distances / max(radius_m, 1), 0, 1)
+    scores = distance_weight * closeness + rating_weight * ratings / 5
+    order = np.lexsort((distances, -scores))[:limit]
+    return [{**places[i], "distance_m": int(round(distances[i]))} for i in order]
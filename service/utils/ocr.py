@@ -1,33 +1,190 @@
 import sys
 import io
-from PIL import Image
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import wait, FIRST_EXCEPTION
+from PIL import Image, ImageOps
 from typing import List, Dict
 
 import pytesseract
 
+from config.files import OCR
+from utils.pools import get_process_pool
 from utils.exception import SmartSaarthiException
 
+SUPPORTED_EXTENSIONS = {"png", "jpg", "jpeg", "webp", "bmp", "tiff", "tif"}
+
+# EXIF orientations that rotate the image by 90 degrees, swapping width and height
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+def _normalize(content: bytes, scale: float) -> Image.Image:
+    img = Image.open(io.BytesIO(content))
+    img = ImageOps.exif_transpose(img).convert("L")
+    if scale < 1.0:
+        img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS)
+    return img
+
+def _ocr_region(content: bytes, scale: float, dpi: int) -> str:
+    # Runs in a worker process: decode, normalize and downscale one image (or an already scaled tile), then recognize it
+    return pytesseract.image_to_string(_normalize(content, scale), config=f"--dpi {dpi}")
+
+def _merge_tiles(texts: List[str]) -> str:
+    # Tiles overlap vertically, drop a leading line that just repeats the previous tile's last line
+    lines = []
+    for text in texts:
+        tile_lines = [line for line in text.splitlines() if line.strip()]
+        if lines and tile_lines and tile_lines[0].strip() == lines[-1].strip():
+            tile_lines = tile_lines[1:]
+        lines.extend(tile_lines)
+    return "\n".join(lines)
+
+class OcrEngine:
+    """
+    Tesseract OCR spread over a process pool. Images are downscaled to the target DPI (or a max
+    dimension when they carry no DPI), very large scans are decoded once and cut into
+    overlapping horizontal tiles recognized in parallel, and results are cached by the image's
+    content hash.
+    """
+    def __init__(self, workers: int = None, target_dpi: int = 300, max_dimension: int = 2500, tile_threshold_pixels: int = 12_000_000, tile_height: int = 2000, tile_overlap: int = 100, cache_size: int = 1024):
+        self.workers = workers
+        self.target_dpi = target_dpi
+        self.max_dimension = max_dimension
+        self.tile_threshold_pixels = tile_threshold_pixels
+        self.tile_height = tile_height
+        self.tile_overlap = tile_overlap
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"cache_hits": 0, "cache_misses": 0, "tiled_images": 0}
+
+    def _plan(self, content: bytes) -> tuple:
+        """Returns (scale, dpi, boxes) from the image header, without decoding the pixels."""
+        img = Image.open(io.BytesIO(content))
+        width, height = img.size
+        if img.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS:
+            width, height = height, width
+        source_dpi = img.info.get("dpi", (0, 0))[0]
+        if source_dpi and source_dpi > self.target_dpi:
+            scale = self.target_dpi / source_dpi
+        else:
+            scale = min(1.0, self.max_dimension / max(width, height))
+        # The resolution Tesseract actually sees; images without a DPI tag are assumed to be at the target
+        dpi = max(70, round((source_dpi or self.target_dpi) * scale))
+        width, height = max(1, round(width * scale)), max(1, round(height * scale))
+        if width * height <= self.tile_threshold_pixels:
+            return scale, dpi, [None]
+        step = self.tile_height - self.tile_overlap
+        boxes = [(0, top, width, min(top + self.tile_height, height)) for top in range(0, max(1, height - self.tile_overlap), step)]
+        return scale, dpi, boxes
+
+    @staticmethod
+    def _encode_tiles(content: bytes, scale: float, boxes: list) -> list:
+        """Decodes and scales the image once and returns each tile as PNG bytes for the workers."""
+        img = _normalize(content, scale)
+        tiles = []
+        for box in boxes:
+            buffer = io.BytesIO()
+            img.crop(box).save(buffer, format="PNG", compress_level=1)
+            tiles.append(buffer.getvalue())
+        return tiles
+
+    def _cache_get(self, key: str) -> str:
+        with self._lock:
+            text = self._cache.get(key)
+            if text is None:
+                self._counters["cache_misses"] += 1
+                return None
+            self._cache.move_to_end(key)
+            self._counters["cache_hits"] += 1
+            return text
+
+    def _cache_put(self, key: str, text: str):
+        with self._lock:
+            self._cache[key] = text
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    @staticmethod
+    def _cancel(jobs: dict):
+        for _, futures in jobs.values():
+            for f in futures:
+                f.cancel()
+
+    def recognize(self, images: List[tuple]) -> List[str]:
+        """OCRs (name, bytes) pairs in parallel, returning texts in the same order."""
+        pool = get_process_pool("ocr", self.workers)
+        keys = [hashlib.sha256(content).hexdigest() for _, content in images]
+        texts = [self._cache_get(key) for key in keys]
+        jobs = {}
+        for i, (name, content) in enumerate(images):
+            if texts[i] is not None:
+                continue
+            if keys[i] in jobs:
+                # Same image uploaded twice in one batch, recognize it once
+                continue
+            try:
+                scale, dpi, boxes = self._plan(content)
+                if len(boxes) > 1:
+                    with self._lock:
+                        self._counters["tiled_images"] += 1
+                    futures = [pool.submit(_ocr_region, tile, 1.0, dpi) for tile in self._encode_tiles(content, scale, boxes)]
+                else:
+                    futures = [pool.submit(_ocr_region, content, scale, dpi)]
+            except Exception as e:
+                self._cancel(jobs)
+                raise SmartSaarthiException(f"Failed to process file {name}: {str(e)}", sys)
+            jobs[keys[i]] = (name, futures)
+
+        fresh = {}
+        for key, (name, futures) in jobs.items():
+            # Return on the first failed tile instead of waiting for the ones before it
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            failed = next((f for f in done if f.exception() is not None), None)
+            if failed is not None:
+                self._cancel(jobs)
+                try:
+                    failed.result()
+                except Exception as e:
+                    raise SmartSaarthiException(f"Failed to process file {name}: {str(e)}", sys)
+            text = _merge_tiles([f.result() for f in futures]) if len(futures) > 1 else futures[0].result()
+            self._cache_put(key, text)
+            fresh[key] = text
+        return [text if text is not None else fresh[key] for key, text in zip(keys, texts)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counters, "cached_images": len(self._cache)}
+
+ocr_engine = OcrEngine(
+    workers=OCR["WORKERS"],
+    target_dpi=OCR["TARGET_DPI"],
+    max_dimension=OCR["MAX_DIMENSION"],
+    tile_threshold_pixels=OCR["TILE_THRESHOLD_PIXELS"],
+    tile_height=OCR["TILE_HEIGHT"],
+    tile_overlap=OCR["TILE_OVERLAP"],
+    cache_size=OCR["CACHE_SIZE"]
+)
+
 def get_text(files: List[Dict]) -> str:
     if not files:
         return "No files provided for OCR."
-    supported_ext = {"png", "jpg", "jpeg", "webp", "bmp", "tiff", "tif"}
-    results = []
+    images = []
     for f in files:
         name = f.get("filename") or "unnamed"
         ext = name.split(".")[-1].lower()
-        if ext not in supported_ext:
+        if ext not in SUPPORTED_EXTENSIONS:
             continue
         content = f.get("content")
         if not isinstance(content, (bytes, bytearray)):
             continue
-        try:
-            img = Image.open(io.BytesIO(content))
-            text = pytesseract.image_to_string(img)
-            cleaned = text.strip()
-            if cleaned:
-                results.append(f"File: {name}\n{cleaned}")
-        except Exception as e:
-            raise SmartSaarthiException(f"Failed to process file {name}: {str(e)}", sys)
+        images.append((name, bytes(content)))
+    results = []
+    for (name, _), text in zip(images, ocr_engine.recognize(images) if images else []):
+        cleaned = text.strip()
+        if cleaned:
+            results.append(f"File: {name}\n{cleaned}")
     if not results:
         return "No extractable text found in provided images."
-    return "\n\n".join(results)
\ No newline at end of file
+    return "\n\n".join(results)
@@ -0,0 +1,40 @@
+import os
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+_pools = {}
+_lock = threading.Lock()
+
+def _mp_context():
+    # The service forks from a process full of threads (executors, batchers, ORT/torch pools);
+    # a plain fork can inherit a lock some other thread held and deadlock. forkserver children
+    # come from a clean single-threaded server, so worker entry points must be importable
+    # module-level functions
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+def get_process_pool(name: str, max_workers: int = None) -> ProcessPoolExecutor:
+    """
+    Named, lazily created process pools shared across the service.
+    Pools are keyed by pid as well, so a forked worker never reuses its parent's pool.
+    """
+    key = (name, os.getpid())
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(), mp_context=_mp_context())
+            _pools[key] = pool
+    return pool
+
+def shutdown_pools():
+    pid = os.getpid()
+    with _lock:
+        for key in [k for k in _pools if k[1] == pid]:
+            _pools.pop(key).shutdown(wait=False, cancel_futures=True)
+
+atexit.register(shutdown_pools)